@@ -10,6 +10,30 @@ class Settings(BaseSettings):
     lizto_email: str | None = None
     lizto_password: str | None = None
     base_url: str = "https://agendaia-production.up.railway.app"
+    permission_cache_ttl_seconds: int = 300
+    # Tope de vida de una sesión validada en caché; acota cuánto tarda otro worker
+    # en enterarse de un logout o desactivación hecho en un proceso distinto.
+    session_cache_ttl_seconds: int = 60
+    session_cache_maxsize: int = 10000
+    # Días de agenda calculados por (especialista, fecha). Las escrituras del mismo
+    # worker invalidan al instante; el TTL acota el desfase frente a otros workers.
+    disponibilidad_cache_ttl_seconds: int = 120
+    disponibilidad_cache_maxsize: int = 50000
+    # Sincronización incremental de agenda (GET /api/citas/cambios): el margen cubre
+    # transacciones que confirman con una marca de tiempo anterior al cursor; los
+    # cursores más viejos que la retención reciben la agenda completa.
+    agenda_sync_margen_segundos: int = 5
+    agenda_sync_retencion_dias: int = 30
+    # Push de agenda por SSE (GET /api/citas/eventos)
+    agenda_eventos_heartbeat_segundos: int = 15
+    agenda_eventos_maxsize_cola: int = 256
+    # Índices de nombres del catálogo para el agente externo; las escrituras del mismo
+    # worker invalidan al confirmar, el TTL acota el desfase frente a otros workers.
+    catalogo_cache_ttl_seconds: int = 300
+    # Índice de búsqueda de clientes en memoria (solo motores sin pg_trgm, p. ej. SQLite)
+    clientes_busqueda_cache_ttl_seconds: int = 300
+    # Prefijo que se antepone a los teléfonos nacionales al normalizarlos a E.164
+    telefono_codigo_pais: str = "57"
 
     class Config:
         env_file = ".env"
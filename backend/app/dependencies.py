@@ -1,18 +1,28 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from .database import get_db
-from .models import Usuario, Sesion
+from .models import Usuario
 from .utils.jwt import verify_token
-from .services.permission_service import PermissionService
-from datetime import datetime
+from .services.principal_service import Principal, PrincipalService
+from .services.session_service import SessionService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-async def get_current_user(
+# Las dependencias de autenticación son síncronas a propósito: ejecutan consultas
+# bloqueantes de SQLAlchemy, y FastAPI corre las dependencias `def` en su threadpool.
+# Declararlas `async def` bloquearía el event loop y serializaría todas las peticiones.
+
+def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Usuario:
+    """
+    Resolver el usuario autenticado y dejar su Principal en request.state.principal.
+    Con caché caliente no consulta la BD; en frío resuelve sesión, usuario, rol y
+    permisos en una sola consulta (PrincipalService.load_by_token).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -22,27 +32,31 @@ async def get_current_user(
     # Limpiar el token de prefijos accidentales (defensivo ante n8n/agentes)
     clean_token = token.replace("Bearer ", "").strip()
     
-    payload = verify_token(clean_token, "access")
-    if payload is None:
-        raise credentials_exception
-    
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
-    
-    # Verify session exists and is not expired
-    sesion = db.query(Sesion).filter(
-        Sesion.token == clean_token,
-        Sesion.fecha_expiracion > datetime.utcnow()
-    ).first()
-
-    
-    if not sesion:
-        raise credentials_exception
-    
-    user = db.query(Usuario).filter(Usuario.username == username).first()
-    if user is None:
-        raise credentials_exception
+    cached = SessionService.get_cached_session(clean_token)
+    if cached is not None:
+        user = cached.attach(db)
+        principal = PrincipalService.for_user(db, user)
+    else:
+        payload = verify_token(clean_token, "access")
+        if payload is None:
+            raise credentials_exception
+        
+        username: str = payload.get("sub")
+        if username is None:
+            raise credentials_exception
+        
+        # Sesión vigente + usuario + rol + permisos
+        resolved = PrincipalService.load_by_token(db, clean_token)
+        if resolved is None:
+            raise credentials_exception
+        
+        user, fecha_expiracion, permisos = resolved
+        if user.username != username:
+            raise credentials_exception
+        
+        principal = Principal.from_user(user, permisos)
+        if user.estado == "activo":
+            SessionService.cache_session(clean_token, fecha_expiracion, user, payload.get("exp"))
     
     if user.estado != "activo":
         raise HTTPException(
@@ -50,9 +64,17 @@ async def get_current_user(
             detail="User account is inactive"
         )
     
+    request.state.principal = principal
     return user
 
-async def get_current_active_user(
+def get_current_principal(
+    request: Request,
+    current_user: Usuario = Depends(get_current_user)
+) -> Principal:
+    """Principal inmutable (ids, sede y permisos) del usuario autenticado"""
+    return request.state.principal
+
+def get_current_active_user(
     current_user: Usuario = Depends(get_current_user)
 ) -> Usuario:
     if current_user.estado != "activo":
@@ -66,18 +88,20 @@ def require_permission(permission_code):
     Usage: Depends(require_permission("especialistas.ver"))
     Usage: Depends(require_permission(["agenda.crear", "agenda.ver"]))
     """
-    async def permission_checker(
+    def permission_checker(
+        request: Request,
         current_user: Usuario = Depends(get_current_user),
         db: Session = Depends(get_db)
     ):
+        principal = getattr(request.state, "principal", None)
+        if principal is None or principal.usuario_id != current_user.id:
+            # get_current_user sustituido (dependency_overrides): permisos desde el caché por rol
+            principal = PrincipalService.for_user(db, current_user)
+        
         if isinstance(permission_code, list):
-            has_permission = PermissionService.user_has_any_permission(
-                db, current_user.id, permission_code
-            )
+            has_permission = principal.has_any_permission(permission_code)
         else:
-            has_permission = PermissionService.user_has_permission(
-                db, current_user.id, permission_code
-            )
+            has_permission = principal.has_permission(permission_code)
         
         if not has_permission:
             raise HTTPException(
@@ -5,7 +5,7 @@ from .especialista import Especialista, HorarioEspecialista, BloqueoEspecialista
 from .servicio import Servicio, CategoriaServicio, ServicioLiztoMapping
 from .cliente import Cliente, ClientePreferencia, ClienteEtiqueta, ClienteEtiquetaAsignacion
 from .producto import Proveedor, Producto, UbicacionInventario, Inventario, MovimientoInventario
-from .cita import Cita, EstadoCita
+from .cita import Cita, CitaEliminada, EstadoCita
 from .caja import Caja, MetodoPago, Factura, DetalleFactura, PagoFactura, MovimientoCaja, FacturaPendiente, Configuracion
 from .ficha_tecnica import PlantillaFicha, CampoFicha, CitaFicha, RespuestaFicha
 from .abono import Abono, RedencionAbono
@@ -18,7 +18,7 @@ __all__ = [
     "Servicio", "CategoriaServicio", "ServicioLiztoMapping",
     "Cliente", "ClientePreferencia", "ClienteEtiqueta", "ClienteEtiquetaAsignacion",
     "Proveedor", "Producto", "UbicacionInventario", "Inventario", "MovimientoInventario",
-    "Cita", "EstadoCita",
+    "Cita", "CitaEliminada", "EstadoCita",
     "Caja", "MetodoPago", "Factura", "DetalleFactura", "PagoFactura", "MovimientoCaja", "FacturaPendiente", "Configuracion",
     "PlantillaFicha", "CampoFicha", "CitaFicha", "RespuestaFicha",
     "Abono", "RedencionAbono",
@@ -11,7 +11,7 @@ Incluye:
 - FacturaPendiente: Servicios registrados por especialistas
 - Configuracion: Parámetros del sistema
 """
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text, Date, CheckConstraint, Boolean
+from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text, Date, CheckConstraint, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from decimal import Decimal
@@ -138,6 +138,8 @@ class Factura(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint("estado IN ('pendiente', 'pagada', 'anulada')", name='facturas_estado_check'),
+        # Estadísticas por cliente (services/cliente_estadisticas.py)
+        Index("idx_facturas_cliente", "cliente_id"),
     )
     
     # Relaciones
@@ -224,6 +226,7 @@ class DetalleFactura(Base):
     __table_args__ = (
         CheckConstraint("tipo IN ('servicio', 'producto')", name='detalle_factura_tipo_check'),
         CheckConstraint("cantidad > 0", name='detalle_factura_cantidad_check'),
+        Index("idx_detalle_factura_factura", "factura_id"),
     )
     
     # Relaciones
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Time, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, Time, DateTime, ForeignKey, Enum, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -54,5 +54,77 @@ class Cita(Base):
     especialista = relationship("Especialista", backref="citas")
     servicio = relationship("Servicio", backref="citas")
 
+    __table_args__ = (
+        Index("ix_citas_especialista_fecha", "especialista_id", "fecha"),
+        Index("ix_citas_sede_actualizacion", "sede_id", "fecha_actualizacion"),
+    )
+
     def __repr__(self):
         return f"<Cita(id={self.id}, cliente_id={self.cliente_id}, fecha={self.fecha}, hora={self.hora_inicio})>"
+
+
+class CitaEliminada(Base):
+    """
+    Registro de citas eliminadas para la sincronización incremental de la agenda.
+    Tabla: citas_eliminadas
+    """
+    __tablename__ = "citas_eliminadas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cita_id = Column(Integer, nullable=False)
+    sede_id = Column(Integer, nullable=True)
+    especialista_id = Column(Integer, nullable=True)
+    fecha = Column(Date, nullable=True)
+    fecha_eliminacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_citas_eliminadas_sede_fecha_eliminacion", "sede_id", "fecha_eliminacion"),
+    )
+
+    def __repr__(self):
+        return f"<CitaEliminada(cita_id={self.cita_id}, fecha_eliminacion={self.fecha_eliminacion})>"
+
+
+# ============================================
+# PROTECCIÓN CONTRA CITAS SOLAPADAS
+# ============================================
+# En Postgres la garantiza la restricción de exclusión excl_citas_solapadas
+# (db/migraciones/008_citas_sin_solapamiento.sql). En SQLite (pruebas y entornos
+# locales) se usan triggers: SQLite serializa las escrituras, así que la
+# verificación y la inserción no pueden intercalarse entre dos conexiones.
+# Una hora_fin <= hora_inicio se interpreta como medianoche, igual que en la agenda.
+
+MENSAJE_CITA_SOLAPADA = "cita_solapada"
+
+_CONDICION_SOLAPAMIENTO_SQLITE = """
+    NEW.estado NOT IN ('cancelada', 'no_show')
+    AND EXISTS (
+        SELECT 1 FROM citas c
+        WHERE c.especialista_id = NEW.especialista_id
+          AND c.fecha = NEW.fecha
+          AND c.id IS NOT NEW.id
+          AND c.estado NOT IN ('cancelada', 'no_show')
+          AND c.hora_inicio < CASE WHEN NEW.hora_fin <= NEW.hora_inicio THEN '24:00' ELSE NEW.hora_fin END
+          AND NEW.hora_inicio < CASE WHEN c.hora_fin <= c.hora_inicio THEN '24:00' ELSE c.hora_fin END
+    )
+"""
+
+_EVENTOS_TRIGGER = {
+    "insert": "INSERT",
+    # Solo los cambios que mueven la cita u ocupan agenda disparan la verificación
+    "update": "UPDATE OF especialista_id, fecha, hora_inicio, hora_fin, estado",
+}
+
+for _nombre, _evento in _EVENTOS_TRIGGER.items():
+    event.listen(
+        Cita.__table__,
+        "after_create",
+        DDL(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_citas_sin_solapamiento_{_nombre}
+            BEFORE {_evento} ON citas
+            WHEN {_CONDICION_SOLAPAMIENTO_SQLITE}
+            BEGIN
+                SELECT RAISE(ABORT, '{MENSAJE_CITA_SOLAPADA}');
+            END
+        """).execute_if(dialect="sqlite")
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Text, DateTime, CheckConstraint, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, Text, DateTime, CheckConstraint, ForeignKey, Boolean, Index, DECIMAL
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy import JSON
@@ -21,16 +21,26 @@ class Cliente(Base):
     sede_id = Column(Integer, ForeignKey("sedes.id"), index=True)
     telefono = Column(String(20), index=True)
     email = Column(String(100), index=True)
+    # Texto normalizado para búsqueda (lo mantiene services/cliente_busqueda.py);
+    # en Postgres lleva un índice GIN pg_trgm (db/migraciones/010)
+    busqueda = Column(Text)
+    # Identidad normalizada (la mantiene services/cliente_identidad.py): teléfono en
+    # E.164 y cédula sin separadores; únicas para el buscar-o-crear atómico
+    telefono_normalizado = Column(String(20))
+    cedula_normalizada = Column(String(20))
     
     # Información adicional
     fecha_nacimiento = Column(Date)
     direccion = Column(Text)
     notas = Column(Text)
     
-    # Estadísticas (actualizadas por triggers en BD)
+    # Estadísticas (las mantiene services/cliente_estadisticas.py al confirmar
+    # facturas y citas; backfill con scripts/recalcular_estadisticas_clientes.py)
     fecha_primera_visita = Column(Date)
     ultima_visita = Column(Date)
     total_visitas = Column(Integer, default=0)
+    total_gastado = Column(DECIMAL(12, 2), default=0)
+    ultimo_servicio_id = Column(Integer, ForeignKey("servicios.id", ondelete="SET NULL"))
     
     # Estado y control
     estado = Column(String(20), default='activo')
@@ -46,6 +56,13 @@ class Cliente(Base):
 
     __table_args__ = (
         CheckConstraint("estado IN ('activo', 'inactivo')", name='chk_cliente_estado'),
+        # Listado por sede ordenado por nombre con paginación por cursor (nombre, id)
+        Index("ix_clientes_sede_nombre_id", "sede_id", "nombre", "id"),
+        Index("ix_clientes_sede_visitas_id", "sede_id", "total_visitas", "id"),
+        Index("ix_clientes_sede_ultima_visita_id", "sede_id", "ultima_visita", "id"),
+        Index("ix_clientes_sede_gastado_id", "sede_id", "total_gastado", "id"),
+        Index("ux_clientes_telefono_normalizado", "telefono_normalizado", unique=True),
+        Index("ux_clientes_cedula_normalizada", "cedula_normalizada", unique=True),
     )
 
     @property
@@ -59,6 +76,16 @@ class Cliente(Base):
         return f"<Cliente(id={self.id}, nombre='{self.nombre_completo}', estado='{self.estado}')>"
 
 
+# Listados en orden descendente con los NULL al final (paginación por cursor):
+# ORDER BY campo DESC NULLS LAST, id DESC no lo sirve el índice ascendente. Solo
+# Postgres (db/migraciones/015); SQLite no admite NULLS LAST en índices.
+for _nombre, _campo in (("visitas", "total_visitas"), ("ultima_visita", "ultima_visita"), ("gastado", "total_gastado")):
+    Index(
+        f"ix_clientes_sede_{_nombre}_desc_id",
+        Cliente.sede_id, getattr(Cliente, _campo).desc().nulls_last(), Cliente.id.desc()
+    ).ddl_if(dialect="postgresql")
+
+
 class ClientePreferencia(Base):
     """
     Preferencias y notas de servicio del cliente.
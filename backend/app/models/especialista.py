@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Time, SmallInteger, DECIMAL, CheckConstraint, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Time, SmallInteger, DECIMAL, CheckConstraint, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -48,6 +48,7 @@ class HorarioEspecialista(Base):
     __table_args__ = (
         CheckConstraint("dia_semana BETWEEN 0 AND 6", name="chk_dia_semana"),
         CheckConstraint("hora_fin > hora_inicio", name="chk_horario_valido"),
+        Index("ix_horarios_especialista_dia", "especialista_id", "dia_semana"),
     )
 
 
@@ -70,6 +71,7 @@ class BloqueoEspecialista(Base):
 
     __table_args__ = (
         CheckConstraint("fecha_fin >= fecha_inicio", name="chk_fecha_bloqueo"),
+        Index("ix_bloqueos_especialista_fechas", "especialista_id", "fecha_inicio", "fecha_fin"),
     )
 
 
@@ -48,7 +48,7 @@ def _abono_to_response(abono: Abono) -> AbonoResponse:
 
 
 @router.post("", response_model=AbonoResponse, status_code=status.HTTP_201_CREATED)
-async def crear_abono(
+def crear_abono(
     data: AbonoCreate,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_permission("abonos.crear"))
@@ -81,7 +81,7 @@ async def crear_abono(
 
 
 @router.get("", response_model=List[AbonoListItem])
-async def listar_abonos(
+def listar_abonos(
     cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
     estado: Optional[str] = Query(None, description="Filtrar por estado (disponible, usado, anulado)"),
     skip: int = Query(0, ge=0),
@@ -123,7 +123,7 @@ async def listar_abonos(
 # ===== RUTAS DE CLIENTE ANTES DE /{abono_id} =====
 
 @router.get("/cliente/{cliente_id}/resumen", response_model=AbonoClienteResumen)
-async def obtener_resumen_cliente(
+def obtener_resumen_cliente(
     cliente_id: int,
     db: Session = Depends(get_db),
     _: dict = Depends(require_permission("abonos.ver"))
@@ -139,7 +139,7 @@ async def obtener_resumen_cliente(
 
 
 @router.get("/cliente/{cliente_id}/para-factura", response_model=AbonosClienteFactura)
-async def obtener_abonos_para_factura(
+def obtener_abonos_para_factura(
     cliente_id: int,
     db: Session = Depends(get_db),
     _: dict = Depends(require_permission("abonos.ver"))
@@ -157,7 +157,7 @@ async def obtener_abonos_para_factura(
 # ===== RUTAS CON PARAMETRO DINAMICO AL FINAL =====
 
 @router.get("/{abono_id}", response_model=AbonoResponse)
-async def obtener_abono(
+def obtener_abono(
     abono_id: int,
     db: Session = Depends(get_db),
     _: dict = Depends(require_permission("abonos.ver"))
@@ -180,7 +180,7 @@ async def obtener_abono(
 
 
 @router.post("/{abono_id}/anular", response_model=AbonoResponse)
-async def anular_abono(
+def anular_abono(
     abono_id: int,
     data: AbonoAnular,
     db: Session = Depends(get_db),
@@ -1,23 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import date
 
 from ..database import get_db
 from ..schemas.cita import (
-    CitaCreate, CitaUpdate, CitaResponse, CitaListResponse, CitaCambiarEstado,
-    CitaAgenteRequest, NotificacionRequest
+    CitaCreate, CitaUpdate, CitaResponse, CitaListResponse, CitaListColumnarResponse, CitaCambiosResponse,
+    CitaCambiarEstado, CitaAgenteRequest, NotificacionRequest, CitaBulkCreate, CitaBulkResponse
 )
 from ..schemas.cliente import ClienteCreate
-from ..models.cliente import Cliente
 from ..models.sede import Sede
 from ..models.servicio import Servicio
 from ..models.especialista import Especialista, EspecialistaServicio
 from ..services.cita_service import CitaService
-from ..services.cliente_service import ClienteService
+from ..services.cliente_identidad import ClienteIdentidad
+from ..services.agenda_eventos import agenda_eventos
+from ..services.catalogo_nombres import CatalogoNombres
+from ..services.disponibilidad_service import DisponibilidadService
 from ..dependencies import require_permission
 from ..config import settings
+import asyncio
 import httpx
 import json
 
@@ -31,19 +34,32 @@ router = APIRouter(
 # ENDPOINTS CRUD
 # ============================================
 
-@router.get("", response_model=List[CitaListResponse])
+@router.get("", response_model=Union[List[CitaListResponse], CitaListColumnarResponse])
 def listar_citas(
     fecha_inicio: date = Query(..., description="Fecha inicio"),
     fecha_fin: Optional[date] = Query(None, description="Fecha fin (opcional)"),
     especialista_id: Optional[int] = Query(None, description="Filtrar por especialista"),
     estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    formato: str = Query("filas", pattern="^(filas|columnar)$", description="filas (por defecto) o columnar"),
     db: Session = Depends(get_db),
     auth_context: dict = Depends(require_permission("agenda.ver"))
 ):
     """
     Listar citas por rango de fechas
+    Con formato=columnar devuelve listas paralelas y tablas de especialistas/servicios
+    por id (respuesta más liviana para el calendario).
     Permiso: agenda.ver
     """
+    if formato == "columnar":
+        return CitaService.get_calendario_columnar(
+            db=db,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            especialista_id=especialista_id,
+            estado=estado,
+            sede_id=auth_context["user"].sede_id
+        )
+    
     citas = CitaService.get_by_fecha(
         db=db,
         fecha_inicio=fecha_inicio,
@@ -55,6 +71,85 @@ def listar_citas(
     return [CitaService.format_cita_list(c) for c in citas]
 
 
+@router.get("/cambios", response_model=CitaCambiosResponse)
+def cambios_citas(
+    request: Request,
+    response: Response,
+    fecha_inicio: date = Query(..., description="Fecha inicio"),
+    fecha_fin: Optional[date] = Query(None, description="Fecha fin (opcional)"),
+    especialista_id: Optional[int] = Query(None, description="Filtrar por especialista"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto por la consulta anterior"),
+    db: Session = Depends(get_db),
+    auth_context: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    Sincronización incremental de la agenda: citas creadas/modificadas y ids a quitar
+    desde el cursor. Sin cursor devuelve el rango completo. Responde 304 si el
+    If-None-Match coincide con el ETag (no hubo cambios).
+    Permiso: agenda.ver
+    """
+    try:
+        resultado, etag = CitaService.get_cambios(
+            db=db,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            especialista_id=especialista_id,
+            sede_id=auth_context["user"].sede_id,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return resultado
+
+
+@router.get("/eventos")
+async def eventos_agenda(
+    request: Request,
+    db: Session = Depends(get_db),
+    auth_context: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    Cambios de la agenda de la sede del usuario en vivo (Server-Sent Events).
+    Cada evento `cita` trae accion (creada/actualizada/eliminada), id, especialista,
+    fecha, horas y estado. Un evento `resync` indica que se perdieron eventos y hay
+    que recargar con GET /api/citas/cambios. Se envía un comentario cada
+    agenda_eventos_heartbeat_segundos para mantener viva la conexión.
+    Permiso: agenda.ver
+    """
+    sede_id = auth_context["user"].sede_id
+    # La conexión queda abierta por horas: no retener una conexión del pool
+    db.close()
+    
+    async def flujo():
+        suscripcion = agenda_eventos.suscribir(sede_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(
+                        suscripcion.cola.get(), timeout=settings.agenda_eventos_heartbeat_segundos
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            agenda_eventos.cancelar(suscripcion)
+    
+    return StreamingResponse(
+        flujo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{cita_id}", response_model=CitaResponse)
 def obtener_cita(
     cita_id: int,
@@ -132,6 +227,25 @@ def crear_cita(
         )
 
 
+@router.post("/bulk", response_model=CitaBulkResponse)
+def crear_citas_bulk(
+    datos: CitaBulkCreate,
+    db: Session = Depends(get_db),
+    auth_context: dict = Depends(require_permission("agenda.crear"))
+):
+    """
+    Crear varias citas en una transacción, con resultado por ítem.
+    Los conflictos de horario se revisan contra la agenda y entre las citas del lote.
+    Permiso: agenda.crear
+    """
+    current_user = auth_context["user"]
+    resultados = CitaService.crear_lote(
+        db, datos.citas, current_user.id, current_user.sede_id, todo_o_nada=datos.todo_o_nada
+    )
+    creadas = sum(1 for r in resultados if r["ok"])
+    return {"creadas": creadas, "fallidas": len(resultados) - creadas, "resultados": resultados}
+
+
 @router.put("/{cita_id}", response_model=CitaResponse)
 def actualizar_cita(
     cita_id: int,
@@ -143,7 +257,13 @@ def actualizar_cita(
     Actualizar una cita existente
     Permiso: agenda.editar
     """
-    cita = CitaService.actualizar(db, cita_id, cita_data)
+    try:
+        cita = CitaService.actualizar(db, cita_id, cita_data)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not cita:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,7 +283,13 @@ def cambiar_estado_cita(
     Cambiar el estado de una cita
     Permiso: agenda.editar
     """
-    cita = CitaService.cambiar_estado(db, cita_id, estado_data.estado, estado_data.notas_internas)
+    try:
+        cita = CitaService.cambiar_estado(db, cita_id, estado_data.estado, estado_data.notas_internas)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not cita:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -210,12 +336,13 @@ def agendar_cita_externo(
     Crear cita desde agente externo (n8n/whatsapp)
     - Busca o crea cliente por cédula
     - Busca servicio y sede por nombre
-    - Asigna especialista por defecto si es necesario
+    - Si no se indica especialista, asigna el menos cargado del día que tenga el horario libre
     - Registra abono si aplica
     """
     # 1. Validar Sede (Prioridad: Sede enviada por el agente)
     nombre_sede = request.sede
-    sede = db.query(Sede).filter(Sede.nombre.ilike(f"%{nombre_sede}%"), Sede.estado == 'activa').first()
+    sede_id = CatalogoNombres.resolver_sede(db, nombre_sede)
+    sede = db.get(Sede, sede_id) if sede_id else None
     if not sede:
         # Si no la encuentra por nombre, intentamos buscar una marcada como principal
         sede = db.query(Sede).filter(Sede.es_principal == True).first()
@@ -224,7 +351,8 @@ def agendar_cita_externo(
 
     # 2. Validar o buscar Servicio (alisado, repolarizacion, garantia)
     nombre_servicio = request.servicio
-    servicio = db.query(Servicio).filter(Servicio.nombre.ilike(f"%{nombre_servicio}%"), Servicio.sede_id == sede.id).first()
+    servicio_id = CatalogoNombres.resolver_servicio(db, nombre_servicio, sede.id)
+    servicio = db.get(Servicio, servicio_id) if servicio_id else None
     
     if not servicio:
         raise HTTPException(status_code=400, detail=f"Servicio '{nombre_servicio}' no encontrado en la sede {sede.nombre}")
@@ -233,62 +361,61 @@ def agendar_cita_externo(
     if not request.nombre or not request.cedula or not request.telefono:
         raise HTTPException(status_code=400, detail="Nombre, Cédula y Teléfono del cliente son obligatorios")
 
-    cliente_existente = db.query(Cliente).filter(
-        or_(
-            Cliente.cedula == request.cedula,
-            Cliente.telefono == request.telefono
-        )
-    ).first()
-    
-    if not cliente_existente:
-        nuevo_cliente_data = ClienteCreate(
-            nombre=request.nombre,
-            apellido=request.apellido,
-            cedula=request.cedula,
-            telefono=request.telefono,
-            email=request.email
+    # Cédula y teléfono se comparan normalizados ("300 123 4567" = "+573001234567");
+    # dos mensajes simultáneos del mismo cliente no crean dos registros
+    cliente_existente, _ = ClienteIdentidad.obtener_o_crear(db, ClienteCreate(
+        nombre=request.nombre,
+        apellido=request.apellido,
+        cedula=request.cedula,
+        telefono=request.telefono,
+        email=request.email
+    ), sede.id)
+
+    # 4. Asignar Especialista: el indicado o, en orden de menor carga del día,
+    # los que atienden el servicio y tienen libre ese horario
+    if request.especialista_id:
+        candidatos = [request.especialista_id]
+    else:
+        candidatos = DisponibilidadService.candidatos_asignacion(
+            db, sede.id, servicio.id, request.fecha, request.hora_inicio
         )
-        cliente_existente = ClienteService.create(db, nuevo_cliente_data, sede.id)
-    
-    # 4. Asignar Especialista
-    especialista_id = request.especialista_id
-    if not especialista_id:
-        # Buscar el primer especialista activo en esa sede
-        especialista = db.query(Especialista).filter(Especialista.sede_id == sede.id, Especialista.estado == 'activo').first()
-        if not especialista:
-            raise HTTPException(status_code=400, detail="No hay especialistas disponibles en esta sede")
-        especialista_id = especialista.id
+        if not candidatos:
+            raise HTTPException(status_code=400, detail="No hay especialistas disponibles en esta sede para ese horario")
 
     # 4.5 Resolver Método de Pago por Nombre (Si aplica)
     metodo_pago_id = request.metodo_pago_id
     if request.metodo_pago and not metodo_pago_id:
         # Buscar el método de pago más parecido por nombre
-        mp = db.query(MetodoPago).filter(
-            MetodoPago.nombre.ilike(f"%{request.metodo_pago}%"),
-            MetodoPago.activo == True
-        ).first()
-        if mp:
-            metodo_pago_id = mp.id
+        metodo_pago_id = CatalogoNombres.resolver_metodo_pago(db, request.metodo_pago)
 
     # 5. Crear Cita
     try:
         cita_create = CitaCreate(
             cliente_id=cliente_existente.id,
-            especialista_id=especialista_id,
+            especialista_id=candidatos[0],
             servicio_id=servicio.id,
             fecha=request.fecha,
             hora_inicio=request.hora_inicio,
             notas=request.notas,
             # Abono
             monto_abono=request.monto_abono,
-            metodo_pago_id=request.metodo_pago_id,
+            metodo_pago_id=metodo_pago_id,
             referencia_pago=request.referencia_abono,
             concepto_abono=request.concepto_abono
         )
     
         current_user = auth_context["user"]
-        # Usamos la sede detectada por el bot en lugar de la del usuario que ejecuta si es diferente
-        cita = CitaService.crear(db, cita_create, current_user.id, sede.id)
+        # Usamos la sede detectada por el bot en lugar de la del usuario que ejecuta si es diferente.
+        # Si una reserva concurrente ocupó el horario se intenta con el siguiente candidato
+        intentos = candidatos[:3]
+        for i, especialista_id in enumerate(intentos):
+            cita_create.especialista_id = especialista_id
+            try:
+                cita = CitaService.crear(db, cita_create, current_user.id, sede.id)
+                break
+            except ValueError as e:
+                if i == len(intentos) - 1 or "ya tiene una cita" not in str(e):
+                    raise
         
         # Devolver respuesta completa
         return obtener_cita(cita.id, db, auth_context)
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import json
 
 from ..database import get_db
 from ..schemas.cliente import (
@@ -10,6 +12,7 @@ from ..schemas.cliente import (
     AsignarEtiquetasRequest
 )
 from ..services.cliente_service import ClienteService
+from ..services.cliente_importacion import ArchivoClientes, ImportadorClientes
 from ..dependencies import require_permission
 
 router = APIRouter(
@@ -29,7 +32,7 @@ etiquetas_router = APIRouter(
 
 @router.get("", response_model=ClientePaginado)
 def listar_clientes(
-    query: Optional[str] = Query(None, description="Búsqueda por nombre, teléfono o email"),
+    query: Optional[str] = Query(None, description="Búsqueda por nombre, teléfono, cédula o email"),
     estado: Optional[str] = Query('activo', pattern='^(activo|inactivo|todos)$'),
     etiqueta_id: Optional[int] = Query(None, description="Filtrar por etiqueta"),
     min_visitas: Optional[int] = Query(None, ge=0),
@@ -38,6 +41,8 @@ def listar_clientes(
     por_pagina: int = Query(20, ge=1, le=100, description="Items por página"),
     ordenar_por: str = Query('nombre', description="Campo para ordenar"),
     orden: str = Query('asc', pattern='^(asc|desc)$'),
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior (ignora pagina)"),
+    conteo: str = Query('exacto', pattern='^(exacto|estimado|ninguno)$'),
     db: Session = Depends(get_db),
     user: dict = Depends(require_permission("clientes.ver"))
 ):
@@ -46,24 +51,34 @@ def listar_clientes(
     Permiso: clientes.ver
     
     Retorna lista paginada de clientes con:
-    - Búsqueda por texto (nombre, teléfono, email)
+    - Búsqueda por texto (nombre, teléfono, cédula, email; sin importar tildes)
     - Filtros por estado, etiqueta, visitas
     - Ordenamiento configurable
-    - Paginación
-    """
-    return ClienteService.get_all_paginado(
-        db=db,
-        sede_id=user["user"].sede_id,
-        query=query,
-        estado=estado,
-        etiqueta_id=etiqueta_id,
-        min_visitas=min_visitas,
-        max_visitas=max_visitas,
-        pagina=pagina,
-        por_pagina=por_pagina,
-        ordenar_por=ordenar_por,
-        orden=orden
-    )
+    - Paginación por número de página o por cursor (siguiente_cursor), que no se
+      vuelve más lenta en páginas profundas
+    - Conteo exacto, estimado o ninguno
+    """
+    try:
+        return ClienteService.get_all_paginado(
+            db=db,
+            sede_id=user["user"].sede_id,
+            query=query,
+            estado=estado,
+            etiqueta_id=etiqueta_id,
+            min_visitas=min_visitas,
+            max_visitas=max_visitas,
+            pagina=pagina,
+            por_pagina=por_pagina,
+            ordenar_por=ordenar_por,
+            orden=orden,
+            cursor=cursor,
+            conteo=conteo
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.get("/activos", response_model=List[ClienteListResponse])
@@ -76,22 +91,7 @@ def listar_clientes_activos(
     Permiso: agenda.ver
     """
     clientes = ClienteService.get_activos(db, user["user"].sede_id)
-    result = []
-    for cliente in clientes:
-        etiquetas = ClienteService._get_etiquetas_cliente(db, cliente.id)
-        result.append({
-            "id": cliente.id,
-            "nombre": cliente.nombre,
-            "apellido": cliente.apellido,
-            "cedula": cliente.cedula,
-            "telefono": cliente.telefono,
-            "email": cliente.email,
-            "total_visitas": cliente.total_visitas or 0,
-            "ultima_visita": cliente.ultima_visita,
-            "etiquetas": etiquetas,
-            "estado": cliente.estado
-        })
-    return result
+    return ClienteService.items_listado(db, clientes)
 
 
 @router.get("/buscar/rapida", response_model=List[ClienteListResponse])
@@ -105,27 +105,12 @@ def busqueda_rapida(
     BE-CLI-006: Búsqueda rápida de clientes
     Permiso: clientes.buscar
     
-    Búsqueda rápida para autocompletado.
-    Busca en nombre, apellido, teléfono y cédula.
+    Búsqueda rápida para autocompletado, ordenada por relevancia.
+    Busca en nombre, apellido, teléfono, cédula y email sin importar tildes.
     Retorna máximo 10 resultados por defecto.
     """
     clientes = ClienteService.busqueda_rapida(db, user["user"].sede_id, q, limite)
-    result = []
-    for cliente in clientes:
-        etiquetas = ClienteService._get_etiquetas_cliente(db, cliente.id)
-        result.append({
-            "id": cliente.id,
-            "nombre": cliente.nombre,
-            "apellido": cliente.apellido,
-            "cedula": cliente.cedula,
-            "telefono": cliente.telefono,
-            "email": cliente.email,
-            "total_visitas": cliente.total_visitas or 0,
-            "ultima_visita": cliente.ultima_visita,
-            "etiquetas": etiquetas,
-            "estado": cliente.estado
-        })
-    return result
+    return ClienteService.items_listado(db, clientes)
 
 
 @router.get("/{cliente_id}", response_model=ClienteResponse)
@@ -176,6 +161,39 @@ def crear_cliente(
     return ClienteService.get_by_id_completo(db, cliente.id)
 
 
+@router.post("/importar")
+def importar_clientes(
+    archivo: UploadFile = File(..., description="Archivo .csv o .xlsx con encabezado"),
+    actualizar: bool = Query(True, description="Actualizar los clientes que ya existen (por cédula o teléfono)"),
+    lote: int = Query(5000, ge=100, le=20000, description="Filas por transacción"),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_permission("clientes.crear"))
+):
+    """
+    Importar clientes en la sede del usuario desde CSV o XLSX
+    Permiso: clientes.crear
+
+    Columnas reconocidas: nombre (obligatoria), apellido, cedula/documento,
+    telefono/celular, email/correo, fecha_nacimiento, direccion, notas, es_colaborador.
+    Cada fila se valida igual que al crear un cliente; las inválidas se reportan y
+    no detienen la importación.
+
+    Responde en NDJSON: una línea de progreso por lote (filas, insertados,
+    actualizados, repetidos, omitidos, con_error) y una final con terminado=true y
+    el detalle de los primeros errores.
+    """
+    try:
+        filas = ArchivoClientes(archivo.file, archivo.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def progreso():
+        for resumen in ImportadorClientes.importar(db, filas, user["user"].sede_id, actualizar, lote):
+            yield json.dumps(resumen) + "\n"
+
+    return StreamingResponse(progreso(), media_type="application/x-ndjson")
+
+
 @router.put("/{cliente_id}", response_model=ClienteResponse)
 def actualizar_cliente(
     cliente_id: int,
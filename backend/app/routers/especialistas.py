@@ -1,17 +1,19 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, File, UploadFile
 
 from ..database import get_db
 from ..schemas.especialista import (
     EspecialistaCreate, EspecialistaUpdate, EspecialistaResponse,
     HorarioEspecialistaCreate, HorarioEspecialistaUpdate, HorarioEspecialistaResponse, HorariosBatchCreate,
+    HorariosPlantillaCreate, HorariosPlantillaResponse,
     BloqueoEspecialistaCreate, BloqueoEspecialistaUpdate, BloqueoEspecialistaResponse,
     EspecialistaServicioCreate, EspecialistaServicioUpdate, EspecialistaServicioResponse,
     DisponibilidadRequest, DisponibilidadGeneralRequest, DisponibilidadResponse,
     DisponibilidadNombreRequest, DisponibilidadNombreResponse, EspecialistaCalendarioResponse,
-    EspecialistaLibreResponse
+    EspecialistaLibreResponse, PrimerosDisponiblesRequest, PrimerDisponibleResponse,
+    CombosDisponiblesRequest, ComboDisponibleResponse
 )
 from ..services.especialista_service import EspecialistaService
 from ..services.horario_service import HorarioService
@@ -61,23 +63,26 @@ def listar_especialistas_activos(
 
 @router.get("/activos/calendario", response_model=List[EspecialistaCalendarioResponse])
 def listar_especialistas_calendario(
+    request: Request,
+    response: Response,
+    fecha_inicio: Optional[date] = Query(None, description="Inicio del rango (por defecto hoy)"),
+    fecha_fin: Optional[date] = Query(None, description="Fin del rango (por defecto una semana)"),
     db: Session = Depends(get_db),
     user: dict = Depends(require_permission("agenda.ver"))
 ):
     """
-    Obtener especialistas activos con sus horarios y bloqueos para el calendario (batch request)
+    Obtener especialistas activos con sus horarios y bloqueos para el calendario (batch request).
+    Solo incluye lo que aplica al rango de fechas; bloqueos_dia trae los bloqueos ya
+    expandidos por fecha. Responde 304 si el If-None-Match coincide con el ETag.
     Permiso: agenda.ver
     """
-    from sqlalchemy.orm import joinedload
-    from ..models.especialista import Especialista
-    
-    return db.query(Especialista).options(
-        joinedload(Especialista.horarios),
-        joinedload(Especialista.bloqueos)
-    ).filter(
-        Especialista.estado == "activo",
-        Especialista.sede_id == user["user"].sede_id
-    ).all()
+    resultado, etag = EspecialistaService.get_calendario(
+        db, user["user"].sede_id, fecha_inicio or date.today(), fecha_fin
+    )
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return resultado
 
 @router.get("/libres-en-horario", response_model=List[EspecialistaLibreResponse])
 def listar_especialistas_libre_horario(
@@ -107,6 +112,40 @@ def listar_especialistas_libre_horario(
     )
 
 
+@router.get("/disponibilidad", response_model=List[DisponibilidadResponse])
+def obtener_disponibilidad_general(
+    servicio_id: int,
+    fecha_inicio: str,
+    fecha_fin: str,
+    db: Session = Depends(get_db),
+    _: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    BE-DISP-002: Obtener disponibilidad general de todos los especialistas para un servicio
+    Declarado antes de /{id} para que la ruta no se interprete como un ID.
+    Permiso: agenda.ver
+    """
+    from datetime import datetime
+    fecha_inicio_date = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+    fecha_fin_date = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
+    
+    return DisponibilidadService.get_disponibilidad_general(
+        db, servicio_id, fecha_inicio_date, fecha_fin_date
+    )
+
+
+@router.get("/disponibilidad/metricas", response_model=dict)
+def obtener_metricas_disponibilidad(
+    _: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    Métricas del caché de disponibilidad de este worker: aciertos, fallos,
+    invalidaciones y tiempo de recálculo por día de agenda.
+    Permiso: agenda.ver
+    """
+    return DisponibilidadService.get_cache_stats()
+
+
 @router.get("/{id}", response_model=EspecialistaResponse)
 def obtener_especialista(
     id: int,
@@ -248,6 +287,24 @@ def guardar_horarios_batch(
     return HorarioService.create_batch(db, id, horarios.horarios)
 
 
+@router.put("/horarios/plantilla", response_model=HorariosPlantillaResponse)
+def aplicar_plantilla_horarios(
+    plantilla: HorariosPlantillaCreate,
+    db: Session = Depends(get_db),
+    _: dict = Depends(require_permission("especialistas.editar"))
+):
+    """
+    Aplicar una plantilla semanal a varios especialistas.
+    Reemplaza todos sus horarios existentes en una sola transacción.
+    Permiso: especialistas.editar
+    """
+    creados = HorarioService.aplicar_plantilla(db, plantilla.especialista_ids, plantilla.horarios)
+    return HorariosPlantillaResponse(
+        especialistas=len(set(plantilla.especialista_ids)),
+        horarios_creados=creados
+    )
+
+
 @router.post("/{id}/horarios", response_model=HorarioEspecialistaResponse, status_code=status.HTTP_201_CREATED)
 def agregar_horario(
     id: int,
@@ -296,14 +353,17 @@ def eliminar_horario(
 @router.get("/{id}/bloqueos", response_model=List[BloqueoEspecialistaResponse])
 def listar_bloqueos(
     id: int,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
     db: Session = Depends(get_db),
     _: dict = Depends(require_permission("especialistas.ver"))
 ):
     """
     BE-BLQ-001: Listar bloqueos de un especialista
+    Con fecha_desde/fecha_hasta solo devuelve los que tocan ese rango.
     Permiso: especialistas.ver
     """
-    return BloqueoService.get_by_especialista(db, id)
+    return BloqueoService.get_by_especialista(db, id, fecha_desde, fecha_hasta)
 
 
 @router.post("/{id}/bloqueos", response_model=BloqueoEspecialistaResponse, status_code=status.HTTP_201_CREATED)
@@ -455,26 +515,6 @@ def obtener_disponibilidad(
     )
 
 
-@router.get("/disponibilidad", response_model=List[DisponibilidadResponse])
-def obtener_disponibilidad_general(
-    servicio_id: int,
-    fecha_inicio: str,
-    fecha_fin: str,
-    db: Session = Depends(get_db),
-    _: dict = Depends(require_permission("agenda.ver"))
-):
-    """
-    BE-DISP-002: Obtener disponibilidad general de todos los especialistas para un servicio
-    Permiso: agenda.ver
-    """
-    from datetime import datetime
-    fecha_inicio_date = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-    fecha_fin_date = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-    
-    return DisponibilidadService.get_disponibilidad_general(
-        db, servicio_id, fecha_inicio_date, fecha_fin_date
-    )
-
 @router.post("/consultar-disponibilidad-nombre", response_model=DisponibilidadNombreResponse)
 def consultar_disponibilidad_nombre(
     request: DisponibilidadNombreRequest,
@@ -494,3 +534,50 @@ def consultar_disponibilidad_nombre(
         hora_inicio=request.hora_inicio
     )
 
+
+@router.post("/primeros-disponibles", response_model=List[PrimerDisponibleResponse])
+def buscar_primeros_disponibles(
+    request: PrimerosDisponiblesRequest,
+    db: Session = Depends(get_db),
+    auth_context: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    BE-DISP-005: Primeros horarios libres para un servicio (para agente IA)
+    Devuelve hasta `limite` pares (especialista, hora) en orden cronológico dentro del rango.
+    Si no se envía sede_id se usa la sede del usuario.
+    Permiso: agenda.ver
+    """
+    return DisponibilidadService.buscar_primeros_disponibles(
+        db=db,
+        sede_id=request.sede_id or auth_context["user"].sede_id,
+        servicio_id=request.servicio_id,
+        fecha_inicio=request.fecha_inicio,
+        fecha_fin=request.fecha_fin,
+        especialista_id=request.especialista_id,
+        hora_desde=request.hora_desde,
+        limite=request.limite
+    )
+
+
+@router.post("/combos-disponibles", response_model=List[ComboDisponibleResponse])
+def buscar_combos_disponibles(
+    request: CombosDisponiblesRequest,
+    db: Session = Depends(get_db),
+    auth_context: dict = Depends(require_permission("agenda.ver"))
+):
+    """
+    Primeras horas para reservar varios servicios seguidos (ej. alisado + lavado)
+    el mismo día, con el especialista de cada paso y la espera entre servicios.
+    Si no se envía sede_id se usa la sede del usuario.
+    Permiso: agenda.ver
+    """
+    return DisponibilidadService.buscar_combos(
+        db=db,
+        sede_id=request.sede_id or auth_context["user"].sede_id,
+        servicio_ids=request.servicio_ids,
+        fecha_inicio=request.fecha_inicio,
+        fecha_fin=request.fecha_fin,
+        hora_desde=request.hora_desde,
+        max_espera_minutos=request.max_espera_minutos,
+        limite=request.limite
+    )
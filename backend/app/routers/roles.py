@@ -7,6 +7,8 @@ from ..models import Rol, Permiso, RolPermiso, Usuario
 from ..schemas.user import RolBase, RolResponse
 from ..schemas.auth import PermisoResponse
 from ..dependencies import get_current_user, require_permission
+from ..services.permission_service import PermissionService
+from ..services.session_service import SessionService
 
 router = APIRouter(
     prefix="/api/roles",
@@ -137,12 +139,17 @@ def ensure_local_role(db: Session, rol: Rol, sede_id: int) -> Rol:
         db.add(RolPermiso(rol_id=new_rol.id, permiso_id=gp.permiso_id))
     
     # Migrar usuarios de esta Sede del Rol Global al Rol Local
-    db.query(Usuario).filter(
+    migrados = db.query(Usuario).filter(
         Usuario.rol_id == rol.id, 
         Usuario.sede_id == sede_id
-    ).update({Usuario.rol_id: new_rol.id}, synchronize_session=False)
+    )
+    usuario_ids = [uid for (uid,) in migrados.with_entities(Usuario.id)]
+    migrados.update({Usuario.rol_id: new_rol.id}, synchronize_session=False)
     
     db.commit()
+    # Sus sesiones cacheadas guardan el rol_id global
+    for uid in usuario_ids:
+        SessionService.forget_user(uid)
     db.refresh(new_rol)
     return new_rol
 
@@ -212,6 +219,7 @@ def delete_role(
     
     db.delete(db_rol)
     db.commit()
+    PermissionService.invalidate_role_permissions(rol_id)
     return {"message": "Role deleted successfully"}
 
 @router.put("/{rol_id}/permisos")
@@ -252,6 +260,7 @@ def assign_permissions(
             db.add(rol_permiso)
     
     db.commit()
+    PermissionService.invalidate_role_permissions(db_rol.id)
     return {"message": "Permissions assigned successfully"}
 
 # Permisos endpoints
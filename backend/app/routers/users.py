@@ -7,6 +7,7 @@ from ..schemas import user as schemas
 from ..utils import security
 from ..dependencies import get_current_user, require_permission
 from ..services.password_service import PasswordService
+from ..services.session_service import SessionService
 
 router = APIRouter(
     prefix="/api/usuarios",
@@ -130,6 +131,7 @@ def update_user_me(
         current_user.password_hash = PasswordService.hash_password(user_data.password)
     
     db.commit()
+    SessionService.forget_user(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -218,6 +220,7 @@ def update_user(
         db_user.password_hash = PasswordService.hash_password(user_data.password)
     
     db.commit()
+    SessionService.forget_user(db_user.id)
     db.refresh(db_user)
     return db_user
 
@@ -242,6 +245,7 @@ def change_user_status(
     
     db_user.estado = estado
     db.commit()
+    SessionService.forget_user(db_user.id)
     db.refresh(db_user)
     return db_user
 
@@ -274,4 +278,5 @@ def delete_user(
     # Soft delete by setting status to inactive
     db_user.estado = "inactivo"
     db.commit()
+    SessionService.forget_user(db_user.id)
     return {"message": "User deactivated successfully"}
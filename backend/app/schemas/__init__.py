@@ -3,6 +3,7 @@ from .auth import Token, TokenData, LoginRequest, PermisoResponse, RolPermisoRes
 from .especialista import (
     EspecialistaBase, EspecialistaCreate, EspecialistaUpdate, EspecialistaResponse,
     HorarioEspecialistaBase, HorarioEspecialistaCreate, HorarioEspecialistaUpdate, HorarioEspecialistaResponse, HorariosBatchCreate,
+    HorariosPlantillaCreate, HorariosPlantillaResponse,
     BloqueoEspecialistaBase, BloqueoEspecialistaCreate, BloqueoEspecialistaUpdate, BloqueoEspecialistaResponse,
     EspecialistaServicioBase, EspecialistaServicioCreate, EspecialistaServicioUpdate, EspecialistaServicioResponse,
     SlotDisponible, DisponibilidadRequest, DisponibilidadGeneralRequest, DisponibilidadResponse
@@ -51,6 +52,7 @@ __all__ = [
     "Token", "TokenData", "LoginRequest", "PermisoResponse", "RolPermisoResponse",
     "EspecialistaBase", "EspecialistaCreate", "EspecialistaUpdate", "EspecialistaResponse",
     "HorarioEspecialistaBase", "HorarioEspecialistaCreate", "HorarioEspecialistaUpdate", "HorarioEspecialistaResponse", "HorariosBatchCreate",
+    "HorariosPlantillaCreate", "HorariosPlantillaResponse",
     "BloqueoEspecialistaBase", "BloqueoEspecialistaCreate", "BloqueoEspecialistaUpdate", "BloqueoEspecialistaResponse",
     "EspecialistaServicioBase", "EspecialistaServicioCreate", "EspecialistaServicioUpdate", "EspecialistaServicioResponse",
     "SlotDisponible", "DisponibilidadRequest", "DisponibilidadGeneralRequest", "DisponibilidadResponse",
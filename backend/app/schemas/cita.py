@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date, time, datetime
 import re
 
@@ -31,6 +31,25 @@ class CitaCreate(CitaBase):
     concepto_abono: Optional[str] = Field(None, description="Concepto del abono (opcional)")
 
 
+class CitaBulkCreate(BaseModel):
+    """Schema para crear varias citas en una sola transacción"""
+    citas: List[CitaCreate] = Field(..., min_length=1, max_length=500)
+    todo_o_nada: bool = Field(False, description="Si algún ítem falla no se crea ninguna cita")
+
+
+class CitaBulkItemResult(BaseModel):
+    indice: int
+    ok: bool
+    cita_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class CitaBulkResponse(BaseModel):
+    creadas: int
+    fallidas: int
+    resultados: List[CitaBulkItemResult]
+
+
 # ============================================
 # SCHEMAS PARA ACTUALIZAR
 # ============================================
@@ -140,6 +159,48 @@ class CitaListResponse(BaseModel):
         from_attributes = True
 
 
+class CitaCambiosResponse(BaseModel):
+    """Schema para la sincronización incremental de la agenda"""
+    cursor: str
+    completo: bool
+    citas: List[CitaListResponse]
+    eliminadas: List[int]
+
+
+class CitaColumnas(BaseModel):
+    """Citas en columnas paralelas: la posición i de cada lista es la cita i"""
+    id: List[int]
+    cliente_id: List[Optional[int]]
+    especialista_id: List[Optional[int]]
+    servicio_id: List[Optional[int]]
+    fecha: List[date]
+    hora_inicio: List[Optional[time]]
+    hora_fin: List[Optional[time]]
+    duracion_minutos: List[Optional[int]]
+    estado: List[str]
+    notas: List[Optional[str]]
+    lizto_reservation_id: List[Optional[str]]
+    cliente_nombre: List[str]
+    cliente_telefono: List[Optional[str]]
+
+
+class EspecialistaRef(BaseModel):
+    nombre: str
+
+
+class ServicioRef(BaseModel):
+    nombre: str
+    color: Optional[str] = None
+
+
+class CitaListColumnarResponse(BaseModel):
+    """Schema compacto para el calendario (formato=columnar)"""
+    total: int
+    citas: CitaColumnas
+    especialistas: Dict[int, EspecialistaRef]
+    servicios: Dict[int, ServicioRef]
+
+
 # ============================================
 # SCHEMAS PARA FILTROS
 # ============================================
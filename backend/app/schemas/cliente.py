@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List
 from datetime import date, datetime
+from decimal import Decimal
 import re
 
 
@@ -168,6 +169,8 @@ class ClienteResponse(ClienteBase):
     total_visitas: int
     fecha_primera_visita: Optional[date]
     ultima_visita: Optional[date]
+    total_gastado: Decimal = Decimal("0")
+    ultimo_servicio_id: Optional[int] = None
     etiquetas: List[EtiquetaSimple] = []
     fecha_creacion: datetime
     fecha_actualizacion: datetime
@@ -191,6 +194,8 @@ class ClienteResponse(ClienteBase):
             "total_visitas": cliente.total_visitas or 0,
             "fecha_primera_visita": cliente.fecha_primera_visita,
             "ultima_visita": cliente.ultima_visita,
+            "total_gastado": cliente.total_gastado or 0,
+            "ultimo_servicio_id": cliente.ultimo_servicio_id,
             "etiquetas": etiquetas or [],
             "fecha_creacion": cliente.fecha_creacion,
             "fecha_actualizacion": cliente.fecha_actualizacion,
@@ -209,6 +214,7 @@ class ClienteListResponse(BaseModel):
     email: Optional[str]
     total_visitas: int
     ultima_visita: Optional[date]
+    total_gastado: Decimal = Decimal("0")
     etiquetas: List[EtiquetaSimple] = []
     estado: str
     es_colaborador: bool = False
@@ -223,10 +229,12 @@ class ClienteListResponse(BaseModel):
 
 class ClientePaginado(BaseModel):
     """Respuesta paginada de clientes"""
-    total: int
+    total: Optional[int] = None  # None si se pidió conteo='ninguno'
+    total_estimado: bool = False
     pagina: int
     por_pagina: int
-    total_paginas: int
+    total_paginas: Optional[int] = None
+    siguiente_cursor: Optional[str] = None  # None en la última página
     items: List[ClienteListResponse]
 
 
@@ -88,6 +88,17 @@ class HorariosBatchCreate(BaseModel):
     horarios: List[HorarioEspecialistaCreate]
 
 
+class HorariosPlantillaCreate(BaseModel):
+    """Misma semana de horarios aplicada a varios especialistas"""
+    especialista_ids: List[int] = Field(..., min_length=1, max_length=200)
+    horarios: List[HorarioEspecialistaCreate]
+
+
+class HorariosPlantillaResponse(BaseModel):
+    especialistas: int
+    horarios_creados: int
+
+
 # ============================================
 # SCHEMAS DE BLOQUEO
 # ============================================
@@ -222,12 +233,67 @@ class DisponibilidadNombreResponse(BaseModel):
     mensaje: str
     conflictos: Optional[List[dict]] = None
 
+class PrimerosDisponiblesRequest(BaseModel):
+    servicio_id: int
+    fecha_inicio: date
+    fecha_fin: Optional[date] = None  # Por defecto una semana desde fecha_inicio
+    sede_id: Optional[int] = None  # Por defecto la sede del usuario
+    especialista_id: Optional[int] = None  # Preferencia del cliente
+    hora_desde: Optional[time] = None  # Solo aplica a fecha_inicio (ej: "hoy después de las 3 PM")
+    limite: int = Field(5, ge=1, le=50)
+
+
+class PrimerDisponibleResponse(BaseModel):
+    especialista_id: int
+    nombre_completo: str
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+
+
+class CombosDisponiblesRequest(BaseModel):
+    servicio_ids: List[int] = Field(..., min_length=1, max_length=5)  # En el orden en que se atienden
+    fecha_inicio: date
+    fecha_fin: Optional[date] = None  # Por defecto una semana desde fecha_inicio
+    sede_id: Optional[int] = None  # Por defecto la sede del usuario
+    hora_desde: Optional[time] = None  # Solo aplica a fecha_inicio
+    max_espera_minutos: int = Field(15, ge=0, le=120)  # Espera permitida entre servicios
+    limite: int = Field(5, ge=1, le=20)
+
+
+class ComboPasoResponse(BaseModel):
+    servicio_id: int
+    especialista_id: int
+    nombre_completo: str
+    hora_inicio: time
+    hora_fin: time
+
+
+class ComboDisponibleResponse(BaseModel):
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    espera_minutos: int  # Suma de esperas entre servicios
+    pasos: List[ComboPasoResponse]
+
+
+class BloqueoDiaResponse(BaseModel):
+    """Un bloqueo ya expandido a una fecha concreta (sin horas: día completo)"""
+    bloqueo_id: int
+    fecha: date
+    hora_inicio: Optional[time] = None
+    hora_fin: Optional[time] = None
+    motivo: Optional[str] = None
+
+
 class EspecialistaCalendarioResponse(EspecialistaResponse):
     horarios: List[HorarioEspecialistaResponse]
     bloqueos: List[BloqueoEspecialistaResponse]
+    bloqueos_dia: List[BloqueoDiaResponse] = []
 
     class Config:
         from_attributes = True
+
 class LibresRequest(BaseModel):
     fecha: date
     hora: time
@@ -0,0 +1,436 @@
+"""
+Motor de disponibilidad basado en mapas de bits por minuto.
+
+Cada día de un especialista se representa como un vector de 1440 posiciones
+(una por minuto). Se mantienen tres capas booleanas por día:
+
+- horario:  minutos dentro del horario laboral
+- bloqueo:  minutos cubiertos por un BloqueoEspecialista
+- ocupado:  minutos cubiertos por citas activas (no canceladas / no_show)
+
+libre = horario & ~bloqueo & ~ocupado. Los inicios válidos para un servicio de
+N minutos se obtienen con una suma acumulada por fila, sin recorrer slot a slot.
+"""
+from bisect import bisect_right
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..models.especialista import HorarioEspecialista, BloqueoEspecialista
+from ..models.cita import Cita
+from ..schemas.especialista import SlotDisponible
+
+MINUTOS_DIA = 24 * 60
+
+# Estados que no ocupan agenda
+ESTADOS_CITA_INACTIVOS = ('cancelada', 'no_show')
+
+
+def dia_semana_app(fecha: date) -> int:
+    """Día de semana con la convención de la app (0=Domingo, 6=Sábado)"""
+    return (fecha.weekday() + 1) % 7
+
+
+def minuto_del_dia(hora: time) -> int:
+    return hora.hour * 60 + hora.minute
+
+
+def hora_desde_minuto(minuto: int) -> time:
+    # Igual que sumar minutos con datetime: 1440 (medianoche) vuelve a 00:00
+    return time((minuto // 60) % 24, minuto % 60)
+
+
+def rango_minutos(hora_inicio: time, hora_fin: time) -> Tuple[int, int]:
+    """Convertir un rango horario a [inicio, fin) en minutos; fin <= inicio se lee como medianoche"""
+    inicio = minuto_del_dia(hora_inicio)
+    fin = minuto_del_dia(hora_fin)
+    if fin <= inicio:
+        fin = MINUTOS_DIA
+    return inicio, fin
+
+
+def rango_bloqueo(bloqueo: BloqueoEspecialista) -> Tuple[int, int]:
+    """Minutos [inicio, fin) que cubre un bloqueo en cada día; sin horas es el día completo"""
+    if bloqueo.hora_inicio and bloqueo.hora_fin:
+        return rango_minutos(bloqueo.hora_inicio, bloqueo.hora_fin)
+    return 0, MINUTOS_DIA
+
+
+def fechas_bloqueo(bloqueo: BloqueoEspecialista, fecha_inicio: date, fecha_fin: date) -> Iterator[date]:
+    """Fechas dentro de [fecha_inicio, fecha_fin] en las que aplica el bloqueo (recurrentes solo en sus días)"""
+    dias_semana = set(bloqueo.dias_semana) if bloqueo.es_recurrente and bloqueo.dias_semana else None
+    fecha = max(bloqueo.fecha_inicio, fecha_inicio)
+    hasta = min(bloqueo.fecha_fin, fecha_fin)
+    while fecha <= hasta:
+        if dias_semana is None or dia_semana_app(fecha) in dias_semana:
+            yield fecha
+        fecha += timedelta(days=1)
+
+
+def _fusionar(intervalos: Iterable[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Ordenar y unir intervalos solapados o contiguos; devuelve (inicios, fines) crecientes"""
+    inicios: List[int] = []
+    fines: List[int] = []
+    for inicio, fin in sorted(intervalos):
+        if fines and inicio <= fines[-1]:
+            fines[-1] = max(fines[-1], fin)
+        else:
+            inicios.append(inicio)
+            fines.append(fin)
+    return inicios, fines
+
+
+class ReglasBloqueo:
+    """
+    Bloqueos de un especialista compilados para un rango de fechas.
+
+    Los recurrentes que cubren todo el rango quedan como una lista de intervalos
+    por día de semana; el resto se expande a intervalos por fecha dentro del rango.
+    Las listas se guardan fusionadas y ordenadas, de modo que verificar un horario
+    es una búsqueda binaria en lugar de recorrer todos los bloqueos.
+    """
+
+    def __init__(self, bloqueos: Iterable[BloqueoEspecialista], fecha_inicio: date, fecha_fin: date):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        por_dia_semana: Dict[int, List[Tuple[int, int]]] = {}
+        por_fecha: Dict[date, List[Tuple[int, int]]] = {}
+
+        for b in bloqueos:
+            if b.fecha_inicio > fecha_fin or b.fecha_fin < fecha_inicio:
+                continue
+            intervalo = rango_bloqueo(b)
+
+            if b.es_recurrente and b.dias_semana and b.fecha_inicio <= fecha_inicio and b.fecha_fin >= fecha_fin:
+                for dia in set(b.dias_semana):
+                    por_dia_semana.setdefault(dia, []).append(intervalo)
+                continue
+
+            for fecha in fechas_bloqueo(b, fecha_inicio, fecha_fin):
+                por_fecha.setdefault(fecha, []).append(intervalo)
+
+        self._por_dia_semana = {dia: _fusionar(v) for dia, v in por_dia_semana.items()}
+        self._por_fecha = {fecha: _fusionar(v) for fecha, v in por_fecha.items()}
+
+    def _listas(self, fecha: date) -> List[Tuple[List[int], List[int]]]:
+        if not (self.fecha_inicio <= fecha <= self.fecha_fin):
+            raise ValueError(f"La fecha {fecha} está fuera del rango compilado")
+        listas = []
+        for lista in (self._por_dia_semana.get(dia_semana_app(fecha)), self._por_fecha.get(fecha)):
+            if lista is not None:
+                listas.append(lista)
+        return listas
+
+    def intervalos(self, fecha: date) -> List[Tuple[int, int]]:
+        """Minutos bloqueados de la fecha como intervalos [inicio, fin) ordenados y disjuntos"""
+        listas = self._listas(fecha)
+        if len(listas) == 1:
+            return list(zip(*listas[0]))
+        inicios, fines = _fusionar(par for lista in listas for par in zip(*lista))
+        return list(zip(inicios, fines))
+
+    def bloquea(self, fecha: date, hora_inicio: time, hora_fin: time) -> bool:
+        """True si algún bloqueo se solapa con [hora_inicio, hora_fin) en la fecha"""
+        inicio, fin = rango_minutos(hora_inicio, hora_fin)
+        for inicios, fines in self._listas(fecha):
+            # Primer intervalo que termina después del inicio consultado
+            i = bisect_right(fines, inicio)
+            if i < len(inicios) and inicios[i] < fin:
+                return True
+        return False
+
+
+class DiaAgenda(NamedTuple):
+    """Día ya calculado de una agenda (lo que se guarda en el caché de disponibilidad)"""
+    libre: np.ndarray  # 1440 minutos empaquetados con np.packbits (180 bytes)
+    ventanas: Tuple[Tuple[int, int], ...]
+
+
+def _inicios_validos(libre: np.ndarray, duracion_minutos: int) -> np.ndarray:
+    """Ventana deslizante sobre el último eje (minutos) de una matriz booleana"""
+    resultado = np.zeros(libre.shape, dtype=bool)
+    if libre.size == 0 or duracion_minutos <= 0 or duracion_minutos > MINUTOS_DIA:
+        return resultado
+
+    acumulado = np.zeros(libre.shape[:-1] + (MINUTOS_DIA + 1,), dtype=np.int32)
+    np.cumsum(libre, axis=-1, out=acumulado[..., 1:])
+    ventana = acumulado[..., duracion_minutos:] - acumulado[..., :-duracion_minutos]
+    resultado[..., :MINUTOS_DIA - duracion_minutos + 1] = ventana == duracion_minutos
+    return resultado
+
+
+def inicios_validos_lote(agendas: List["AgendaBitmap"], duracion_minutos: int) -> List[np.ndarray]:
+    """
+    Calcular los inicios válidos de varias agendas del mismo rango en una sola
+    operación vectorizada (especialistas x días x minutos).
+    """
+    if not agendas:
+        return []
+    validos = _inicios_validos(np.stack([a.libre for a in agendas]), duracion_minutos)
+    return list(validos)
+
+
+def primeros_inicios(
+    agendas: List["AgendaBitmap"],
+    validos: List[np.ndarray],
+    duracion_minutos: int,
+    intervalo_minutos: int,
+    limite: int,
+    minuto_desde: int = 0
+) -> List[Tuple[int, int, int]]:
+    """
+    Primeros `limite` inicios libres de la grilla entre todas las agendas, en orden
+    cronológico (a igual hora, en el orden de `agendas`). `minuto_desde` descarta
+    los inicios anteriores a esa hora en el primer día del rango.
+    Devuelve tuplas (posición de la agenda, índice de día, minuto de inicio).
+    """
+    claves: List[np.ndarray] = []
+    origen: List[np.ndarray] = []
+    for pos, (agenda, matriz) in enumerate(zip(agendas, validos)):
+        dias, minutos = agenda.grilla(duracion_minutos, intervalo_minutos)
+        libres = matriz[dias, minutos] & ((dias > 0) | (minutos >= minuto_desde))
+        # Ventanas de horario solapadas pueden repetir inicios
+        clave = np.unique(dias[libres].astype(np.int64) * MINUTOS_DIA + minutos[libres])
+        claves.append(clave)
+        origen.append(np.full(clave.size, pos, dtype=np.int64))
+
+    if not claves:
+        return []
+    claves_total = np.concatenate(claves)
+    origen_total = np.concatenate(origen)
+    orden = np.lexsort((origen_total, claves_total))[:limite]
+
+    return [
+        (pos, *divmod(clave, MINUTOS_DIA))
+        for clave, pos in zip(claves_total[orden].tolist(), origen_total[orden].tolist())
+    ]
+
+
+def _alguno_en_ventana(matriz: np.ndarray, ancho: int) -> np.ndarray:
+    """[..., t] es True si hay algún True en [..., t : t + ancho] (recortado al final del día)"""
+    acumulado = np.zeros(matriz.shape[:-1] + (MINUTOS_DIA + 1,), dtype=np.int32)
+    np.cumsum(matriz, axis=-1, out=acumulado[..., 1:])
+    fin = np.minimum(np.arange(MINUTOS_DIA) + ancho, MINUTOS_DIA)
+    return (acumulado[..., fin] - acumulado[..., :MINUTOS_DIA]) > 0
+
+
+def cadenas_servicios(
+    agendas: List["AgendaBitmap"],
+    pasos: List[Tuple[List[int], int]],
+    max_espera_minutos: int,
+    intervalo_minutos: int,
+    limite: int,
+    minuto_desde: int = 0
+) -> List[Tuple[int, List[Tuple[int, int]]]]:
+    """
+    Primeras `limite` horas de inicio (en orden cronológico) desde las que se puede
+    encadenar una secuencia de servicios el mismo día, cada uno con un especialista
+    calificado y con a lo sumo `max_espera_minutos` entre el fin de uno y el inicio
+    del siguiente.
+
+    `pasos` trae, por servicio y en orden, (posiciones en `agendas` de quienes lo
+    atienden, duración). Se resuelve hacia atrás sobre las matrices de minutos:
+    alcanzable[k][e, d, m] indica que el paso k puede empezar en m con el
+    especialista e y que desde ahí se completa el resto de la cadena.
+    Devuelve (índice de día, [(posición de la agenda, minuto de inicio) por paso]);
+    al reconstruir se prefiere la menor espera y repetir especialista.
+    """
+    if not agendas or not pasos or any(not posiciones for posiciones, _ in pasos):
+        return []
+    libre = np.stack([a.libre for a in agendas])
+
+    alcanzable: List[np.ndarray] = [None] * len(pasos)
+    for k in range(len(pasos) - 1, -1, -1):
+        posiciones, duracion = pasos[k]
+        validos = _inicios_validos(libre[posiciones], duracion)
+        if k < len(pasos) - 1 and duracion < MINUTOS_DIA:
+            # Desde m, el siguiente paso debe empezar en [m + duración, m + duración + espera]
+            siguiente = _alguno_en_ventana(alcanzable[k + 1].any(axis=0), max_espera_minutos + 1)
+            puede_seguir = np.zeros_like(siguiente)
+            puede_seguir[:, :MINUTOS_DIA - duracion] = siguiente[:, duracion:]
+            validos &= puede_seguir[np.newaxis]
+        alcanzable[k] = validos
+
+    # Horas de inicio sobre la grilla de quienes atienden el primer servicio
+    posiciones, duracion = pasos[0]
+    primeros = [agendas[p] for p in posiciones]
+    inicios = primeros_inicios(
+        primeros, list(alcanzable[0]), duracion, intervalo_minutos,
+        limite * len(primeros), minuto_desde
+    )
+
+    cadenas: List[Tuple[int, List[Tuple[int, int]]]] = []
+    vistos = set()
+    for fila, dia, minuto in inicios:
+        if (dia, minuto) in vistos:
+            continue
+        vistos.add((dia, minuto))
+        cadena = [(posiciones[fila], minuto)]
+        t = minuto + duracion
+        for k in range(1, len(pasos)):
+            posiciones_k, duracion_k = pasos[k]
+            for inicio in range(t, min(t + max_espera_minutos, MINUTOS_DIA - 1) + 1):
+                filas = np.flatnonzero(alcanzable[k][:, dia, inicio])
+                if filas.size:
+                    candidatos = [posiciones_k[f] for f in filas.tolist()]
+                    anterior = cadena[-1][0]
+                    cadena.append((anterior if anterior in candidatos else candidatos[0], inicio))
+                    t = inicio + duracion_k
+                    break
+        cadenas.append((dia, cadena))
+        if len(cadenas) == limite:
+            break
+    return cadenas
+
+
+class AgendaBitmap:
+    """Disponibilidad de un especialista en un rango de fechas, a resolución de minuto"""
+
+    def __init__(self, fecha_inicio: date, fecha_fin: date):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.num_dias = max((fecha_fin - fecha_inicio).days + 1, 0)
+        forma = (self.num_dias, MINUTOS_DIA)
+        self.horario = np.zeros(forma, dtype=bool)
+        self.bloqueo = np.zeros(forma, dtype=bool)
+        self.ocupado = np.zeros(forma, dtype=bool)
+        # Ventanas de horario por día (para generar la grilla de slots)
+        self.ventanas: List[List[Tuple[int, int]]] = [[] for _ in range(self.num_dias)]
+
+    def fecha(self, indice: int) -> date:
+        return self.fecha_inicio + timedelta(days=indice)
+
+    def indice(self, fecha: date) -> Optional[int]:
+        i = (fecha - self.fecha_inicio).days
+        return i if 0 <= i < self.num_dias else None
+
+    # ----- Construcción -----
+
+    def aplicar_horarios(self, horarios: Iterable[HorarioEspecialista]) -> "AgendaBitmap":
+        por_dia: Dict[int, List[Tuple[int, int]]] = {}
+        for h in horarios:
+            if h.activo is False:
+                continue
+            por_dia.setdefault(h.dia_semana, []).append(rango_minutos(h.hora_inicio, h.hora_fin))
+
+        for i in range(self.num_dias):
+            ventanas = sorted(por_dia.get(dia_semana_app(self.fecha(i)), []))
+            self.ventanas[i] = ventanas
+            for inicio, fin in ventanas:
+                self.horario[i, inicio:fin] = True
+        return self
+
+    def aplicar_bloqueos(self, bloqueos: Iterable[BloqueoEspecialista]) -> "AgendaBitmap":
+        if self.num_dias == 0:
+            return self
+        reglas = ReglasBloqueo(bloqueos, self.fecha_inicio, self.fecha_fin)
+        for i in range(self.num_dias):
+            for inicio, fin in reglas.intervalos(self.fecha(i)):
+                self.bloqueo[i, inicio:fin] = True
+        return self
+
+    def aplicar_citas(self, citas: Iterable[Cita]) -> "AgendaBitmap":
+        for c in citas:
+            if c.estado in ESTADOS_CITA_INACTIVOS:
+                continue
+            i = self.indice(c.fecha)
+            if i is None:
+                continue
+            inicio, fin = rango_minutos(c.hora_inicio, c.hora_fin)
+            self.ocupado[i, inicio:fin] = True
+        return self
+
+    @classmethod
+    def desde_dias(cls, fecha_inicio: date, fecha_fin: date, dias: List[DiaAgenda]) -> "AgendaBitmap":
+        """
+        Reconstruir una agenda a partir de días calculados previamente. Las capas se
+        colapsan: `horario` guarda los minutos libres y `bloqueo`/`ocupado` quedan vacías.
+        """
+        agenda = cls(fecha_inicio, fecha_fin)
+        if dias:
+            agenda.horario[:] = np.unpackbits(np.stack([d.libre for d in dias]), axis=-1).astype(bool)
+        agenda.ventanas = [list(d.ventanas) for d in dias]
+        return agenda
+
+    def dia(self, indice: int) -> DiaAgenda:
+        libre = np.packbits(self.libre[indice])
+        libre.setflags(write=False)
+        return DiaAgenda(libre, tuple(self.ventanas[indice]))
+
+    # ----- Consultas -----
+
+    @property
+    def libre(self) -> np.ndarray:
+        return self.horario & ~self.bloqueo & ~self.ocupado
+
+    def minutos_horario(self, indice: int) -> int:
+        """Minutos de jornada del día (unión de ventanas; válido también desde caché)"""
+        inicios, fines = _fusionar(self.ventanas[indice])
+        return sum(fin - inicio for inicio, fin in zip(inicios, fines))
+
+    def inicios_validos(self, duracion_minutos: int) -> np.ndarray:
+        """
+        Matriz (días x 1440) donde [d, m] es True si hay `duracion_minutos` minutos
+        libres consecutivos empezando en el minuto m del día d.
+        """
+        return _inicios_validos(self.libre, duracion_minutos)
+
+    def grilla(self, duracion_minutos: int, intervalo_minutos: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Inicios candidatos: desde el comienzo de cada ventana de horario, cada
+        `intervalo_minutos`, mientras el servicio quepa en la ventana.
+        Devuelve (indices_dia, minutos_inicio) como arreglos paralelos.
+        """
+        dias: List[np.ndarray] = []
+        minutos: List[np.ndarray] = []
+        paso = max(intervalo_minutos, 1)
+        for i, ventanas in enumerate(self.ventanas):
+            for inicio, fin in ventanas:
+                candidatos = np.arange(inicio, fin - duracion_minutos + 1, paso, dtype=np.int32)
+                if candidatos.size:
+                    minutos.append(candidatos)
+                    dias.append(np.full(candidatos.size, i, dtype=np.int32))
+        if not minutos:
+            vacio = np.zeros(0, dtype=np.int32)
+            return vacio, vacio
+        return np.concatenate(dias), np.concatenate(minutos)
+
+    def slots(
+        self,
+        duracion_minutos: int,
+        intervalo_minutos: int,
+        validos: Optional[np.ndarray] = None
+    ) -> List[SlotDisponible]:
+        """
+        Slots de la grilla con su disponibilidad para un servicio de `duracion_minutos`.
+        `validos` permite reutilizar una matriz ya calculada (ver inicios_validos_lote).
+        """
+        dias, minutos = self.grilla(duracion_minutos, intervalo_minutos)
+        if dias.size == 0:
+            return []
+        if validos is None:
+            validos = self.inicios_validos(duracion_minutos)
+        disponibles = validos[dias, minutos]
+
+        fechas = [self.fecha(i) for i in range(self.num_dias)]
+        return [
+            SlotDisponible(
+                fecha=fechas[d],
+                hora_inicio=hora_desde_minuto(m),
+                hora_fin=hora_desde_minuto(m + duracion_minutos),
+                disponible=bool(ok)
+            )
+            for d, m, ok in zip(dias.tolist(), minutos.tolist(), disponibles.tolist())
+        ]
+
+    @classmethod
+    def construir(
+        cls,
+        fecha_inicio: date,
+        fecha_fin: date,
+        horarios: Iterable[HorarioEspecialista],
+        bloqueos: Iterable[BloqueoEspecialista],
+        citas: Iterable[Cita] = ()
+    ) -> "AgendaBitmap":
+        return cls(fecha_inicio, fecha_fin).aplicar_horarios(horarios).aplicar_bloqueos(bloqueos).aplicar_citas(citas)
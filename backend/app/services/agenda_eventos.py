@@ -0,0 +1,178 @@
+"""
+Canal de eventos de agenda por sede (push a las pantallas de recepción).
+
+CitaService publica un evento compacto después de cada escritura confirmada y
+GET /api/citas/eventos lo reenvía por SSE a los suscriptores de esa sede.
+
+Con Postgres el evento viaja por NOTIFY y cada worker de uvicorn lo recibe con un
+hilo en LISTEN, así una escritura hecha en un worker llega a las pantallas
+conectadas a cualquier otro. Con otros motores (SQLite en pruebas y local) el
+reparto es solo dentro del proceso.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from datetime import date, time as dt_time
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import func, select as sa_select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CANAL_POSTGRES = "agenda_eventos"
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, (date, dt_time)):
+        return valor.isoformat()
+    return valor
+
+
+def evento_cita(accion: str, cita) -> Dict[str, Any]:
+    """Evento compacto de una cita: lo justo para ubicarla en el calendario"""
+    return {
+        "tipo": "cita",
+        "accion": accion,
+        "id": cita.id,
+        "sede_id": cita.sede_id,
+        "especialista_id": cita.especialista_id,
+        "fecha": _serializar(cita.fecha),
+        "hora_inicio": _serializar(cita.hora_inicio),
+        "hora_fin": _serializar(cita.hora_fin),
+        "estado": cita.estado,
+    }
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado; vive en el event loop del endpoint"""
+
+    def __init__(self, sede_id: Optional[int], maxsize: int):
+        self.sede_id = sede_id
+        self.loop = asyncio.get_running_loop()
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def entregar(self, evento: Dict[str, Any]) -> None:
+        """Encolar desde el event loop; si el cliente no alcanza a leer se le pide resincronizar"""
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({"tipo": "resync"})
+
+
+class CanalAgenda:
+    """Suscriptores por sede del proceso actual y publicación de eventos"""
+
+    def __init__(self, maxsize_cola: int = 256):
+        self.maxsize_cola = maxsize_cola
+        self._suscripciones: Set[Suscripcion] = set()
+        self._lock = threading.Lock()
+        self._oyente: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Suscripción (desde el endpoint SSE)
+    # ------------------------------------------------------------------
+
+    def suscribir(self, sede_id: Optional[int]) -> Suscripcion:
+        """Suscribirse a una sede (None: todas). Debe llamarse dentro del event loop"""
+        suscripcion = Suscripcion(sede_id, self.maxsize_cola)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        self._iniciar_oyente()
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    @property
+    def suscriptores(self) -> int:
+        with self._lock:
+            return len(self._suscripciones)
+
+    # ------------------------------------------------------------------
+    # Publicación (desde CitaService, hilo del threadpool)
+    # ------------------------------------------------------------------
+
+    def publicar(self, db: Session, evento: Dict[str, Any]) -> None:
+        """
+        Publicar un evento ya confirmado en la BD. Nunca falla hacia quien escribe:
+        un problema del canal solo se registra en el log.
+        """
+        try:
+            bind = db.get_bind()
+            if bind.dialect.name == "postgresql":
+                # Conexión aparte para no expirar los objetos de la sesión con otro commit
+                with bind.connect() as conexion:
+                    conexion.execute(sa_select(func.pg_notify(CANAL_POSTGRES, json.dumps(evento))))
+                    conexion.commit()
+            else:
+                self.despachar(evento)
+        except Exception:
+            logger.exception("No se pudo publicar el evento de agenda")
+
+    def despachar(self, evento: Dict[str, Any]) -> None:
+        """Repartir un evento a los suscriptores locales de su sede (seguro entre hilos)"""
+        with self._lock:
+            destinos = [
+                s for s in self._suscripciones
+                if s.sede_id is None or s.sede_id == evento.get("sede_id")
+            ]
+        for suscripcion in destinos:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # Event loop cerrado: la conexión ya terminó
+                self.cancelar(suscripcion)
+
+    # ------------------------------------------------------------------
+    # LISTEN de Postgres (un hilo por worker, solo si hay suscriptores)
+    # ------------------------------------------------------------------
+
+    def _iniciar_oyente(self) -> None:
+        from ..database import engine
+        if engine.dialect.name != "postgresql":
+            return
+        with self._lock:
+            if self._oyente is not None and self._oyente.is_alive():
+                return
+            self._oyente = threading.Thread(
+                target=self._escuchar, args=(engine,), name="agenda-eventos", daemon=True
+            )
+            self._oyente.start()
+
+    def _escuchar(self, engine) -> None:
+        while True:
+            conexion = None
+            try:
+                conexion = engine.raw_connection()
+                conexion.detach()  # conexión dedicada, fuera del pool
+                pg = conexion.driver_connection
+                pg.autocommit = True
+                with pg.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL_POSTGRES}")
+                while True:
+                    if select.select([pg], [], [], 30) == ([], [], []):
+                        continue
+                    pg.poll()
+                    while pg.notifies:
+                        aviso = pg.notifies.pop(0)
+                        self.despachar(json.loads(aviso.payload))
+            except Exception:
+                logger.exception("Conexión LISTEN de agenda caída; reintentando")
+                if conexion is not None:
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+                time.sleep(5)
+
+
+agenda_eventos = CanalAgenda(maxsize_cola=settings.agenda_eventos_maxsize_cola)
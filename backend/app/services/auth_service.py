@@ -6,6 +6,7 @@ from ..utils.security import verify_password, get_password_hash
 from ..utils.jwt import create_access_token, create_refresh_token, verify_token
 from .password_service import PasswordService
 from .audit_service import AuditService
+from .session_service import SessionService
 from typing import Optional
 from sqlalchemy import or_
 from ..config import settings
@@ -56,6 +57,8 @@ class AuthService:
                 )
             
             db.commit()
+            if user.estado == "bloqueado":
+                SessionService.forget_user(user.id)
             return None
         
         # Reset failed attempts on successful login
@@ -97,6 +100,7 @@ class AuthService:
         AuditService.log_logout(db, user_id, ip)
         
         db.commit()
+        SessionService.forget_token(token)
     
     @staticmethod
     def logout_all(db: Session, user_id: int, ip: str = None):
@@ -107,6 +111,7 @@ class AuthService:
         AuditService.log(db, user_id, "logout_all", "auth", ip=ip)
         
         db.commit()
+        SessionService.forget_user(user_id)
     
     @staticmethod
     def refresh_access_token(db: Session, refresh_token: str) -> str:
@@ -160,3 +165,4 @@ class AuthService:
         AuditService.log_password_change(db, user.id, ip)
         
         db.commit()
+        SessionService.forget_user(user.id)
@@ -1,20 +1,32 @@
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 from fastapi import HTTPException, status
 
 from ..models.especialista import BloqueoEspecialista
 from ..schemas.especialista import BloqueoEspecialistaCreate, BloqueoEspecialistaUpdate
+from .disponibilidad_service import DisponibilidadService
 
 
 class BloqueoService:
     """Servicio para gestión de bloqueos puntuales y recurrentes"""
 
     @staticmethod
-    def get_by_especialista(db: Session, especialista_id: int) -> List[BloqueoEspecialista]:
-        """Listar todos los bloqueos de un especialista"""
-        return db.query(BloqueoEspecialista).filter(
+    def get_by_especialista(
+        db: Session,
+        especialista_id: int,
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None
+    ) -> List[BloqueoEspecialista]:
+        """Listar los bloqueos de un especialista, opcionalmente solo los que tocan un rango"""
+        query = db.query(BloqueoEspecialista).filter(
             BloqueoEspecialista.especialista_id == especialista_id
-        ).order_by(BloqueoEspecialista.fecha_inicio).all()
+        )
+        if fecha_hasta:
+            query = query.filter(BloqueoEspecialista.fecha_inicio <= fecha_hasta)
+        if fecha_desde:
+            query = query.filter(BloqueoEspecialista.fecha_fin >= fecha_desde)
+        return query.order_by(BloqueoEspecialista.fecha_inicio).all()
 
     @staticmethod
     def get_by_id(db: Session, bloqueo_id: int) -> BloqueoEspecialista:
@@ -47,6 +59,7 @@ class BloqueoService:
         db.add(db_bloqueo)
         db.commit()
         db.refresh(db_bloqueo)
+        DisponibilidadService.invalidar_agenda(especialista_id, db_bloqueo.fecha_inicio, db_bloqueo.fecha_fin)
         return db_bloqueo
 
     @staticmethod
@@ -78,17 +91,23 @@ class BloqueoService:
                     detail="Los bloqueos recurrentes requieren especificar días de semana"
                 )
 
+        rango_anterior = (db_bloqueo.fecha_inicio, db_bloqueo.fecha_fin)
         for field, value in update_data.items():
             setattr(db_bloqueo, field, value)
 
         db.commit()
         db.refresh(db_bloqueo)
+        # Liberar los días que cubría antes y marcar los que cubre ahora
+        DisponibilidadService.invalidar_agenda(db_bloqueo.especialista_id, *rango_anterior)
+        DisponibilidadService.invalidar_agenda(db_bloqueo.especialista_id, db_bloqueo.fecha_inicio, db_bloqueo.fecha_fin)
         return db_bloqueo
 
     @staticmethod
     def delete(db: Session, bloqueo_id: int) -> bool:
         """Eliminar bloqueo"""
         db_bloqueo = BloqueoService.get_by_id(db, bloqueo_id)
+        especialista_id, fecha_inicio, fecha_fin = db_bloqueo.especialista_id, db_bloqueo.fecha_inicio, db_bloqueo.fecha_fin
         db.delete(db_bloqueo)
         db.commit()
+        DisponibilidadService.invalidar_agenda(especialista_id, fecha_inicio, fecha_fin)
         return True
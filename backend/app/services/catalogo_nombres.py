@@ -0,0 +1,220 @@
+"""
+Resolución de nombres del catálogo (sedes, servicios, especialistas y métodos de pago)
+para el agente externo, sin recorrer las tablas con ILIKE en cada mensaje.
+
+Cada catálogo se guarda en memoria como un IndiceNombres con los nombres
+normalizados (sin tildes, minúsculas, solo letras y números). La búsqueda ordena
+por coincidencia exacta, luego mismas palabras en otro orden, luego prefijos o
+subcadena (lo que antes resolvía el ILIKE) y por último similitud de trigramas
+para errores de tipeo. Cualquier escritura confirmada sobre esos modelos invalida
+su índice; el TTL acota el desfase frente a escrituras de otros workers.
+"""
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.caja import MetodoPago
+from ..models.especialista import Especialista
+from ..models.sede import Sede
+from ..models.servicio import Servicio
+from ..utils.cache import TTLCache
+
+# Similitud mínima de trigramas para aceptar una coincidencia aproximada
+UMBRAL_SIMILITUD = 0.3
+
+catalogo_cache = TTLCache(settings.catalogo_cache_ttl_seconds, maxsize=16)
+
+_MODELOS_CATALOGO = {
+    Sede: "sede",
+    Servicio: "servicio",
+    Especialista: "especialista",
+    MetodoPago: "metodo_pago",
+}
+
+
+def normalizar_nombre(texto: Optional[str]) -> str:
+    """'  Peluquería  CALI-Norte ' -> 'peluqueria cali norte'"""
+    if not texto:
+        return ""
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", sin_tildes.lower()).split())
+
+
+def trigramas(normalizado: str) -> FrozenSet[str]:
+    """Trigramas por palabra con el mismo relleno que pg_trgm ('  a', ' an', 'ana', 'na ')"""
+    resultado = set()
+    for palabra in normalizado.split():
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(resultado)
+
+
+def similitud(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Entrada:
+    __slots__ = ("id", "normalizado", "palabras", "ordenado", "trigramas")
+
+    def __init__(self, id_: int, nombre: str):
+        self.id = id_
+        self.normalizado = normalizar_nombre(nombre)
+        self.palabras = self.normalizado.split()
+        self.ordenado = " ".join(sorted(self.palabras))
+        self.trigramas = trigramas(self.normalizado)
+
+
+class IndiceNombres:
+    """Nombres normalizados de un catálogo, agrupados (p. ej. por sede)"""
+
+    def __init__(self, filas: Iterable[Tuple[int, str, Optional[int]]]):
+        self._grupos: Dict[Optional[int], List[_Entrada]] = {}
+        for id_, nombre, grupo in filas:
+            entrada = _Entrada(id_, nombre)
+            if entrada.normalizado:
+                self._grupos.setdefault(grupo, []).append(entrada)
+
+    def __len__(self) -> int:
+        return sum(len(e) for e in self._grupos.values())
+
+    def buscar(self, consulta: str, grupo: Optional[int] = None, limite: int = 5) -> List[Tuple[int, float]]:
+        """
+        Candidatos (id, puntaje) de mejor a peor. Con grupo=None se busca en todos.
+        El puntaje es el nivel de coincidencia (4 exacta, 3 mismas palabras, 2 prefijo
+        o subcadena, 1 aproximada) más la similitud de trigramas para desempatar.
+        """
+        normalizado = normalizar_nombre(consulta)
+        if not normalizado:
+            return []
+        palabras = normalizado.split()
+        ordenado = " ".join(sorted(palabras))
+        tri = trigramas(normalizado)
+
+        if grupo is None:
+            entradas = [e for lista in self._grupos.values() for e in lista]
+        else:
+            entradas = self._grupos.get(grupo, [])
+
+        candidatos = []
+        for e in entradas:
+            sim = similitud(tri, e.trigramas)
+            if e.normalizado == normalizado:
+                nivel = 4
+            elif e.ordenado == ordenado:
+                nivel = 3
+            elif normalizado in e.normalizado or _palabras_son_prefijos(palabras, e.palabras):
+                nivel = 2
+            elif sim >= UMBRAL_SIMILITUD:
+                nivel = 1
+            else:
+                continue
+            candidatos.append((nivel + sim, len(e.normalizado), e.id))
+
+        candidatos.sort(key=lambda c: (-c[0], c[1], c[2]))
+        return [(id_, puntaje) for puntaje, _, id_ in candidatos[:limite]]
+
+    def mejor(self, consulta: str, grupo: Optional[int] = None) -> Optional[int]:
+        candidatos = self.buscar(consulta, grupo, limite=1)
+        return candidatos[0][0] if candidatos else None
+
+
+def _palabras_son_prefijos(consulta: List[str], nombre: List[str]) -> bool:
+    """Cada palabra de la consulta es prefijo de una palabra distinta del nombre"""
+    libres = list(nombre)
+    for palabra in consulta:
+        for i, candidata in enumerate(libres):
+            if candidata.startswith(palabra):
+                del libres[i]
+                break
+        else:
+            return False
+    return True
+
+
+class CatalogoNombres:
+    """Resolución de nombres del catálogo con índices en caché"""
+
+    @staticmethod
+    def indice(db: Session, tipo: str) -> IndiceNombres:
+        return catalogo_cache.get_or_load(tipo, lambda: CatalogoNombres._construir(db, tipo))
+
+    @staticmethod
+    def _construir(db: Session, tipo: str) -> IndiceNombres:
+        if tipo == "sede":
+            filas = (
+                (id_, nombre, None)
+                for id_, nombre in db.query(Sede.id, Sede.nombre).filter(Sede.estado == "activa")
+            )
+        elif tipo == "servicio":
+            filas = db.query(Servicio.id, Servicio.nombre, Servicio.sede_id)
+        elif tipo == "especialista":
+            filas = (
+                (id_, f"{nombre} {apellido or ''}", sede_id)
+                for id_, nombre, apellido, sede_id in db.query(
+                    Especialista.id, Especialista.nombre, Especialista.apellido, Especialista.sede_id
+                ).filter(Especialista.estado == "activo")
+            )
+        elif tipo == "metodo_pago":
+            filas = (
+                (id_, nombre, None)
+                for id_, nombre in db.query(MetodoPago.id, MetodoPago.nombre).filter(MetodoPago.activo == True)
+            )
+        else:
+            raise ValueError(f"Catálogo desconocido: {tipo}")
+        return IndiceNombres(filas)
+
+    @staticmethod
+    def resolver_sede(db: Session, nombre: str) -> Optional[int]:
+        return CatalogoNombres.indice(db, "sede").mejor(nombre)
+
+    @staticmethod
+    def resolver_servicio(db: Session, nombre: str, sede_id: int) -> Optional[int]:
+        return CatalogoNombres.indice(db, "servicio").mejor(nombre, sede_id)
+
+    @staticmethod
+    def resolver_especialista(db: Session, nombre: str, sede_id: int) -> Optional[int]:
+        return CatalogoNombres.indice(db, "especialista").mejor(nombre, sede_id)
+
+    @staticmethod
+    def resolver_metodo_pago(db: Session, nombre: str) -> Optional[int]:
+        return CatalogoNombres.indice(db, "metodo_pago").mejor(nombre)
+
+    @staticmethod
+    def invalidar(*tipos: str) -> None:
+        for tipo in tipos or _MODELOS_CATALOGO.values():
+            catalogo_cache.invalidate(tipo)
+
+
+# ============================================
+# INVALIDACIÓN POR ESCRITURAS
+# ============================================
+# Se anotan los catálogos tocados en cada flush y se invalidan solo si la
+# transacción se confirma, sin importar qué servicio o router hizo el cambio.
+
+@event.listens_for(Session, "after_flush")
+def _anotar_catalogos(session, flush_context):
+    tocados = {
+        _MODELOS_CATALOGO[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in _MODELOS_CATALOGO
+    }
+    if tocados:
+        session.info.setdefault("catalogos_tocados", set()).update(tocados)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_catalogos(session):
+    tocados = session.info.pop("catalogos_tocados", None)
+    if tocados:
+        CatalogoNombres.invalidar(*tocados)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_catalogos(session):
+    session.info.pop("catalogos_tocados", None)
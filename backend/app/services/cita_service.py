@@ -1,9 +1,10 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
+from sqlalchemy.orm import Session, Query, joinedload
+from sqlalchemy import and_, or_, func
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import date, time, datetime, timedelta
 
-from ..models.cita import Cita
+from ..models.cita import Cita, CitaEliminada, MENSAJE_CITA_SOLAPADA
 from ..models.cliente import Cliente
 from ..models.especialista import Especialista
 from ..models.servicio import Servicio
@@ -11,7 +12,14 @@ from ..schemas.cita import CitaCreate, CitaUpdate
 from ..schemas.abono import AbonoCreate
 from ..services.abono_service import AbonoService
 from ..services.caja_service import CajaService
+from ..services.disponibilidad_service import DisponibilidadService
+from ..services.agenda_eventos import agenda_eventos, evento_cita
+from ..services.agenda_bitmap import ESTADOS_CITA_INACTIVOS, MINUTOS_DIA, minuto_del_dia, rango_minutos
+from ..services import cliente_estadisticas  # noqa: F401  mantiene visitas y gasto al confirmar
+from ..config import settings
 from decimal import Decimal
+from bisect import bisect_left
+import hashlib
 
 
 class CitaService:
@@ -23,17 +31,23 @@ class CitaService:
         return db.query(Cita).filter(Cita.id == cita_id).first()
     
     @staticmethod
-    def get_by_fecha(
-        db: Session,
+    def _con_relaciones(query: Query) -> Query:
+        """Cargar cliente, especialista y servicio en la misma consulta (evita N+1 en listados)"""
+        return query.options(
+            joinedload(Cita.cliente),
+            joinedload(Cita.especialista),
+            joinedload(Cita.servicio)
+        )
+    
+    @staticmethod
+    def _filtrar_por_fecha(
+        query: Query,
         fecha_inicio: date,
         fecha_fin: Optional[date] = None,
         especialista_id: Optional[int] = None,
         estado: Optional[str] = None,
         sede_id: Optional[int] = None
-    ) -> List[Cita]:
-        """Obtener citas por rango de fechas"""
-        query = db.query(Cita)
-        
+    ) -> Query:
         if sede_id:
             query = query.filter(Cita.sede_id == sede_id)
         
@@ -48,19 +62,191 @@ class CitaService:
         if estado:
             query = query.filter(Cita.estado == estado)
         
-        return query.order_by(Cita.fecha, Cita.hora_inicio).all()
+        return query.order_by(Cita.fecha, Cita.hora_inicio)
+    
+    @staticmethod
+    def get_by_fecha(
+        db: Session,
+        fecha_inicio: date,
+        fecha_fin: Optional[date] = None,
+        especialista_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        sede_id: Optional[int] = None
+    ) -> List[Cita]:
+        """Obtener citas por rango de fechas (con sus relaciones ya cargadas)"""
+        query = CitaService._con_relaciones(db.query(Cita))
+        return CitaService._filtrar_por_fecha(
+            query, fecha_inicio, fecha_fin, especialista_id, estado, sede_id
+        ).all()
+    
+    @staticmethod
+    def get_calendario_columnar(
+        db: Session,
+        fecha_inicio: date,
+        fecha_fin: Optional[date] = None,
+        especialista_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        sede_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Citas del rango en columnas paralelas, con especialistas y servicios en tablas
+        de referencia por id en lugar de repetir nombre y color en cada cita.
+        Una sola consulta de columnas, sin construir objetos ORM.
+        """
+        query = db.query(
+            Cita.id, Cita.cliente_id, Cita.especialista_id, Cita.servicio_id,
+            Cita.fecha, Cita.hora_inicio, Cita.hora_fin, Cita.duracion_minutos,
+            Cita.estado, Cita.notas, Cita.lizto_reservation_id,
+            Cliente.nombre.label("cliente_nombre"),
+            Cliente.apellido.label("cliente_apellido"),
+            Cliente.telefono.label("cliente_telefono"),
+            Especialista.nombre.label("especialista_nombre"),
+            Especialista.apellido.label("especialista_apellido"),
+            Servicio.nombre.label("servicio_nombre"),
+            Servicio.color_calendario.label("servicio_color")
+        ).outerjoin(
+            Cliente, Cliente.id == Cita.cliente_id
+        ).outerjoin(
+            Especialista, Especialista.id == Cita.especialista_id
+        ).outerjoin(
+            Servicio, Servicio.id == Cita.servicio_id
+        )
+        filas = CitaService._filtrar_por_fecha(
+            query, fecha_inicio, fecha_fin, especialista_id, estado, sede_id
+        ).all()
+        
+        campos = (
+            "id", "cliente_id", "especialista_id", "servicio_id", "fecha", "hora_inicio",
+            "hora_fin", "duracion_minutos", "estado", "notas", "lizto_reservation_id"
+        )
+        columnas: Dict[str, list] = {campo: [] for campo in campos}
+        columnas["cliente_nombre"] = []
+        columnas["cliente_telefono"] = []
+        especialistas: Dict[int, dict] = {}
+        servicios: Dict[int, dict] = {}
+        
+        for fila in filas:
+            for campo in campos:
+                columnas[campo].append(getattr(fila, campo))
+            columnas["cliente_nombre"].append(
+                f"{fila.cliente_nombre} {fila.cliente_apellido or ''}".strip() if fila.cliente_nombre else "Desconocido"
+            )
+            columnas["cliente_telefono"].append(fila.cliente_telefono)
+            if fila.especialista_id is not None and fila.especialista_id not in especialistas:
+                especialistas[fila.especialista_id] = {
+                    "nombre": f"{fila.especialista_nombre} {fila.especialista_apellido or ''}".strip()
+                    if fila.especialista_nombre else "Sin asignar"
+                }
+            if fila.servicio_id is not None and fila.servicio_id not in servicios:
+                servicios[fila.servicio_id] = {
+                    "nombre": fila.servicio_nombre or "Sin servicio",
+                    "color": fila.servicio_color
+                }
+        
+        return {
+            "total": len(filas),
+            "citas": columnas,
+            "especialistas": especialistas,
+            "servicios": servicios
+        }
+    
+    @staticmethod
+    def get_cambios(
+        db: Session,
+        fecha_inicio: date,
+        fecha_fin: Optional[date] = None,
+        especialista_id: Optional[int] = None,
+        sede_id: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Cambios de la agenda desde el cursor (sincronización incremental).
+        
+        Sin cursor, o con uno más viejo que la retención, devuelve la agenda completa
+        del rango (completo=True). Con cursor devuelve las citas creadas o modificadas
+        desde entonces y los ids que el cliente debe quitar de su vista: eliminadas o
+        movidas fuera del rango/especialista consultado. Se vuelve a revisar un margen
+        antes del cursor, así que una cita puede llegar repetida (el cliente reemplaza
+        por id). Retorna (respuesta, etag); el etag es un hash del contenido.
+        """
+        fecha_fin = fecha_fin or fecha_inicio
+        desde = None
+        if cursor:
+            try:
+                desde = datetime.fromisoformat(cursor)
+            except ValueError:
+                raise ValueError("Cursor inválido")
+        
+        ahora = db.query(func.now()).scalar()
+        if desde is not None:
+            # Misma convención de zona horaria que devuelve la BD (SQLite: sin zona)
+            if (desde.tzinfo is None) != (ahora.tzinfo is None):
+                desde = desde.replace(tzinfo=ahora.tzinfo)
+            if desde < ahora - timedelta(days=settings.agenda_sync_retencion_dias):
+                desde = None
+        
+        if desde is None:
+            citas = CitaService.get_by_fecha(
+                db, fecha_inicio, fecha_fin, especialista_id=especialista_id, sede_id=sede_id
+            )
+            respuesta = {
+                "cursor": ahora.isoformat(),
+                "completo": True,
+                "citas": [CitaService.format_cita_list(c) for c in citas],
+                "eliminadas": []
+            }
+        else:
+            revisar_desde = desde - timedelta(seconds=settings.agenda_sync_margen_segundos)
+            query = CitaService._con_relaciones(db.query(Cita)).filter(
+                Cita.fecha_actualizacion >= revisar_desde
+            )
+            eliminadas_query = db.query(CitaEliminada.cita_id, CitaEliminada.fecha_eliminacion).filter(
+                CitaEliminada.fecha_eliminacion >= revisar_desde
+            )
+            if sede_id:
+                query = query.filter(Cita.sede_id == sede_id)
+                eliminadas_query = eliminadas_query.filter(CitaEliminada.sede_id == sede_id)
+            
+            citas, fuera_de_vista = [], []
+            nuevo_cursor = desde
+            # El filtro de rango se aplica aquí y no en SQL: una cita movida a otra
+            # fecha o especialista también debe salir de la vista del cliente
+            for cita in query.order_by(Cita.fecha, Cita.hora_inicio).all():
+                if fecha_inicio <= cita.fecha <= fecha_fin and (
+                    not especialista_id or cita.especialista_id == especialista_id
+                ):
+                    citas.append(cita)
+                else:
+                    fuera_de_vista.append(cita.id)
+                if cita.fecha_actualizacion and cita.fecha_actualizacion > nuevo_cursor:
+                    nuevo_cursor = cita.fecha_actualizacion
+            eliminadas = []
+            for cita_id, fecha_eliminacion in eliminadas_query.all():
+                eliminadas.append(cita_id)
+                if fecha_eliminacion > nuevo_cursor:
+                    nuevo_cursor = fecha_eliminacion
+            
+            respuesta = {
+                "cursor": nuevo_cursor.isoformat(),
+                "completo": False,
+                "citas": [CitaService.format_cita_list(c) for c in citas],
+                "eliminadas": sorted(set(eliminadas + fuera_de_vista))
+            }
+        
+        etag = f'W/"{hashlib.sha1(repr(respuesta).encode()).hexdigest()}"'
+        return respuesta, etag
     
     @staticmethod
     def get_by_cliente(db: Session, cliente_id: int, limit: int = 50) -> List[Cita]:
         """Obtener citas de un cliente"""
-        return db.query(Cita).filter(
+        return CitaService._con_relaciones(db.query(Cita)).filter(
             Cita.cliente_id == cliente_id
         ).order_by(Cita.fecha.desc(), Cita.hora_inicio.desc()).limit(limit).all()
     
     @staticmethod
     def get_by_especialista(db: Session, especialista_id: int, fecha: date) -> List[Cita]:
         """Obtener citas de un especialista en una fecha"""
-        return db.query(Cita).filter(
+        return CitaService._con_relaciones(db.query(Cita)).filter(
             Cita.especialista_id == especialista_id,
             Cita.fecha == fecha,
             Cita.estado.notin_(['cancelada', 'no_show'])
@@ -121,14 +307,18 @@ class CitaService:
             hora_inicio=hora_inicio,
             hora_fin=hora_fin,
             duracion_minutos=duracion,
-            precio=servicio.precio_base,
+            precio=int(servicio.precio_base or 0),
             notas=cita_data.notas,
             estado='agendada'
         )
         
         db.add(cita)
-        db.commit()
+        # La verificación anterior es la ruta rápida; la BD garantiza que dos
+        # reservas concurrentes no queden solapadas
+        CitaService._commit_sin_solapamiento(db)
         db.refresh(cita)
+        DisponibilidadService.invalidar_agenda(cita.especialista_id, cita.fecha)
+        agenda_eventos.publicar(db, evento_cita("creada", cita))
         
         # -----------------------------------------------------------
         # Crear Abono si se proporcionó monto_abono
@@ -172,12 +362,154 @@ class CitaService:
                     )
                 except Exception as e:
                     # Si falla el abono, hacemos rollback de la cita para informar al usuario del error
+                    evento = evento_cita("eliminada", cita)
+                    CitaService._registrar_eliminacion(db, cita)
                     db.delete(cita)
                     db.commit()
+                    DisponibilidadService.invalidar_agenda(cita_data.especialista_id, cita_data.fecha)
+                    agenda_eventos.publicar(db, evento)
                     raise ValueError(f"Error al registrar el abono: {str(e)}")
 
         return cita
     
+    @staticmethod
+    def crear_lote(
+        db: Session,
+        citas_data: List[CitaCreate],
+        usuario_id: int,
+        sede_id: int,
+        todo_o_nada: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Crear varias citas en una transacción (importaciones de campañas, reservas
+        múltiples del bot). Retorna un resultado por ítem, en el orden recibido:
+        {"indice", "ok", "cita_id", "error"}.
+        
+        Servicios, clientes y especialistas se cargan en tres consultas y las citas
+        existentes de los (especialista, fecha) involucrados en una cuarta. Los
+        solapamientos se revisan con un barrido por (especialista, fecha): contra la BD
+        y entre las citas del lote, donde gana la que empieza primero (a igual hora,
+        la que viene antes en el lote). Con todo_o_nada no se crea nada si algún
+        ítem falla. Los abonos no se procesan en lote.
+        """
+        resultados: List[Dict[str, Any]] = [
+            {"indice": i, "ok": False, "cita_id": None, "error": None}
+            for i in range(len(citas_data))
+        ]
+        
+        def ids(campo):
+            return {getattr(c, campo) for c in citas_data}
+        
+        servicios = {s.id: s for s in db.query(Servicio).filter(Servicio.id.in_(ids("servicio_id")))}
+        clientes = {cid for (cid,) in db.query(Cliente.id).filter(Cliente.id.in_(ids("cliente_id")))}
+        especialistas = {eid for (eid,) in db.query(Especialista.id).filter(Especialista.id.in_(ids("especialista_id")))}
+        
+        # Validación de referencias y rango en minutos de cada candidata
+        candidatas: Dict[Tuple[int, date], List[Tuple[int, int, int]]] = {}
+        for i, cita_data in enumerate(citas_data):
+            servicio = servicios.get(cita_data.servicio_id)
+            if not servicio:
+                resultados[i]["error"] = "Servicio no encontrado"
+            elif cita_data.cliente_id not in clientes:
+                resultados[i]["error"] = "Cliente no encontrado"
+            elif cita_data.especialista_id not in especialistas:
+                resultados[i]["error"] = "Especialista no encontrado"
+            elif cita_data.monto_abono:
+                resultados[i]["error"] = "Los abonos no se admiten en la creación masiva"
+            else:
+                inicio = minuto_del_dia(cita_data.hora_inicio)
+                fin = min(inicio + servicio.duracion_minutos, MINUTOS_DIA)
+                candidatas.setdefault((cita_data.especialista_id, cita_data.fecha), []).append((inicio, fin, i))
+        
+        # Citas activas de los mismos especialistas y fechas, en una consulta
+        ocupadas: Dict[Tuple[int, date], List[Tuple[int, int]]] = {}
+        if candidatas:
+            existentes = db.query(
+                Cita.especialista_id, Cita.fecha, Cita.hora_inicio, Cita.hora_fin
+            ).filter(
+                Cita.especialista_id.in_({k[0] for k in candidatas}),
+                Cita.fecha.in_({k[1] for k in candidatas}),
+                Cita.estado.notin_(ESTADOS_CITA_INACTIVOS)
+            )
+            for esp_id, fecha, hora_inicio, hora_fin in existentes:
+                if (esp_id, fecha) in candidatas:
+                    ocupadas.setdefault((esp_id, fecha), []).append(rango_minutos(hora_inicio, hora_fin))
+        
+        # Barrido por (especialista, fecha). Las existentes pueden solaparse entre sí
+        # (filas anteriores a la migración 008), así que no basta la vecina: una
+        # candidata choca si alguna existente que empieza antes de su fin termina
+        # después de su inicio, es decir, si el mayor fin de ese prefijo pasa su
+        # inicio. De las aceptadas del lote también basta el mayor fin.
+        aceptadas: List[int] = []
+        for clave, items in candidatas.items():
+            existentes_ord = sorted(ocupadas.get(clave, []))
+            inicios_existentes = [e[0] for e in existentes_ord]
+            # mayor_fin[k]: mayor fin entre las k existentes que empiezan primero
+            mayor_fin = [-1]
+            for _, fin_existente in existentes_ord:
+                mayor_fin.append(max(mayor_fin[-1], fin_existente))
+            fin_lote = -1
+            for inicio, fin, i in sorted(items):
+                if mayor_fin[bisect_left(inicios_existentes, fin)] > inicio:
+                    resultados[i]["error"] = "El especialista ya tiene una cita a esa hora"
+                elif fin_lote > inicio:
+                    resultados[i]["error"] = "Se solapa con otra cita del lote"
+                else:
+                    aceptadas.append(i)
+                    fin_lote = fin
+        
+        if todo_o_nada and len(aceptadas) < len(citas_data):
+            for r in resultados:
+                if r["error"] is None:
+                    r["error"] = "No creada: el lote tiene errores"
+            return resultados
+        
+        nuevas: Dict[int, Cita] = {}
+        for i in sorted(aceptadas):
+            cita_data = citas_data[i]
+            servicio = servicios[cita_data.servicio_id]
+            dt_inicio = datetime.combine(cita_data.fecha, cita_data.hora_inicio)
+            nuevas[i] = Cita(
+                cliente_id=cita_data.cliente_id,
+                especialista_id=cita_data.especialista_id,
+                servicio_id=cita_data.servicio_id,
+                sede_id=sede_id,
+                fecha=cita_data.fecha,
+                hora_inicio=cita_data.hora_inicio,
+                hora_fin=(dt_inicio + timedelta(minutes=servicio.duracion_minutos)).time(),
+                duracion_minutos=servicio.duracion_minutos,
+                precio=int(servicio.precio_base or 0),
+                notas=cita_data.notas,
+                estado='agendada'
+            )
+        
+        db.add_all(nuevas.values())
+        try:
+            CitaService._commit_sin_solapamiento(db)
+        except ValueError:
+            # Una reserva concurrente ocupó algún horario entre la lectura y el
+            # commit: se reintenta ítem por ítem con savepoints
+            if todo_o_nada:
+                for r in resultados:
+                    r["error"] = r["error"] or "No creada: el lote tiene errores"
+                return resultados
+            for i, cita in list(nuevas.items()):
+                try:
+                    with db.begin_nested():
+                        db.add(cita)
+                except IntegrityError:
+                    resultados[i]["error"] = "El especialista ya tiene una cita a esa hora"
+                    del nuevas[i]
+            db.commit()
+        
+        for i, cita in nuevas.items():
+            resultados[i].update(ok=True, cita_id=cita.id)
+        for especialista_id, fecha in {(c.especialista_id, c.fecha) for c in nuevas.values()}:
+            DisponibilidadService.invalidar_agenda(especialista_id, fecha)
+        for cita in nuevas.values():
+            agenda_eventos.publicar(db, evento_cita("creada", cita))
+        return resultados
+    
     @staticmethod
     def actualizar(db: Session, cita_id: int, cita_data: CitaUpdate) -> Optional[Cita]:
         """Actualizar una cita"""
@@ -186,13 +518,14 @@ class CitaService:
             return None
         
         update_data = cita_data.model_dump(exclude_unset=True)
+        agenda_anterior = (cita.especialista_id, cita.fecha)
         
         # Si se cambia el servicio, recalcular duración, precio y hora_fin
         if 'servicio_id' in update_data:
             servicio = db.query(Servicio).filter(Servicio.id == update_data['servicio_id']).first()
             if servicio:
                 update_data['duracion_minutos'] = servicio.duracion_minutos
-                update_data['precio'] = servicio.precio_base
+                update_data['precio'] = int(servicio.precio_base or 0)
                 
                 # Recalcular hora_fin con la nueva duración
                 hora_inicio = update_data.get('hora_inicio', cita.hora_inicio)
@@ -213,8 +546,12 @@ class CitaService:
         for field, value in update_data.items():
             setattr(cita, field, value)
         
-        db.commit()
+        CitaService._commit_sin_solapamiento(db)
         db.refresh(cita)
+        DisponibilidadService.invalidar_agenda(*agenda_anterior)
+        if (cita.especialista_id, cita.fecha) != agenda_anterior:
+            DisponibilidadService.invalidar_agenda(cita.especialista_id, cita.fecha)
+        agenda_eventos.publicar(db, evento_cita("actualizada", cita))
         return cita
     
     @staticmethod
@@ -228,8 +565,10 @@ class CitaService:
         if notas:
             cita.notas_internas = notas
         
-        db.commit()
+        CitaService._commit_sin_solapamiento(db)
         db.refresh(cita)
+        DisponibilidadService.invalidar_agenda(cita.especialista_id, cita.fecha)
+        agenda_eventos.publicar(db, evento_cita("actualizada", cita))
         return cita
     
     @staticmethod
@@ -242,10 +581,37 @@ class CitaService:
         if cita.estado in ['completada', 'cliente_llego']:
             raise ValueError("No se puede eliminar una cita completada o cuando el cliente ya llegó")
         
+        especialista_id, fecha = cita.especialista_id, cita.fecha
+        evento = evento_cita("eliminada", cita)
+        CitaService._registrar_eliminacion(db, cita)
         db.delete(cita)
         db.commit()
+        DisponibilidadService.invalidar_agenda(especialista_id, fecha)
+        agenda_eventos.publicar(db, evento)
         return True
     
+    @staticmethod
+    def _registrar_eliminacion(db: Session, cita: Cita) -> None:
+        """Dejar constancia de la eliminación para GET /api/citas/cambios (misma transacción)"""
+        db.add(CitaEliminada(
+            cita_id=cita.id,
+            sede_id=cita.sede_id,
+            especialista_id=cita.especialista_id,
+            fecha=cita.fecha
+        ))
+    
+    @staticmethod
+    def _commit_sin_solapamiento(db: Session) -> None:
+        """Confirmar la transacción; si la BD rechaza un solapamiento se informa como ValueError"""
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            mensaje = str(e.orig)
+            if "excl_citas_solapadas" in mensaje or MENSAJE_CITA_SOLAPADA in mensaje:
+                raise ValueError("El especialista ya tiene una cita a esa hora")
+            raise
+    
     @staticmethod
     def format_cita_list(cita: Cita) -> dict:
         """Formatear cita para respuesta de lista"""
@@ -0,0 +1,275 @@
+"""
+Búsqueda de clientes por nombre, apellido, teléfono, cédula o email.
+
+Cada cliente guarda en `clientes.busqueda` un texto normalizado: nombre, apellido y
+email sin tildes ni signos, teléfono y cédula solo con letras y dígitos. La consulta
+se normaliza igual y se parte en términos; todos deben aparecer, los de 3 o más
+caracteres como subcadena y los más cortos como inicio de palabra ("an" encuentra
+"Ana" pero no "Juliana"). Una consulta que solo tiene dígitos y separadores
+("+57 300-123") se busca como un único número.
+
+- Postgres: índice GIN pg_trgm sobre `busqueda` (db/migraciones/010); los LIKE
+  '%termino%' usan el índice y el orden es por similarity().
+- Otros motores (SQLite en pruebas y local): índice invertido de trigramas en
+  memoria por sede, en caché e invalidado al confirmar escrituras de clientes.
+
+Orden de relevancia: primero los nombres que empiezan por la consulta, luego los que
+tienen palabras que empiezan por cada término y al final las coincidencias parciales.
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.cliente import Cliente
+from ..utils.cache import TTLCache
+from .catalogo_nombres import normalizar_nombre
+
+# Términos más cortos se buscan como inicio de palabra (pg_trgm tampoco indexa menos de 3)
+LARGO_SUBCADENA = 3
+
+clientes_busqueda_cache = TTLCache(settings.clientes_busqueda_cache_ttl_seconds, maxsize=64)
+
+_SOLO_NUMERO = re.compile(r"[\d\s\-\+\(\)\.]+")
+
+
+def solo_alfanumerico(texto: Optional[str]) -> str:
+    """' 1.094-555 ' -> '1094555'; conserva letras para documentos como pasaportes"""
+    return re.sub(r"[^a-z0-9]", "", normalizar_nombre(texto).replace(" ", ""))
+
+
+def texto_busqueda(
+    nombre: Optional[str],
+    apellido: Optional[str] = None,
+    cedula: Optional[str] = None,
+    telefono: Optional[str] = None,
+    email: Optional[str] = None
+) -> str:
+    """Texto normalizado que se guarda en clientes.busqueda (empieza por nombre y apellido)"""
+    partes = [
+        normalizar_nombre(nombre),
+        normalizar_nombre(apellido),
+        solo_alfanumerico(cedula),
+        solo_alfanumerico(telefono),
+        normalizar_nombre(email),
+    ]
+    return " ".join(p for p in partes if p)
+
+
+def terminos_busqueda(consulta: Optional[str]) -> List[str]:
+    """Términos normalizados de una consulta; un número con separadores queda como un solo término"""
+    if not consulta or not consulta.strip():
+        return []
+    if _SOLO_NUMERO.fullmatch(consulta.strip()):
+        digitos = re.sub(r"\D", "", consulta)
+        return [digitos] if digitos else []
+    return normalizar_nombre(consulta).split()
+
+
+def filtro_busqueda(terminos: List[str]):
+    """Condición SQL sobre clientes.busqueda (usa el índice pg_trgm en Postgres)"""
+    condiciones = []
+    for termino in terminos:
+        # Los términos ya están normalizados a [a-z0-9]: no pueden traer comodines
+        if len(termino) >= LARGO_SUBCADENA:
+            condiciones.append(Cliente.busqueda.like(f"%{termino}%"))
+        else:
+            condiciones.append(or_(
+                Cliente.busqueda.like(f"{termino}%"),
+                Cliente.busqueda.like(f"% {termino}%")
+            ))
+    return and_(*condiciones)
+
+
+def _gramas(texto: str) -> set:
+    """Trigramas del texto con un espacio inicial más el bigrama de inicio de cada palabra"""
+    gramas = {texto[i:i + 3] for i in range(len(texto) - 2)}
+    gramas.update(" " + palabra[0] for palabra in texto.split())
+    return gramas
+
+
+def _gramas_termino(termino: str, como_prefijo: bool) -> List[str]:
+    """Gramas que debe contener todo texto que tenga el término (como subcadena o inicio de palabra)"""
+    if como_prefijo or len(termino) < LARGO_SUBCADENA:
+        termino = " " + termino
+    if len(termino) == 2:
+        return [termino]
+    return [termino[i:i + 3] for i in range(len(termino) - 2)]
+
+
+class IndiceClientes:
+    """
+    Índice invertido de trigramas de una sede. Las posiciones siguen el orden del
+    texto normalizado, así los resultados de cada nivel salen en orden alfabético y
+    los que empiezan por la consulta forman un bloque contiguo (búsqueda binaria).
+    """
+
+    def __init__(self, filas: Iterable[Tuple[int, str, bool]]):
+        ordenadas = sorted(((" " + texto, id_, activo) for id_, texto, activo in filas if texto))
+        self.textos: List[str] = [texto for texto, _, _ in ordenadas]
+        self.ids = np.fromiter((id_ for _, id_, _ in ordenadas), dtype=np.int64, count=len(ordenadas))
+        self.activos = np.fromiter((bool(a) for _, _, a in ordenadas), dtype=bool, count=len(ordenadas))
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for posicion, texto in enumerate(self.textos):
+            for grama in _gramas(texto):
+                postings[grama].append(posicion)
+        self._postings = {grama: np.array(pos, dtype=np.int32) for grama, pos in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.textos)
+
+    def _candidatos(self, terminos: List[str], como_prefijo: bool, solo_activos: bool) -> np.ndarray:
+        gramas = {g for t in terminos for g in _gramas_termino(t, como_prefijo)}
+        listas = []
+        for grama in gramas:
+            posiciones = self._postings.get(grama)
+            if posiciones is None:
+                return np.empty(0, dtype=np.int32)
+            listas.append(posiciones)
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for posiciones in listas[1:]:
+            if not len(candidatos):
+                break
+            # Intersección con una máscara: lineal, sin ordenar (las listas ya están ordenadas)
+            marca = np.zeros(len(self.textos), dtype=bool)
+            marca[posiciones] = True
+            candidatos = candidatos[marca[candidatos]]
+        if solo_activos:
+            candidatos = candidatos[self.activos[candidatos]]
+        return candidatos
+
+    def buscar(self, consulta: str, limite: int = 10, solo_activos: bool = True) -> List[int]:
+        """Ids de clientes de mejor a peor coincidencia"""
+        terminos = terminos_busqueda(consulta)
+        if not terminos or not self.textos:
+            return []
+        elegidas: List[int] = []
+        vistas = set()
+
+        def agregar(posicion: int) -> bool:
+            if posicion not in vistas:
+                vistas.add(posicion)
+                elegidas.append(posicion)
+            return len(elegidas) >= limite
+
+        # 1. El texto (nombre y apellido primero) empieza por la consulta
+        prefijo = " " + " ".join(terminos)
+        posicion = bisect_left(self.textos, prefijo)
+        while posicion < len(self.textos) and self.textos[posicion].startswith(prefijo):
+            if (not solo_activos or self.activos[posicion]) and agregar(posicion):
+                return self._ids(elegidas)
+            posicion += 1
+
+        # 2. Cada término empieza una palabra
+        palabras = [" " + t for t in terminos]
+        for posicion in self._candidatos(terminos, True, solo_activos).tolist():
+            texto = self.textos[posicion]
+            if all(p in texto for p in palabras) and agregar(posicion):
+                return self._ids(elegidas)
+
+        # 3. Subcadena en cualquier parte
+        partes = [t if len(t) >= LARGO_SUBCADENA else " " + t for t in terminos]
+        for posicion in self._candidatos(terminos, False, solo_activos).tolist():
+            texto = self.textos[posicion]
+            if all(p in texto for p in partes) and agregar(posicion):
+                break
+        return self._ids(elegidas)
+
+    def _ids(self, posiciones: List[int]) -> List[int]:
+        return [int(self.ids[p]) for p in posiciones]
+
+
+class ClienteBusqueda:
+    """Búsqueda de clientes con pg_trgm o con el índice en memoria según el motor"""
+
+    @staticmethod
+    def indice(db: Session, sede_id: int) -> IndiceClientes:
+        return clientes_busqueda_cache.get_or_load(
+            sede_id, lambda: ClienteBusqueda._construir(db, sede_id)
+        )
+
+    @staticmethod
+    def _construir(db: Session, sede_id: int) -> IndiceClientes:
+        filas = db.query(
+            Cliente.id, Cliente.busqueda, Cliente.estado,
+            Cliente.nombre, Cliente.apellido, Cliente.cedula, Cliente.telefono, Cliente.email
+        ).filter(Cliente.sede_id == sede_id)
+        return IndiceClientes(
+            (
+                id_,
+                busqueda if busqueda is not None else texto_busqueda(nombre, apellido, cedula, telefono, email),
+                estado == "activo"
+            )
+            for id_, busqueda, estado, nombre, apellido, cedula, telefono, email in filas
+        )
+
+    @staticmethod
+    def buscar_ids(db: Session, sede_id: int, consulta: str, limite: int = 10, solo_activos: bool = True) -> List[int]:
+        """Ids de los clientes de la sede que coinciden, ordenados por relevancia"""
+        terminos = terminos_busqueda(consulta)
+        if not terminos:
+            return []
+        if db.get_bind().dialect.name != "postgresql":
+            return ClienteBusqueda.indice(db, sede_id).buscar(consulta, limite, solo_activos)
+
+        q = db.query(Cliente.id).filter(Cliente.sede_id == sede_id, filtro_busqueda(terminos))
+        if solo_activos:
+            q = q.filter(Cliente.estado == "activo")
+        texto = " ".join(terminos)
+        return [
+            id_ for (id_,) in q.order_by(
+                Cliente.busqueda.like(f"{texto}%").desc(),
+                func.similarity(Cliente.busqueda, texto).desc(),
+                Cliente.busqueda
+            ).limit(limite)
+        ]
+
+    @staticmethod
+    def invalidar(sede_id: Optional[int] = None) -> None:
+        if sede_id is None:
+            clientes_busqueda_cache.clear()
+        else:
+            clientes_busqueda_cache.invalidate(sede_id)
+
+
+# ============================================
+# MANTENIMIENTO DE clientes.busqueda E INVALIDACIÓN
+# ============================================
+
+@event.listens_for(Cliente, "before_insert")
+@event.listens_for(Cliente, "before_update")
+def _actualizar_texto_busqueda(mapper, connection, cliente):
+    cliente.busqueda = texto_busqueda(
+        cliente.nombre, cliente.apellido, cliente.cedula, cliente.telefono, cliente.email
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_sedes_clientes(session, flush_context):
+    sedes = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Cliente):
+            sedes.add(obj.sede_id)
+            # Cliente movido de sede: el índice de la sede anterior también lo tiene
+            sedes.update(sede for sede in inspect(obj).attrs.sede_id.history.deleted if sede is not None)
+    if sedes:
+        session.info.setdefault("clientes_sedes_tocadas", set()).update(sedes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_indices_clientes(session):
+    sedes = session.info.pop("clientes_sedes_tocadas", None)
+    for sede_id in sedes or ():
+        ClienteBusqueda.invalidar(sede_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_sedes_clientes(session):
+    session.info.pop("clientes_sedes_tocadas", None)
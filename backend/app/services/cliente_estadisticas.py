@@ -0,0 +1,196 @@
+"""
+Estadísticas guardadas en cada cliente: total_visitas, fecha_primera_visita,
+ultima_visita, total_gastado y ultimo_servicio_id.
+
+Los listados y la segmentación filtran y ordenan por estas columnas, así que no
+agregan facturas ni citas al leer. Se mantienen al escribir: cada flush anota en la
+sesión los clientes cuyas facturas (alta, pago, anulación) o citas (completada o que
+deja de estarlo) cambiaron, y antes de confirmar se recalculan solo esos clientes
+dentro de la misma transacción.
+
+Una visita es un día con una cita completada o una factura pagada; la cita y la
+factura del mismo día cuentan una vez. Por eso se recalcula por cliente (consultas
+por cliente_id sobre índices) en lugar de sumar ±1: la misma visita llega por la
+cita y por su factura, y una factura anulada no debe restar si hubo otra ese día.
+Reemplaza al trigger tr_actualizar_visitas (db/migraciones/014).
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from sqlalchemy import bindparam, event, func, inspect, select, union, update
+from sqlalchemy.orm import Session
+
+from ..models.caja import DetalleFactura, Factura
+from ..models.cita import Cita
+from ..models.cliente import Cliente
+
+ESTADO_FACTURA_VALIDA = "pagada"
+ESTADO_CITA_VISITA = "completada"
+
+
+class ClienteEstadisticas:
+    """Recalcular las estadísticas de clientes desde sus facturas y citas"""
+
+    @staticmethod
+    def calcular(db: Session, cliente_ids: List[int]) -> Dict[int, dict]:
+        """Estadísticas de los clientes indicados (los que no tienen visitas quedan en cero)"""
+        resultado = {
+            cliente_id: {
+                "total_visitas": 0, "fecha_primera_visita": None, "ultima_visita": None,
+                "total_gastado": Decimal("0"), "ultimo_servicio_id": None,
+            }
+            for cliente_id in cliente_ids
+        }
+        if not cliente_ids:
+            return resultado
+
+        dias = union(
+            select(Cita.cliente_id, Cita.fecha.label("dia")).where(
+                Cita.cliente_id.in_(cliente_ids), Cita.estado == ESTADO_CITA_VISITA
+            ),
+            select(Factura.cliente_id, func.date(Factura.fecha).label("dia")).where(
+                Factura.cliente_id.in_(cliente_ids), Factura.estado == ESTADO_FACTURA_VALIDA
+            ),
+        ).subquery()
+        for cliente_id, visitas, primera, ultima in db.execute(
+            select(dias.c.cliente_id, func.count(), func.min(dias.c.dia), func.max(dias.c.dia))
+            .group_by(dias.c.cliente_id)
+        ):
+            datos = resultado[cliente_id]
+            datos["total_visitas"] = visitas
+            # SQLite devuelve date() como texto
+            datos["fecha_primera_visita"] = _como_fecha(primera)
+            datos["ultima_visita"] = _como_fecha(ultima)
+
+        for cliente_id, gastado in db.execute(
+            select(Factura.cliente_id, func.sum(Factura.total)).where(
+                Factura.cliente_id.in_(cliente_ids), Factura.estado == ESTADO_FACTURA_VALIDA
+            ).group_by(Factura.cliente_id)
+        ):
+            resultado[cliente_id]["total_gastado"] = Decimal(str(gastado or 0))
+
+        # Último servicio: el de la visita más reciente, por cita o por línea de factura
+        ultimo: Dict[int, tuple] = {}
+        candidatos = db.execute(
+            select(Cita.cliente_id, Cita.fecha, Cita.hora_inicio, Cita.servicio_id).where(
+                Cita.cliente_id.in_(cliente_ids), Cita.estado == ESTADO_CITA_VISITA
+            )
+        ).all() + db.execute(
+            select(Factura.cliente_id, func.date(Factura.fecha), Factura.fecha, DetalleFactura.item_id)
+            .join(DetalleFactura, DetalleFactura.factura_id == Factura.id)
+            .where(
+                Factura.cliente_id.in_(cliente_ids), Factura.estado == ESTADO_FACTURA_VALIDA,
+                DetalleFactura.tipo == "servicio"
+            )
+        ).all()
+        for cliente_id, dia, hora, servicio_id in candidatos:
+            if isinstance(hora, datetime):
+                hora = hora.time()
+            clave = (_como_fecha(dia), str(hora))
+            if cliente_id not in ultimo or clave > ultimo[cliente_id][0]:
+                ultimo[cliente_id] = (clave, servicio_id)
+        for cliente_id, (_, servicio_id) in ultimo.items():
+            resultado[cliente_id]["ultimo_servicio_id"] = servicio_id
+        return resultado
+
+    @staticmethod
+    def actualizar(db: Session, cliente_ids: Iterable[int]) -> int:
+        """Recalcular y guardar las estadísticas de los clientes (sin confirmar)"""
+        ids = sorted({cliente_id for cliente_id in cliente_ids if cliente_id is not None})
+        if not ids:
+            return 0
+        estadisticas = ClienteEstadisticas.calcular(db, ids)
+        db.execute(
+            update(Cliente.__table__).where(Cliente.__table__.c.id == bindparam("_id")),
+            [{"_id": cliente_id, **datos} for cliente_id, datos in estadisticas.items()]
+        )
+        return len(ids)
+
+    @staticmethod
+    def recalcular_todos(db: Session, lote: int = 1000) -> int:
+        """Backfill: recorre todos los clientes por id y confirma cada lote"""
+        total, ultimo_id = 0, 0
+        while True:
+            ids = [
+                cliente_id for (cliente_id,) in db.query(Cliente.id)
+                .filter(Cliente.id > ultimo_id).order_by(Cliente.id).limit(lote)
+            ]
+            if not ids:
+                return total
+            total += ClienteEstadisticas.actualizar(db, ids)
+            db.commit()
+            ultimo_id = ids[-1]
+
+
+def _como_fecha(valor):
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    return valor
+
+
+# ============================================
+# ANOTAR CLIENTES AFECTADOS Y RECALCULAR ANTES DE CONFIRMAR
+# ============================================
+
+def _cambio(obj, *campos) -> bool:
+    estado = inspect(obj)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+
+def _clientes(obj) -> list:
+    """Cliente actual y anterior (si cambió el cliente se recalculan ambos)"""
+    return [obj.cliente_id, *inspect(obj).attrs.cliente_id.history.deleted]
+
+
+@event.listens_for(Session, "before_flush")
+def _anotar_clientes_estadisticas(session, flush_context, instances):
+    clientes, facturas = set(), set()
+    for obj in (*session.new, *session.deleted):
+        # Una cita agendada o una orden pendiente no cambian nada hasta completarse o pagarse
+        if isinstance(obj, Cita):
+            if obj.estado == ESTADO_CITA_VISITA:
+                clientes.add(obj.cliente_id)
+        elif isinstance(obj, Factura):
+            if obj.estado == ESTADO_FACTURA_VALIDA:
+                clientes.add(obj.cliente_id)
+        elif isinstance(obj, DetalleFactura) and obj.tipo == "servicio":
+            # Línea agregada a una factura: puede cambiar el último servicio
+            if obj.factura_id is not None:
+                facturas.add(obj.factura_id)
+            elif obj.factura is not None:
+                clientes.add(obj.factura.cliente_id)
+    for obj in session.dirty:
+        if isinstance(obj, Factura) and (
+            _cambio(obj, "estado")
+            or (obj.estado == ESTADO_FACTURA_VALIDA and _cambio(obj, "total", "fecha", "cliente_id"))
+        ):
+            clientes.update(_clientes(obj))
+        elif isinstance(obj, Cita) and (
+            _cambio(obj, "estado", "cliente_id")
+            or (obj.estado == ESTADO_CITA_VISITA and _cambio(obj, "fecha", "hora_inicio", "servicio_id"))
+        ):
+            clientes.update(_clientes(obj))
+    clientes.discard(None)
+    facturas.discard(None)
+    if clientes:
+        session.info.setdefault("estadisticas_clientes", set()).update(clientes)
+    if facturas:
+        session.info.setdefault("estadisticas_facturas", set()).update(facturas)
+
+
+@event.listens_for(Session, "before_commit")
+def _recalcular_estadisticas_clientes(session):
+    # Flush aquí para que los cambios pendientes anoten sus clientes y sean visibles
+    session.flush()
+    clientes = session.info.pop("estadisticas_clientes", set())
+    facturas = session.info.pop("estadisticas_facturas", None)
+    if facturas:
+        clientes.update(session.scalars(select(Factura.cliente_id).where(Factura.id.in_(facturas))))
+    ClienteEstadisticas.actualizar(session, clientes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_clientes_estadisticas(session):
+    session.info.pop("estadisticas_clientes", None)
+    session.info.pop("estadisticas_facturas", None)
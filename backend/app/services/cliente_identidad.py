@@ -0,0 +1,260 @@
+"""
+Identidad de clientes: teléfono en formato E.164 y cédula sin separadores.
+
+Recepción, el bot de WhatsApp y las importaciones escriben el mismo dato con
+formatos distintos ("+57 300 123 4567", "3001234567", "1.094.555"), así que para
+saber si un cliente ya existe se comparan claves normalizadas guardadas en
+clientes.telefono_normalizado y clientes.cedula_normalizada. Ambas columnas tienen
+índice único (migración 013, después de fusionar los duplicados existentes con
+scripts/deduplicar_clientes.py), lo que hace atómico el buscar-o-crear: si dos
+peticiones crean el mismo cliente a la vez, la segunda choca con el índice y
+reutiliza el registro de la primera.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import Base
+from ..models.cliente import Cliente, ClientePreferencia, ClienteEtiquetaAsignacion
+from ..schemas.cliente import ClienteCreate
+from .cliente_estadisticas import ClienteEstadisticas
+
+# Campos que el cliente conservado toma de un duplicado si no los tiene
+_CAMPOS_COMPLETABLES = ("apellido", "email", "fecha_nacimiento", "direccion", "notas", "cedula", "telefono")
+
+
+def normalizar_telefono(telefono: Optional[str], codigo_pais: Optional[str] = None) -> Optional[str]:
+    """
+    '300 123 4567' -> '+573001234567'. Con + o 00 se respeta el código de país
+    escrito; números de hasta 10 dígitos se asumen nacionales.
+    """
+    if not telefono:
+        return None
+    digitos = re.sub(r"\D", "", telefono)
+    if len(digitos) < 7:
+        return None
+    if telefono.strip().startswith("+"):
+        return "+" + digitos
+    if digitos.startswith("00"):
+        return "+" + digitos[2:]
+    if len(digitos) <= 10:
+        return "+" + (codigo_pais or settings.telefono_codigo_pais) + digitos
+    return "+" + digitos
+
+
+def normalizar_cedula(cedula: Optional[str]) -> Optional[str]:
+    """' 01.094-555 ' -> '1094555'; los documentos con letras se conservan en mayúsculas"""
+    if not cedula:
+        return None
+    limpia = re.sub(r"[^0-9A-Za-z]", "", cedula).upper()
+    if limpia.isdigit():
+        limpia = limpia.lstrip("0")
+    return limpia or None
+
+
+class ClienteIdentidad:
+    """Búsqueda por identidad normalizada, alta atómica y fusión de duplicados"""
+
+    @staticmethod
+    def buscar(db: Session, cedula: Optional[str] = None, telefono: Optional[str] = None) -> Optional[Cliente]:
+        """Cliente con la misma cédula o el mismo teléfono (la cédula tiene prioridad)"""
+        cedula_n = normalizar_cedula(cedula)
+        telefono_n = normalizar_telefono(telefono)
+        condiciones = []
+        if cedula_n:
+            condiciones.append(Cliente.cedula_normalizada == cedula_n)
+        if telefono_n:
+            condiciones.append(Cliente.telefono_normalizado == telefono_n)
+        if not condiciones:
+            return None
+        candidatos = db.query(Cliente).filter(or_(*condiciones)).order_by(Cliente.id).limit(2).all()
+        for cliente in candidatos:
+            if cedula_n and cliente.cedula_normalizada == cedula_n:
+                return cliente
+        return candidatos[0] if candidatos else None
+
+    @staticmethod
+    def obtener_o_crear(db: Session, datos: ClienteCreate, sede_id: int) -> Tuple[Cliente, bool]:
+        """
+        Retorna (cliente, creado). Busca por cédula o teléfono normalizados y, si no
+        existe, lo crea con sus preferencias vacías y confirma la transacción.
+        """
+        existente = ClienteIdentidad.buscar(db, datos.cedula, datos.telefono)
+        if existente:
+            return existente, False
+
+        cliente = Cliente(**datos.model_dump(), sede_id=sede_id)
+        db.add(cliente)
+        try:
+            db.flush()
+            db.add(ClientePreferencia(cliente_id=cliente.id))
+            db.commit()
+        except IntegrityError:
+            # Otra petición lo creó entre la búsqueda y el INSERT
+            db.rollback()
+            existente = ClienteIdentidad.buscar(db, datos.cedula, datos.telefono)
+            if existente is None:
+                raise
+            return existente, False
+        db.refresh(cliente)
+        return cliente, True
+
+    # ============================================
+    # FUSIÓN DE DUPLICADOS
+    # ============================================
+
+    @staticmethod
+    def grupos_duplicados(db: Session) -> List[List[int]]:
+        """
+        Ids de clientes agrupados por identidad (misma cédula o mismo teléfono
+        normalizados, de forma transitiva). Solo grupos con más de un cliente.
+        Las claves se calculan desde los datos crudos: sirve antes del backfill.
+        """
+        padre: Dict[int, int] = {}
+
+        def raiz(x: int) -> int:
+            while padre[x] != x:
+                padre[x] = padre[padre[x]]
+                x = padre[x]
+            return x
+
+        primero_por_clave: Dict[Tuple[str, str], int] = {}
+        filas = db.query(Cliente.id, Cliente.cedula, Cliente.telefono).order_by(Cliente.id).yield_per(5000)
+        for cliente_id, cedula, telefono in filas:
+            padre[cliente_id] = cliente_id
+            for clave in (("cedula", normalizar_cedula(cedula)), ("telefono", normalizar_telefono(telefono))):
+                if clave[1] is None:
+                    continue
+                otro = primero_por_clave.setdefault(clave, cliente_id)
+                if otro != cliente_id:
+                    a, b = raiz(otro), raiz(cliente_id)
+                    if a != b:
+                        padre[max(a, b)] = min(a, b)
+
+        grupos: Dict[int, List[int]] = {}
+        for cliente_id in padre:
+            grupos.setdefault(raiz(cliente_id), []).append(cliente_id)
+        return [sorted(g) for g in grupos.values() if len(g) > 1]
+
+    @staticmethod
+    def fusionar(db: Session, ids: List[int]) -> Cliente:
+        """
+        Fusionar un grupo de clientes duplicados en el de más visitas (o el más
+        antiguo): citas, facturas, abonos y demás referencias pasan al conservado,
+        se completan sus datos vacíos y se recalculan sus estadísticas. No confirma.
+        """
+        clientes = db.query(Cliente).filter(Cliente.id.in_(ids)).all()
+        conservado = min(clientes, key=lambda c: (-(c.total_visitas or 0), c.id))
+        duplicados = [c for c in clientes if c.id != conservado.id]
+        ids_duplicados = [c.id for c in duplicados]
+        if not duplicados:
+            return conservado
+
+        # Referencias directas a clientes.id en cualquier tabla
+        for tabla in Base.metadata.sorted_tables:
+            if tabla.name in (ClientePreferencia.__tablename__, ClienteEtiquetaAsignacion.__tablename__):
+                continue
+            for columna in tabla.columns:
+                if any(fk.column.table.name == Cliente.__tablename__ for fk in columna.foreign_keys):
+                    db.execute(
+                        update(tabla).where(columna.in_(ids_duplicados)).values({columna.name: conservado.id})
+                    )
+
+        # Etiquetas: unión sin repetir (la PK es cliente_id + etiqueta_id)
+        etiquetas = {
+            etiqueta_id for (etiqueta_id,) in db.query(ClienteEtiquetaAsignacion.etiqueta_id).filter(
+                ClienteEtiquetaAsignacion.cliente_id.in_(ids)
+            )
+        }
+        propias = {a.etiqueta_id for a in conservado.etiquetas_asignadas}
+        for etiqueta_id in etiquetas - propias:
+            db.add(ClienteEtiquetaAsignacion(cliente_id=conservado.id, etiqueta_id=etiqueta_id))
+
+        # Preferencias: se completan los campos vacíos del conservado
+        preferencia = conservado.preferencias
+        for duplicado in duplicados:
+            otra = duplicado.preferencias
+            if otra is None:
+                continue
+            if preferencia is None:
+                preferencia = ClientePreferencia(cliente_id=conservado.id)
+                db.add(preferencia)
+            for campo in ("productos_favoritos", "alergias", "notas_servicio"):
+                if not getattr(preferencia, campo) and getattr(otra, campo):
+                    setattr(preferencia, campo, getattr(otra, campo))
+
+        completar = {}
+        for campo in _CAMPOS_COMPLETABLES:
+            if getattr(conservado, campo) is None:
+                valor = next((getattr(d, campo) for d in duplicados if getattr(d, campo) is not None), None)
+                if valor is not None:
+                    completar[campo] = valor
+
+        # Borrar antes de completar: cédula y claves normalizadas son únicas
+        for duplicado in duplicados:
+            db.delete(duplicado)
+        db.flush()
+
+        for campo, valor in completar.items():
+            setattr(conservado, campo, valor)
+        db.flush()
+        # Visitas, gasto y último servicio desde las citas y facturas ya unificadas
+        ClienteEstadisticas.actualizar(db, [conservado.id])
+        return conservado
+
+    @staticmethod
+    def deduplicar(db: Session, aplicar: bool = False, lote: int = 200) -> dict:
+        """
+        Buscar (y con aplicar=True fusionar) todos los grupos de duplicados, confirmando
+        cada `lote` grupos. Al final llena las claves normalizadas que falten.
+        """
+        grupos = ClienteIdentidad.grupos_duplicados(db)
+        resultado = {
+            "grupos": len(grupos),
+            "duplicados": sum(len(g) - 1 for g in grupos),
+            "fusionados": 0,
+            "claves_actualizadas": 0,
+        }
+        if not aplicar:
+            return resultado
+
+        for inicio in range(0, len(grupos), lote):
+            for grupo in grupos[inicio:inicio + lote]:
+                ClienteIdentidad.fusionar(db, grupo)
+                resultado["fusionados"] += len(grupo) - 1
+            db.commit()
+
+        resultado["claves_actualizadas"] = ClienteIdentidad.completar_claves(db)
+        return resultado
+
+    @staticmethod
+    def completar_claves(db: Session, lote: int = 2000) -> int:
+        """Recalcular las claves normalizadas guardadas que no coincidan con los datos"""
+        total, ultimo_id = 0, 0
+        while True:
+            filas = db.query(
+                Cliente.id, Cliente.cedula, Cliente.telefono, Cliente.cedula_normalizada, Cliente.telefono_normalizado
+            ).filter(Cliente.id > ultimo_id).order_by(Cliente.id).limit(lote).all()
+            if not filas:
+                return total
+            cambios = [
+                {"id": id_, "cedula_normalizada": normalizar_cedula(cedula), "telefono_normalizado": normalizar_telefono(telefono)}
+                for id_, cedula, telefono, cedula_n, telefono_n in filas
+                if (cedula_n, telefono_n) != (normalizar_cedula(cedula), normalizar_telefono(telefono))
+            ]
+            if cambios:
+                db.execute(update(Cliente), cambios)
+                db.commit()
+            total += len(cambios)
+            ultimo_id = filas[-1][0]
+
+
+@event.listens_for(Cliente, "before_insert")
+@event.listens_for(Cliente, "before_update")
+def _actualizar_claves_identidad(mapper, connection, cliente):
+    cliente.cedula_normalizada = normalizar_cedula(cliente.cedula)
+    cliente.telefono_normalizado = normalizar_telefono(cliente.telefono)
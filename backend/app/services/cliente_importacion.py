@@ -0,0 +1,399 @@
+"""
+Importación masiva de clientes desde CSV o XLSX.
+
+El archivo se lee fila a fila (csv o openpyxl en modo read_only) y se procesa en
+lotes: cada fila se valida con las reglas de ClienteCreate, se calculan las claves de identidad
+(cliente_identidad) y el texto de búsqueda (cliente_busqueda), y el lote se guarda
+con una consulta de búsqueda, un INSERT de varias filas (COPY a una tabla temporal
+en Postgres) y un UPDATE en lote para los clientes que ya existían. La memoria
+queda acotada por el tamaño del lote, no por el del archivo.
+
+Un cliente ya existe si coincide la cédula o el teléfono normalizados. Con
+actualizar=True sus campos se sobrescriben con los valores no vacíos del archivo;
+si no, la fila se omite. Las filas repetidas dentro del archivo se fusionan igual.
+
+Las inserciones de Core no disparan los eventos del ORM: aquí se llenan busqueda,
+cedula_normalizada y telefono_normalizado, y al final se invalida el índice de
+búsqueda en memoria.
+"""
+import csv
+import io
+import re
+import time as timer
+from datetime import date, datetime
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from email_validator import EmailNotValidError, validate_email
+from openpyxl import load_workbook
+from pydantic import ValidationError, field_validator
+from sqlalchemy import bindparam, func, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from ..models.cliente import Cliente
+from ..schemas.cliente import ClienteCreate
+from .catalogo_nombres import normalizar_nombre
+from .cliente_busqueda import ClienteBusqueda, texto_busqueda
+from .cliente_identidad import normalizar_cedula, normalizar_telefono
+
+# Nombres de columna aceptados (normalizados con normalizar_nombre)
+ALIAS_COLUMNAS = {
+    "nombre": "nombre", "nombres": "nombre", "primer nombre": "nombre",
+    "apellido": "apellido", "apellidos": "apellido",
+    "cedula": "cedula", "documento": "cedula", "identificacion": "cedula", "cc": "cedula",
+    "numero documento": "cedula", "numero de documento": "cedula",
+    "telefono": "telefono", "celular": "telefono", "movil": "telefono", "whatsapp": "telefono",
+    "email": "email", "correo": "email", "correo electronico": "email", "e mail": "email",
+    "fecha nacimiento": "fecha_nacimiento", "fecha de nacimiento": "fecha_nacimiento",
+    "nacimiento": "fecha_nacimiento", "cumpleanos": "fecha_nacimiento",
+    "direccion": "direccion",
+    "notas": "notas", "observaciones": "notas",
+    "es colaborador": "es_colaborador", "colaborador": "es_colaborador",
+}
+
+CAMPOS_ARCHIVO = (
+    "nombre", "apellido", "cedula", "telefono", "email",
+    "fecha_nacimiento", "direccion", "notas", "es_colaborador",
+)
+# Columnas que mantienen los eventos del ORM y que aquí se calculan a mano
+CAMPOS_DERIVADOS = ("busqueda", "cedula_normalizada", "telefono_normalizado")
+# Columnas que escribe la importación (en este orden en el COPY)
+COLUMNAS_INSERT = CAMPOS_ARCHIVO + ("sede_id", "estado", "total_visitas", "total_gastado") + CAMPOS_DERIVADOS
+
+FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+VALORES_VERDADEROS = {"si", "s", "true", "1", "x", "verdadero"}
+MAX_ERRORES_DETALLE = 100
+
+
+class ArchivoClientes:
+    """
+    Filas de un CSV o XLSX como diccionarios con los nombres de campo del modelo.
+    Lee el encabezado al crearse: un formato o encabezado inválido falla con
+    ValueError antes de empezar a importar.
+    """
+
+    def __init__(self, archivo: BinaryIO, nombre_archivo: str):
+        extension = nombre_archivo.rsplit(".", 1)[-1].lower() if "." in nombre_archivo else ""
+        if extension == "csv":
+            self._filas = self._filas_csv(archivo)
+        elif extension in ("xlsx", "xlsm"):
+            self._filas = self._filas_xlsx(archivo)
+        else:
+            raise ValueError("Formato no soportado: use un archivo .csv o .xlsx")
+
+        encabezado = next(self._filas, None)
+        if encabezado is None:
+            raise ValueError("El archivo está vacío")
+        self.columnas: List[Optional[str]] = [
+            ALIAS_COLUMNAS.get(normalizar_nombre(str(c)) if c is not None else "") for c in encabezado
+        ]
+        if "nombre" not in self.columnas:
+            raise ValueError("El archivo debe tener una columna 'nombre'")
+
+    @staticmethod
+    def _filas_csv(archivo: BinaryIO) -> Iterator[tuple]:
+        texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+        muestra = texto.readline()
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t|")
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(_encadenar(muestra, texto), dialecto)
+
+    @staticmethod
+    def _filas_xlsx(archivo: BinaryIO) -> Iterator[tuple]:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            yield from libro.active.iter_rows(values_only=True)
+        finally:
+            libro.close()
+
+    def __iter__(self) -> Iterator[Tuple[int, dict]]:
+        """(número de fila en el archivo, valores por campo); omite filas vacías"""
+        for numero, valores in enumerate(self._filas, start=2):
+            fila = {
+                campo: valor
+                for campo, valor in zip(self.columnas, valores)
+                if campo is not None and valor is not None and str(valor).strip() != ""
+            }
+            if fila:
+                yield numero, fila
+
+
+def _encadenar(primera: str, resto) -> Iterator[str]:
+    yield primera
+    yield from resto
+
+
+def _texto(valor) -> str:
+    """Celdas numéricas de Excel (1094555.0) como texto sin decimales"""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return texto  # ClienteCreate reporta el formato inválido
+
+
+_PARTE_LOCAL_EMAIL = re.compile(r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
+
+@lru_cache(maxsize=4096)
+def _dominio_email_valido(dominio: str) -> bool:
+    try:
+        validate_email(f"a@{dominio}", check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+class _FilaCliente(ClienteCreate):
+    """
+    ClienteCreate con el email validado por partes: la validación del dominio (IDNA)
+    es lo más costoso de cada fila y en un archivo se repiten pocos dominios.
+    """
+    email: Optional[str] = None
+
+    @field_validator("email")
+    @classmethod
+    def validar_email(cls, v):
+        if v is None:
+            return v
+        local, _, dominio = v.lower().rpartition("@")
+        if not local or len(local) > 64 or not _PARTE_LOCAL_EMAIL.fullmatch(local) or not _dominio_email_valido(dominio):
+            raise ValueError("Email inválido")
+        return f"{local}@{dominio}"
+
+
+def validar_fila(fila: dict) -> dict:
+    """Valores listos para insertar (sin sede ni claves); ValueError con el motivo si la fila es inválida"""
+    datos = {campo: _texto(valor) for campo, valor in fila.items() if campo not in ("fecha_nacimiento", "es_colaborador")}
+    if "fecha_nacimiento" in fila:
+        datos["fecha_nacimiento"] = _fecha(fila["fecha_nacimiento"])
+    if "es_colaborador" in fila:
+        valor = fila["es_colaborador"]
+        datos["es_colaborador"] = valor is True or normalizar_nombre(_texto(valor)) in VALORES_VERDADEROS
+    try:
+        cliente = _FilaCliente(**datos)
+    except ValidationError as error:
+        detalle = error.errors()[0]
+        campo = ".".join(str(p) for p in detalle["loc"]) or "fila"
+        raise ValueError(f"{campo}: {detalle['msg'].removeprefix('Value error, ')}")
+    return cliente.model_dump()
+
+
+class ImportadorClientes:
+    """Importación por lotes con resumen de progreso"""
+
+    @staticmethod
+    def importar(
+        db: Session,
+        filas: Iterator[Tuple[int, dict]],
+        sede_id: int,
+        actualizar: bool = True,
+        lote: int = 5000
+    ) -> Iterator[dict]:
+        """
+        Importa las filas y produce un resumen después de cada lote; el último tiene
+        terminado=True. Cada lote se confirma por separado: si la importación se
+        interrumpe, lo ya confirmado queda guardado.
+        """
+        inicio = timer.perf_counter()
+        resumen = {
+            "terminado": False, "filas": 0, "insertados": 0, "actualizados": 0,
+            "repetidos": 0, "omitidos": 0, "con_error": 0, "errores": [], "segundos": 0.0,
+        }
+
+        def error(numero: int, mensaje: str):
+            resumen["con_error"] += 1
+            if len(resumen["errores"]) < MAX_ERRORES_DETALLE:
+                resumen["errores"].append({"fila": numero, "error": mensaje})
+
+        pendientes: List[Tuple[int, dict]] = []
+        try:
+            for numero, fila in filas:
+                resumen["filas"] += 1
+                try:
+                    pendientes.append((numero, validar_fila(fila)))
+                except ValueError as e:
+                    error(numero, str(e))
+                if len(pendientes) >= lote:
+                    ImportadorClientes._guardar_lote(db, pendientes, sede_id, actualizar, resumen, error)
+                    pendientes = []
+                    resumen["segundos"] = round(timer.perf_counter() - inicio, 2)
+                    yield dict(resumen)
+            if pendientes:
+                ImportadorClientes._guardar_lote(db, pendientes, sede_id, actualizar, resumen, error)
+        finally:
+            ClienteBusqueda.invalidar()
+
+        resumen["terminado"] = True
+        resumen["segundos"] = round(timer.perf_counter() - inicio, 2)
+        yield resumen
+
+    @staticmethod
+    def _guardar_lote(db: Session, filas: List[Tuple[int, dict]], sede_id: int, actualizar: bool, resumen: dict, error) -> None:
+        # 1. Fusionar filas repetidas dentro del lote por cédula o teléfono
+        unicas: List[dict] = []
+        por_clave: Dict[tuple, dict] = {}
+        for numero, datos in filas:
+            datos["_fila"] = numero
+            datos["cedula_normalizada"] = normalizar_cedula(datos["cedula"])
+            datos["telefono_normalizado"] = normalizar_telefono(datos["telefono"])
+            previas = {id(por_clave[c]): por_clave[c] for c in _claves(datos) if c in por_clave}
+            if len(previas) > 1:
+                error(numero, "La cédula y el teléfono corresponden a filas distintas del archivo")
+                continue
+            if previas:
+                previa = next(iter(previas.values()))
+                _combinar(previa, datos)
+                resumen["repetidos"] += 1
+            else:
+                previa = datos
+                unicas.append(datos)
+            for clave in _claves(previa):
+                por_clave[clave] = previa
+
+        # 2. Clientes existentes con alguna de las claves (una consulta)
+        cedulas = [d["cedula_normalizada"] for d in unicas if d["cedula_normalizada"]]
+        telefonos = [d["telefono_normalizado"] for d in unicas if d["telefono_normalizado"]]
+        existentes: Dict[tuple, dict] = {}
+        if cedulas or telefonos:
+            t = Cliente.__table__
+            consulta = select(
+                t.c.id, t.c.nombre, t.c.apellido, t.c.cedula, t.c.telefono, t.c.email,
+                t.c.cedula_normalizada, t.c.telefono_normalizado
+            ).where(or_(t.c.cedula_normalizada.in_(cedulas), t.c.telefono_normalizado.in_(telefonos)))
+            for fila in db.execute(consulta).mappings():
+                for clave in _claves(fila):
+                    existentes[clave] = dict(fila)
+
+        # 3. Separar nuevos y actualizaciones
+        nuevos, cambios = [], []
+        for datos in unicas:
+            encontrados = {e["id"]: e for e in (existentes.get(c) for c in _claves(datos)) if e}
+            if len(encontrados) > 1:
+                error(datos["_fila"], "La cédula y el teléfono pertenecen a clientes distintos")
+                continue
+            if not encontrados:
+                datos.update(
+                    sede_id=sede_id, estado="activo", total_visitas=0, total_gastado=0,
+                    busqueda=texto_busqueda(datos["nombre"], datos["apellido"], datos["cedula"], datos["telefono"], datos["email"]),
+                )
+                nuevos.append(datos)
+            elif not actualizar:
+                resumen["omitidos"] += 1
+            else:
+                cambios.append(_cambios_existente(next(iter(encontrados.values())), datos))
+
+        # 4. Escribir el lote y confirmar
+        if nuevos:
+            insertados = ImportadorClientes._insertar(db, nuevos)
+            resumen["insertados"] += insertados
+            resumen["omitidos"] += len(nuevos) - insertados
+        if cambios:
+            # Los campos que el archivo no trae (None) conservan el valor guardado
+            t = Cliente.__table__
+            valores = {
+                campo: func.coalesce(bindparam(f"v_{campo}", type_=t.c[campo].type), t.c[campo])
+                for campo in CAMPOS_ARCHIVO
+            }
+            valores.update({campo: bindparam(f"v_{campo}", type_=t.c[campo].type) for campo in CAMPOS_DERIVADOS})
+            db.execute(update(t).where(t.c.id == bindparam("v_id")).values(valores), cambios)
+            resumen["actualizados"] += len(cambios)
+        db.commit()
+
+    @staticmethod
+    def _insertar(db: Session, filas: List[dict]) -> int:
+        """INSERT de varias filas; en Postgres COPY a una tabla temporal. Retorna las insertadas."""
+        valores = [{columna: fila[columna] for columna in COLUMNAS_INSERT} for fila in filas]
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(insert(Cliente.__table__), valores)
+            return len(valores)
+
+        columnas = ", ".join(COLUMNAS_INSERT)
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS clientes_importacion "
+            "(LIKE clientes INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for fila in valores:
+            escritor.writerow(_celda_copy(fila[c]) for c in COLUMNAS_INSERT)
+        buffer.seek(0)
+        cursor = db.connection().connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY clientes_importacion ({columnas}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        # Un alta concurrente con la misma cédula o teléfono gana: la fila se omite
+        resultado = db.execute(text(
+            f"INSERT INTO clientes ({columnas}) SELECT {columnas} FROM clientes_importacion "
+            "ON CONFLICT DO NOTHING"
+        ))
+        db.execute(text("TRUNCATE clientes_importacion"))
+        return resultado.rowcount
+
+
+def _claves(datos) -> List[tuple]:
+    claves = []
+    if datos["cedula_normalizada"]:
+        claves.append(("cedula", datos["cedula_normalizada"]))
+    if datos["telefono_normalizado"]:
+        claves.append(("telefono", datos["telefono_normalizado"]))
+    return claves
+
+
+def _combinar(destino: dict, origen: dict) -> None:
+    """La fila posterior completa y sobrescribe los valores no vacíos de la anterior"""
+    for campo, valor in origen.items():
+        if valor is not None and valor != "" and not (campo == "es_colaborador" and valor is False):
+            destino[campo] = valor
+
+
+def _cambios_existente(existente: dict, datos: dict) -> dict:
+    """Parámetros del UPDATE de un cliente existente (None = conservar el valor guardado)"""
+    cambios = {"v_id": existente["id"]}
+    for campo in CAMPOS_ARCHIVO:
+        valor = datos[campo]
+        if campo == "es_colaborador" and not valor:
+            valor = None
+        # Misma cédula o teléfono con otro formato: se deja el guardado
+        elif campo == "cedula" and normalizar_cedula(valor) == existente["cedula_normalizada"]:
+            valor = None
+        elif campo == "telefono" and normalizar_telefono(valor) == existente["telefono_normalizado"]:
+            valor = None
+        cambios[f"v_{campo}"] = valor
+
+    final = {
+        campo: cambios[f"v_{campo}"] if cambios[f"v_{campo}"] is not None else existente[campo]
+        for campo in ("nombre", "apellido", "cedula", "telefono", "email")
+    }
+    cambios["v_busqueda"] = texto_busqueda(
+        final["nombre"], final["apellido"], final["cedula"], final["telefono"], final["email"]
+    )
+    cambios["v_cedula_normalizada"] = normalizar_cedula(final["cedula"])
+    cambios["v_telefono_normalizado"] = normalizar_telefono(final["telefono"])
+    return cambios
+
+
+def _celda_copy(valor):
+    """Valor para COPY en formato csv: vacío sin comillas es NULL"""
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
@@ -1,10 +1,17 @@
+import base64
+import json
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_, func, desc
-from typing import List, Optional
-from datetime import date
+from sqlalchemy import or_, and_, func, desc, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime
+from decimal import Decimal
 from fastapi import HTTPException, status
 
 from ..models.cliente import Cliente, ClientePreferencia, ClienteEtiqueta, ClienteEtiquetaAsignacion
+from .cliente_busqueda import ClienteBusqueda, filtro_busqueda, terminos_busqueda
+from .cliente_identidad import ClienteIdentidad, normalizar_cedula, normalizar_telefono
+from . import cliente_estadisticas  # noqa: F401  mantiene visitas y gasto al confirmar
 from ..schemas.cliente import (
     ClienteCreate, ClienteUpdate,
     ClientePreferenciaUpdate,
@@ -12,6 +19,15 @@ from ..schemas.cliente import (
     EtiquetaSimple
 )
 
+# Campos por los que se puede ordenar el listado (keyset sobre campo + id)
+CAMPOS_ORDEN_CLIENTES = {
+    'nombre', 'apellido', 'cedula', 'telefono', 'email', 'total_visitas',
+    'ultima_visita', 'fecha_primera_visita', 'total_gastado', 'fecha_creacion', 'id'
+}
+CAMPOS_ORDEN_NO_NULOS = {'nombre', 'id'}
+# Con conteo 'estimado', por debajo de esta estimación se cuenta exacto (es barato)
+UMBRAL_CONTEO_EXACTO = 10000
+
 
 class ClienteService:
     """Servicio para gestión de clientes con validaciones de reglas de negocio"""
@@ -37,17 +53,10 @@ class ClienteService:
         if estado and estado != 'todos':
             q = q.filter(Cliente.estado == estado)
         
-        # Búsqueda por texto
-        if query:
-            search_term = f"%{query}%"
-            q = q.filter(
-                or_(
-                    Cliente.nombre.ilike(search_term),
-                    Cliente.apellido.ilike(search_term),
-                    Cliente.telefono.ilike(search_term),
-                    Cliente.email.ilike(search_term)
-                )
-            )
+        # Búsqueda por texto (nombre, apellido, teléfono, cédula o email)
+        terminos = terminos_busqueda(query)
+        if terminos:
+            q = q.filter(filtro_busqueda(terminos))
         
         # Filtro por etiqueta
         if etiqueta_id:
@@ -69,26 +78,28 @@ class ClienteService:
         pagina: int = 1,
         por_pagina: int = 20,
         ordenar_por: str = 'nombre',
-        orden: str = 'asc'
+        orden: str = 'asc',
+        cursor: Optional[str] = None,
+        conteo: str = 'exacto'
     ) -> dict:
-        """Lista clientes de una sede con filtros, búsqueda y paginación"""
+        """
+        Lista clientes de una sede con filtros, búsqueda y paginación.
+
+        Con `cursor` (el siguiente_cursor de la página anterior) se pagina por keyset
+        sobre (campo de orden, id) y `pagina` se ignora: el costo no crece con la
+        profundidad. `conteo` puede ser 'exacto', 'estimado' (plan de Postgres; exacto
+        si la estimación es pequeña o el motor no lo soporta) o 'ninguno'.
+        """
         q = db.query(Cliente).filter(Cliente.sede_id == sede_id)
         
         # Filtro por estado
         if estado != 'todos':
             q = q.filter(Cliente.estado == estado)
         
-        # Búsqueda por texto
-        if query:
-            search_term = f"%{query}%"
-            q = q.filter(
-                or_(
-                    Cliente.nombre.ilike(search_term),
-                    Cliente.apellido.ilike(search_term),
-                    Cliente.telefono.ilike(search_term),
-                    Cliente.email.ilike(search_term)
-                )
-            )
+        # Búsqueda por texto (nombre, apellido, teléfono, cédula o email)
+        terminos = terminos_busqueda(query)
+        if terminos:
+            q = q.filter(filtro_busqueda(terminos))
         
         # Filtro por etiqueta
         if etiqueta_id:
@@ -103,50 +114,117 @@ class ClienteService:
             q = q.filter(Cliente.total_visitas <= max_visitas)
         
         # Total de registros
-        total = q.count()
-        
-        # Ordenamiento
-        if hasattr(Cliente, ordenar_por):
-            campo_orden = getattr(Cliente, ordenar_por)
-            if orden == 'desc':
-                q = q.order_by(desc(campo_orden))
-            else:
-                q = q.order_by(campo_orden)
+        total, total_estimado = ClienteService._contar(db, q, conteo)
+        
+        # Ordenamiento: siempre desempata por id para que el cursor sea estable
+        if ordenar_por not in CAMPOS_ORDEN_CLIENTES:
+            ordenar_por = 'nombre'
+        orden_keyset = ClienteService._orden_keyset(ordenar_por, orden == 'desc')
+        
+        # Paginación (se pide una fila de más para saber si hay página siguiente)
+        nulos_despues = False
+        if cursor:
+            condicion, nulos_despues = ClienteService._despues_del_cursor(cursor, ordenar_por, orden)
+            pagina_q = q.filter(condicion).order_by(*orden_keyset)
         else:
-            q = q.order_by(Cliente.nombre, Cliente.apellido)
-        
-        # Paginación
-        offset = (pagina - 1) * por_pagina
-        clientes = q.offset(offset).limit(por_pagina).all()
+            pagina_q = q.order_by(*orden_keyset).offset((pagina - 1) * por_pagina)
+        clientes = pagina_q.limit(por_pagina + 1).all()
+        if nulos_despues and len(clientes) <= por_pagina:
+            # El bloque de NULL va al final y se lee aparte: así cada consulta es un
+            # rango del índice, sin OR que obligue a recorrerlo desde el principio
+            clientes += q.filter(getattr(Cliente, ordenar_por).is_(None)).order_by(*orden_keyset).limit(
+                por_pagina + 1 - len(clientes)
+            ).all()
+        siguiente_cursor = None
+        if len(clientes) > por_pagina:
+            clientes = clientes[:por_pagina]
+            ultimo = clientes[-1]
+            siguiente_cursor = ClienteService._codificar_cursor(
+                ordenar_por, orden, getattr(ultimo, ordenar_por), ultimo.id
+            )
         
         # Calcular total de páginas
-        total_paginas = (total + por_pagina - 1) // por_pagina
-        
-        # Cargar etiquetas para cada cliente
-        items = []
-        for cliente in clientes:
-            etiquetas = ClienteService._get_etiquetas_cliente(db, cliente.id)
-            items.append({
-                "id": cliente.id,
-                "nombre": cliente.nombre,
-                "apellido": cliente.apellido,
-                "cedula": cliente.cedula,
-                "telefono": cliente.telefono,
-                "email": cliente.email,
-                "total_visitas": cliente.total_visitas or 0,
-                "ultima_visita": cliente.ultima_visita,
-                "etiquetas": etiquetas,
-                "estado": cliente.estado
-            })
+        total_paginas = (total + por_pagina - 1) // por_pagina if total is not None else None
         
         return {
             'total': total,
+            'total_estimado': total_estimado,
             'pagina': pagina,
             'por_pagina': por_pagina,
             'total_paginas': total_paginas,
-            'items': items
+            'siguiente_cursor': siguiente_cursor,
+            'items': ClienteService.items_listado(db, clientes)
         }
 
+    @staticmethod
+    def _contar(db: Session, q, conteo: str) -> Tuple[Optional[int], bool]:
+        """(total, es_estimado) según el modo de conteo pedido"""
+        if conteo == 'ninguno':
+            return None, False
+        if conteo == 'estimado' and db.get_bind().dialect.name == 'postgresql':
+            bind = db.get_bind()
+            sql = q.statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+            plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            estimado = int(plan[0]["Plan"]["Plan Rows"])
+            if estimado > UMBRAL_CONTEO_EXACTO:
+                return estimado, True
+        return q.order_by(None).count(), False
+
+    @staticmethod
+    def _orden_keyset(ordenar_por: str, descendente: bool) -> list:
+        """
+        ORDER BY (campo, id) con los NULL al final en ambos sentidos. Coincide con los
+        índices (sede_id, campo, id) de las migraciones 011/014 y, en descendente, con
+        los (sede_id, campo DESC NULLS LAST, id DESC) de la 015.
+        """
+        campo = getattr(Cliente, ordenar_por)
+        if descendente:
+            campo, id_ = campo.desc(), Cliente.id.desc()
+        else:
+            campo, id_ = campo.asc(), Cliente.id.asc()
+        if ordenar_por not in CAMPOS_ORDEN_NO_NULOS:
+            campo = campo.nulls_last()
+        return [campo, id_]
+
+    @staticmethod
+    def _codificar_cursor(ordenar_por: str, orden: str, valor, cliente_id: int) -> str:
+        if isinstance(valor, (date, datetime)):
+            valor = valor.isoformat()
+        elif isinstance(valor, Decimal):
+            valor = str(valor)
+        datos = json.dumps([ordenar_por, orden, valor, cliente_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _despues_del_cursor(cursor: str, ordenar_por: str, orden: str) -> Tuple[Any, bool]:
+        """
+        (condición, nulos_despues): filas posteriores al cursor como comparación de
+        filas (campo, id) > (valor, id), que Postgres resuelve como inicio de rango en
+        el índice, y si después falta leer el bloque de NULL del campo.
+        ValueError si el cursor no corresponde al orden pedido.
+        """
+        try:
+            relleno = "=" * (-len(cursor) % 4)
+            campo_cursor, orden_cursor, valor, cliente_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            if (campo_cursor, orden_cursor) != (ordenar_por, orden):
+                raise ValueError
+            tipo = Cliente.__table__.c[ordenar_por].type.python_type
+            if valor is not None and tipo in (date, datetime):
+                valor = tipo.fromisoformat(valor)
+            elif valor is not None:
+                valor = tipo(valor)
+            cliente_id = int(cliente_id)
+        except Exception:
+            raise ValueError("Cursor inválido")
+
+        campo = getattr(Cliente, ordenar_por)
+        posterior = (lambda a, b: a < b) if orden == 'desc' else (lambda a, b: a > b)
+        if valor is None:
+            # Ya se está en el bloque de NULL (van al final)
+            return and_(campo.is_(None), posterior(Cliente.id, cliente_id)), False
+        condicion = posterior(tuple_(campo, Cliente.id), tuple_(valor, cliente_id))
+        return condicion, ordenar_por not in CAMPOS_ORDEN_NO_NULOS
+
     @staticmethod
     def get_activos(db: Session, sede_id: int) -> List[Cliente]:
         """Listar solo clientes activos de una sede"""
@@ -180,6 +258,8 @@ class ClienteService:
             "total_visitas": cliente.total_visitas or 0,
             "fecha_primera_visita": cliente.fecha_primera_visita,
             "ultima_visita": cliente.ultima_visita,
+            "total_gastado": cliente.total_gastado or 0,
+            "ultimo_servicio_id": cliente.ultimo_servicio_id,
             "etiquetas": etiquetas,
             "fecha_creacion": cliente.fecha_creacion,
             "fecha_creacion": cliente.fecha_creacion,
@@ -190,26 +270,51 @@ class ClienteService:
     @staticmethod
     def _get_etiquetas_cliente(db: Session, cliente_id: int) -> List[dict]:
         """Obtener etiquetas de un cliente"""
-        asignaciones = db.query(ClienteEtiquetaAsignacion).filter(
-            ClienteEtiquetaAsignacion.cliente_id == cliente_id
-        ).all()
-        
-        etiquetas = []
-        for asig in asignaciones:
-            etiqueta = db.query(ClienteEtiqueta).filter(ClienteEtiqueta.id == asig.etiqueta_id).first()
-            if etiqueta:
-                etiquetas.append({
-                    "id": etiqueta.id,
-                    "nombre": etiqueta.nombre,
-                    "color": etiqueta.color
-                })
+        return ClienteService._get_etiquetas_clientes(db, [cliente_id])[cliente_id]
+
+    @staticmethod
+    def _get_etiquetas_clientes(db: Session, cliente_ids: List[int]) -> Dict[int, List[dict]]:
+        """Etiquetas de varios clientes en una sola consulta: {cliente_id: [etiquetas]}"""
+        etiquetas = {cliente_id: [] for cliente_id in cliente_ids}
+        if not cliente_ids:
+            return etiquetas
+        filas = db.query(
+            ClienteEtiquetaAsignacion.cliente_id, ClienteEtiqueta.id, ClienteEtiqueta.nombre, ClienteEtiqueta.color
+        ).join(
+            ClienteEtiqueta, ClienteEtiqueta.id == ClienteEtiquetaAsignacion.etiqueta_id
+        ).filter(
+            ClienteEtiquetaAsignacion.cliente_id.in_(cliente_ids)
+        ).order_by(ClienteEtiquetaAsignacion.cliente_id, ClienteEtiqueta.nombre)
+        for cliente_id, etiqueta_id, nombre, color in filas:
+            etiquetas[cliente_id].append({"id": etiqueta_id, "nombre": nombre, "color": color})
         return etiquetas
 
+    @staticmethod
+    def items_listado(db: Session, clientes: List[Cliente]) -> List[dict]:
+        """Clientes en formato de listado, con las etiquetas de todos cargadas en una consulta"""
+        etiquetas = ClienteService._get_etiquetas_clientes(db, [c.id for c in clientes])
+        return [
+            {
+                "id": cliente.id,
+                "nombre": cliente.nombre,
+                "apellido": cliente.apellido,
+                "cedula": cliente.cedula,
+                "telefono": cliente.telefono,
+                "email": cliente.email,
+                "total_visitas": cliente.total_visitas or 0,
+                "ultima_visita": cliente.ultima_visita,
+                "total_gastado": cliente.total_gastado or 0,
+                "etiquetas": etiquetas[cliente.id],
+                "estado": cliente.estado
+            }
+            for cliente in clientes
+        ]
+
     @staticmethod
     def create(db: Session, cliente: ClienteCreate, sede_id: int) -> Cliente:
         """
         Crear nuevo cliente en una sede
-        RN-CLI-001: Email único si se proporciona
+        RN-CLI-001: Email único si se proporciona; teléfono y cédula únicos normalizados
         """
         # Validar email único si se proporciona
         if cliente.email:
@@ -222,30 +327,22 @@ class ClienteService:
                     detail=f"Ya existe un cliente con el email {cliente.email}"
                 )
         
-        # Validar teléfono único si se proporciona (opcional, depende de reglas de negocio)
-        if cliente.telefono:
-            existing = db.query(Cliente).filter(
-                Cliente.telefono == cliente.telefono
-            ).first()
-            if existing:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Ya existe un cliente con el teléfono {cliente.telefono}"
-                )
-
-        # Crear cliente
-        db_cliente = Cliente(**cliente.model_dump(), sede_id=sede_id)
-        db.add(db_cliente)
-        db.flush()  # Para obtener el ID
-        
-        # Crear registro de preferencias vacío
-        preferencia = ClientePreferencia(cliente_id=db_cliente.id)
-        db.add(preferencia)
-        
-        db.commit()
-        db.refresh(db_cliente)
+        # Teléfono y cédula se comparan normalizados; el alta es atómica frente a
+        # peticiones simultáneas (índices únicos sobre las claves normalizadas)
+        db_cliente, creado = ClienteIdentidad.obtener_o_crear(db, cliente, sede_id)
+        if not creado:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=ClienteService._detalle_duplicado(db_cliente, cliente.cedula)
+            )
         return db_cliente
 
+    @staticmethod
+    def _detalle_duplicado(existente: Cliente, cedula: Optional[str]) -> str:
+        if cedula and existente.cedula_normalizada == normalizar_cedula(cedula):
+            return f"Ya existe un cliente con la cédula {existente.cedula}"
+        return f"Ya existe un cliente con el teléfono {existente.telefono}"
+
     @staticmethod
     def update(db: Session, cliente_id: int, cliente: ClienteUpdate) -> Cliente:
         """
@@ -275,24 +372,34 @@ class ClienteService:
                     detail=f"Ya existe un cliente con el email {update_data['email']}"
                 )
 
-        # Validar teléfono único si se está actualizando
-        if "telefono" in update_data and update_data["telefono"]:
-            existing = db.query(Cliente).filter(
-                and_(
-                    Cliente.telefono == update_data["telefono"],
-                    Cliente.id != cliente_id
-                )
-            ).first()
+        # Validar teléfono y cédula únicos (normalizados) si se están actualizando.
+        # Cada clave por separado: la cédula propia no debe ocultar un teléfono ajeno.
+        claves = (
+            (Cliente.cedula_normalizada, normalizar_cedula(update_data.get("cedula")), "la cédula", "cedula"),
+            (Cliente.telefono_normalizado, normalizar_telefono(update_data.get("telefono")), "el teléfono", "telefono"),
+        )
+        for columna, clave, descripcion, campo in claves:
+            if not clave:
+                continue
+            existing = db.query(Cliente).filter(columna == clave, Cliente.id != cliente_id).first()
             if existing:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Ya existe un cliente con el teléfono {update_data['telefono']}"
+                    detail=f"Ya existe un cliente con {descripcion} {getattr(existing, campo)}"
                 )
 
         for field, value in update_data.items():
             setattr(db_cliente, field, value)
 
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra petición tomó la cédula o el teléfono después de la validación
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ya existe un cliente con esa cédula o teléfono"
+            )
         db.refresh(db_cliente)
         return db_cliente
 
@@ -347,20 +454,12 @@ class ClienteService:
 
     @staticmethod
     def busqueda_rapida(db: Session, sede_id: int, query: str, limite: int = 10) -> List[Cliente]:
-        """Búsqueda rápida para autocompletado en una sede"""
-        search_term = f"%{query}%"
-        return db.query(Cliente).filter(
-            and_(
-                Cliente.estado == 'activo',
-                Cliente.sede_id == sede_id,
-                or_(
-                    Cliente.nombre.ilike(search_term),
-                    Cliente.apellido.ilike(search_term),
-                    Cliente.telefono.ilike(search_term),
-                    Cliente.cedula.ilike(search_term)
-                )
-            )
-        ).order_by(Cliente.nombre).limit(limite).all()
+        """Búsqueda rápida para autocompletado en una sede, ordenada por relevancia"""
+        ids = ClienteBusqueda.buscar_ids(db, sede_id, query, limite)
+        if not ids:
+            return []
+        por_id = {c.id: c for c in db.query(Cliente).filter(Cliente.id.in_(ids))}
+        return [por_id[id_] for id_ in ids if id_ in por_id]
 
     # ============================================
     # PREFERENCIAS
@@ -417,22 +516,21 @@ class ClienteService:
         """Lista todas las etiquetas con conteos opcionales"""
         etiquetas = db.query(ClienteEtiqueta).order_by(ClienteEtiqueta.nombre).all()
         
+        totales = {}
+        if incluir_totales:
+            totales = dict(db.query(
+                ClienteEtiquetaAsignacion.etiqueta_id, func.count()
+            ).group_by(ClienteEtiquetaAsignacion.etiqueta_id).all())
+        
         result = []
         for etiqueta in etiquetas:
-            item = {
+            result.append({
                 "id": etiqueta.id,
                 "nombre": etiqueta.nombre,
                 "color": etiqueta.color,
                 "fecha_creacion": etiqueta.fecha_creacion,
-                "total_clientes": 0
-            }
-            
-            if incluir_totales:
-                item["total_clientes"] = db.query(ClienteEtiquetaAsignacion).filter(
-                    ClienteEtiquetaAsignacion.etiqueta_id == etiqueta.id
-                ).count()
-            
-            result.append(item)
+                "total_clientes": totales.get(etiqueta.id, 0)
+            })
         
         return result
 
@@ -1,13 +1,37 @@
 from sqlalchemy.orm import Session
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Optional
 from datetime import date, time, datetime, timedelta
+from time import perf_counter
 from fastapi import HTTPException, status
 
+from ..config import settings
 from ..models.especialista import Especialista, HorarioEspecialista, BloqueoEspecialista
 from ..models.cita import Cita
 from ..models.servicio import Servicio
-from ..schemas.especialista import SlotDisponible, DisponibilidadResponse, DisponibilidadNombreResponse
-from sqlalchemy import or_, and_, func
+from ..schemas.especialista import (
+    DisponibilidadResponse, DisponibilidadNombreResponse, PrimerDisponibleResponse,
+    ComboDisponibleResponse, ComboPasoResponse
+)
+from .agenda_bitmap import (
+    AgendaBitmap, ESTADOS_CITA_INACTIVOS, cadenas_servicios, dia_semana_app, hora_desde_minuto, inicios_validos_lote,
+    minuto_del_dia, primeros_inicios, ReglasBloqueo
+)
+from sqlalchemy import or_, and_, exists, func
+from ..utils.cache import TTLCache
+from .catalogo_nombres import CatalogoNombres
+
+
+# Días de agenda ya calculados: (especialista_id, fecha) -> DiaAgenda.
+# El especialista pertenece a una sola sede, así que la clave la determina.
+disponibilidad_cache = TTLCache(
+    settings.disponibilidad_cache_ttl_seconds,
+    maxsize=settings.disponibilidad_cache_maxsize
+)
+
+# Ventana de búsqueda de primeros disponibles (días)
+DIAS_BUSQUEDA_DEFECTO = 7
+MAX_DIAS_BUSQUEDA = 31
 
 
 class DisponibilidadService:
@@ -37,32 +61,12 @@ class DisponibilidadService:
                 detail="Especialista no encontrado o inactivo"
             )
 
-        # Obtener horarios del especialista
-        horarios = db.query(HorarioEspecialista).filter(
-            HorarioEspecialista.especialista_id == especialista_id,
-            HorarioEspecialista.activo == True
-        ).all()
-
-        # Obtener bloqueos del especialista
-        bloqueos = db.query(BloqueoEspecialista).filter(
-            BloqueoEspecialista.especialista_id == especialista_id
-        ).all()
-
-        # Generar slots disponibles
-        slots = DisponibilidadService._generar_slots(
-            fecha_inicio, fecha_fin, horarios, bloqueos, intervalo_minutos
-        )
-
-        # TODO: Filtrar slots ocupados por citas cuando se implemente el modelo de Citas
-        # citas = db.query(Cita).filter(
-        #     Cita.especialista_id == especialista_id,
-        #     Cita.fecha.between(fecha_inicio, fecha_fin),
-        #     Cita.estado.in_(['agendada', 'confirmada'])
-        # ).all()
+        duracion = DisponibilidadService._duracion_servicio(db, servicio_id, intervalo_minutos)
+        agendas = DisponibilidadService._cargar_agendas(db, [especialista_id], fecha_inicio, fecha_fin)
 
         return DisponibilidadResponse(
             especialista_id=especialista_id,
-            slots=slots
+            slots=agendas[especialista_id].slots(duracion, intervalo_minutos)
         )
 
     @staticmethod
@@ -74,27 +78,90 @@ class DisponibilidadService:
         intervalo_minutos: int = 15
     ) -> List[DisponibilidadResponse]:
         """
-        Obtener disponibilidad de todos los especialistas activos para un servicio
+        Obtener disponibilidad de todos los especialistas activos para un servicio.
+        Número fijo de consultas sin importar cuántos especialistas califiquen.
         """
         # Obtener especialistas activos que ofrecen el servicio
         from ..models.especialista import EspecialistaServicio
         
-        especialistas = db.query(Especialista).join(
-            EspecialistaServicio,
-            Especialista.id == EspecialistaServicio.especialista_id
-        ).filter(
-            Especialista.estado == "activo",
-            EspecialistaServicio.servicio_id == servicio_id
-        ).all()
+        especialista_ids = [
+            especialista_id for (especialista_id,) in db.query(Especialista.id).join(
+                EspecialistaServicio,
+                Especialista.id == EspecialistaServicio.especialista_id
+            ).filter(
+                Especialista.estado == "activo",
+                EspecialistaServicio.servicio_id == servicio_id
+            ).order_by(Especialista.id).all()
+        ]
+
+        if not especialista_ids:
+            return []
+
+        duracion = DisponibilidadService._duracion_servicio(db, servicio_id, intervalo_minutos)
+        agendas = DisponibilidadService._cargar_agendas(db, especialista_ids, fecha_inicio, fecha_fin)
+
+        # Una sola pasada vectorizada para todos los especialistas
+        lista = [agendas[especialista_id] for especialista_id in especialista_ids]
+        validos = inicios_validos_lote(lista, duracion)
+
+        return [
+            DisponibilidadResponse(
+                especialista_id=especialista_id,
+                slots=agenda.slots(duracion, intervalo_minutos, matriz)
+            )
+            for especialista_id, agenda, matriz in zip(especialista_ids, lista, validos)
+        ]
 
-        disponibilidades = []
-        for especialista in especialistas:
-            disponibilidad = DisponibilidadService.get_disponibilidad_especialista(
-                db, especialista.id, servicio_id, fecha_inicio, fecha_fin, intervalo_minutos
+    @staticmethod
+    def buscar_primeros_disponibles(
+        db: Session,
+        sede_id: int,
+        servicio_id: int,
+        fecha_inicio: date,
+        fecha_fin: Optional[date] = None,
+        especialista_id: Optional[int] = None,
+        hora_desde: Optional[time] = None,
+        limite: int = 5,
+        intervalo_minutos: int = 15
+    ) -> List[PrimerDisponibleResponse]:
+        """
+        Primeros `limite` pares (especialista, hora de inicio) donde cabe el servicio,
+        en orden cronológico. Pensado para el agente de WhatsApp: una sola llamada en
+        lugar de sondear hora a hora con consultar-disponibilidad-nombre.
+        """
+        fecha_fin = DisponibilidadService._rango_busqueda(fecha_inicio, fecha_fin)
+
+        duracion = db.query(Servicio.duracion_minutos).filter(Servicio.id == servicio_id).scalar()
+        if not duracion:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Servicio no encontrado"
             )
-            disponibilidades.append(disponibilidad)
 
-        return disponibilidades
+        filas = DisponibilidadService._especialistas_para_servicio(db, sede_id, servicio_id, especialista_id)
+        if not filas:
+            return []
+
+        especialista_ids = [fila.id for fila in filas]
+        agendas = DisponibilidadService._cargar_agendas(db, especialista_ids, fecha_inicio, fecha_fin)
+        lista = [agendas[esp_id] for esp_id in especialista_ids]
+        validos = inicios_validos_lote(lista, duracion)
+
+        inicios = primeros_inicios(
+            lista, validos, duracion, intervalo_minutos, limite,
+            minuto_desde=minuto_del_dia(hora_desde) if hora_desde else 0
+        )
+
+        return [
+            PrimerDisponibleResponse(
+                especialista_id=filas[pos].id,
+                nombre_completo=f"{filas[pos].nombre} {filas[pos].apellido}",
+                fecha=lista[pos].fecha(dia),
+                hora_inicio=hora_desde_minuto(minuto),
+                hora_fin=hora_desde_minuto(minuto + duracion)
+            )
+            for pos, dia, minuto in inicios
+        ]
 
     @staticmethod
     def consultar_disponibilidad_por_nombre(
@@ -108,26 +175,16 @@ class DisponibilidadService:
         """
         Consulta si un especialista por nombre está libre, ocupado o bloqueado
         """
-        # 1. Buscar especialista
-        termino_busqueda = f"%{nombre_especialista}%"
-        especialista = db.query(Especialista).filter(
-            Especialista.sede_id == sede_id,
-            Especialista.estado == "activo",
-            or_(
-                Especialista.nombre.ilike(termino_busqueda),
-                Especialista.apellido.ilike(termino_busqueda),
-                func.concat(Especialista.nombre, " ", Especialista.apellido).ilike(termino_busqueda)
-            )
-        ).first()
+        # 1. Buscar especialista (índice de nombres en memoria)
+        especialista_id = CatalogoNombres.resolver_especialista(db, nombre_especialista, sede_id)
+        especialista = db.get(Especialista, especialista_id) if especialista_id else None
 
         if not especialista:
              raise HTTPException(status_code=404, detail=f"Especialista '{nombre_especialista}' no encontrado")
 
         # 2. Obtener duración del servicio para calcular hora_fin
-        servicio_obj = db.query(Servicio).filter(
-            Servicio.nombre.ilike(f"%{servicio}%"),
-            Servicio.sede_id == sede_id
-        ).first()
+        servicio_id = CatalogoNombres.resolver_servicio(db, servicio, sede_id)
+        servicio_obj = db.get(Servicio, servicio_id) if servicio_id else None
         
         if not servicio_obj:
             raise HTTPException(status_code=400, detail=f"Servicio '{servicio}' no encontrado en esta sede")
@@ -137,10 +194,8 @@ class DisponibilidadService:
         dt_fin = dt_inicio + timedelta(minutes=duracion)
         hora_fin = dt_fin.time()
 
-        # 3. Verificar Bloqueos (HARD STOP)
-        bloqueos = db.query(BloqueoEspecialista).filter(
-            BloqueoEspecialista.especialista_id == especialista.id
-        ).all()
+        # 3. Verificar Bloqueos (HARD STOP), solo los vigentes en la fecha
+        bloqueos = DisponibilidadService._bloqueos_en_rango(db, [especialista.id], fecha, fecha)
 
         esta_bloqueado = DisponibilidadService._esta_bloqueado(fecha, hora_inicio, hora_fin, bloqueos)
         if esta_bloqueado:
@@ -199,118 +254,401 @@ class DisponibilidadService:
         solo_disponibles: bool = False
     ) -> List[dict]:
         """
-        Obtener todos los especialistas de una sede y su estado en una hora específica
+        Obtener todos los especialistas de una sede y su estado en una hora específica.
+        Se resuelve en una sola consulta: horario y cita como EXISTS correlacionados y
+        los bloqueos vigentes en la fecha como LEFT JOIN (la recurrencia se evalúa en memoria).
         """
-        from sqlalchemy.orm import joinedload
-        
-        # 1. Obtener todos los especialistas activos de la sede
-        especialistas = db.query(Especialista).options(
-            joinedload(Especialista.horarios),
-            joinedload(Especialista.bloqueos)
+        # Convertir de 0=Lunes (Python) a 0=Domingo (Backend/App logic)
+        dia_semana = dia_semana_app(fecha)
+
+        # Usamos una ventana de 1 minuto solo para detectar si coincide con el inicio o durante una cita/bloqueo
+        hora_fin = (datetime.combine(fecha, hora) + timedelta(minutes=1)).time()
+
+        # A. El horario laboral debe cubrir el momento consultado
+        en_horario = exists().where(
+            HorarioEspecialista.especialista_id == Especialista.id,
+            HorarioEspecialista.activo == True,
+            HorarioEspecialista.dia_semana == dia_semana,
+            HorarioEspecialista.hora_inicio <= hora,
+            HorarioEspecialista.hora_fin > hora
+        ).correlate(Especialista)
+
+        # C. Citas activas que cubren la hora
+        tiene_cita = exists().where(
+            Cita.especialista_id == Especialista.id,
+            Cita.fecha == fecha,
+            Cita.estado.notin_(ESTADOS_CITA_INACTIVOS),
+            Cita.hora_inicio <= hora,
+            Cita.hora_fin > hora
+        ).correlate(Especialista)
+
+        filas = db.query(
+            Especialista.id,
+            Especialista.nombre,
+            Especialista.apellido,
+            en_horario.label("en_horario"),
+            tiene_cita.label("tiene_cita"),
+            BloqueoEspecialista
+        ).outerjoin(
+            BloqueoEspecialista,
+            and_(
+                BloqueoEspecialista.especialista_id == Especialista.id,
+                BloqueoEspecialista.fecha_inicio <= fecha,
+                BloqueoEspecialista.fecha_fin >= fecha
+            )
         ).filter(
             Especialista.sede_id == sede_id,
             Especialista.estado == "activo"
-        ).all()
-
-        # Calcular una ventana de tiempo (ej: 15 min) para la verificación de solapamiento
-        dt_inicio = datetime.combine(fecha, hora)
-        # Usamos una ventana de 1 minuto solo para detectar si coincide con el inicio o durante una cita/bloqueo
-        dt_fin = dt_inicio + timedelta(minutes=1)
-        hora_fin = dt_fin.time()
+        ).order_by(Especialista.id).all()
+
+        # Agrupar las filas (una por bloqueo candidato) por especialista
+        estados: Dict[int, dict] = {}
+        bloqueos_por_esp: Dict[int, list] = defaultdict(list)
+        for esp_id, nombre, apellido, esta_en_horario, hay_cita, bloqueo in filas:
+            if esp_id not in estados:
+                estados[esp_id] = {
+                    "id": esp_id,
+                    "nombre_completo": f"{nombre} {apellido}",
+                    "esta_en_horario": bool(esta_en_horario),
+                    "tiene_cita": bool(hay_cita),
+                }
+            if bloqueo is not None:
+                bloqueos_por_esp[esp_id].append(bloqueo)
 
         resultados = []
-        for esp in especialistas:
-            # A. Verificar si está en su horario laboral
-            # Convertir de 0=Lunes (Python) a 0=Domingo (Backend/App logic)
-            dia_semana_py = fecha.weekday()
-            dia_semana = (dia_semana_py + 1) % 7
-            
-            en_horario = False
-            for h in esp.horarios:
-                if h.activo and h.dia_semana == dia_semana:
-                    # El horario laboral debe cubrir el momento consultado
-                    if h.hora_inicio <= hora and h.hora_fin > hora:
-                        en_horario = True
-                        break
-            
+        for esp_id, estado in estados.items():
             # B. Verificar bloqueos
-            tiene_bloqueo = DisponibilidadService._esta_bloqueado(fecha, hora, hora_fin, esp.bloqueos)
-            
-            # C. Verificar citas
-            tiene_cita = db.query(Cita).filter(
-                Cita.especialista_id == esp.id,
-                Cita.fecha == fecha,
-                Cita.estado.notin_(['cancelada', 'no_show']),
-                Cita.hora_inicio <= hora,
-                Cita.hora_fin > hora
-            ).first() is not None
+            tiene_bloqueo = DisponibilidadService._esta_bloqueado(fecha, hora, hora_fin, bloqueos_por_esp[esp_id])
+            disponible = estado["esta_en_horario"] and not tiene_bloqueo and not estado["tiene_cita"]
 
-            if not solo_disponibles or (en_horario and not tiene_bloqueo and not tiene_cita):
+            if not solo_disponibles or disponible:
                 resultados.append({
-                    "id": esp.id,
-                    "nombre_completo": f"{esp.nombre} {esp.apellido}",
-                    "esta_en_horario": en_horario,
+                    "id": esp_id,
+                    "nombre_completo": estado["nombre_completo"],
+                    "esta_en_horario": estado["esta_en_horario"],
                     "tiene_bloqueo": tiene_bloqueo,
-                    "tiene_cita": tiene_cita,
-                    "disponible": en_horario and not tiene_bloqueo and not tiene_cita
+                    "tiene_cita": estado["tiene_cita"],
+                    "disponible": disponible
                 })
-        
+
         return resultados
 
+    @staticmethod
+    def invalidar_agenda(
+        especialista_id: int,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None
+    ) -> int:
+        """
+        Descartar los días cacheados de un especialista: uno (solo fecha_inicio),
+        un rango, o todos si no se indican fechas. Llamar después del commit.
+        """
+        if fecha_inicio is not None and fecha_fin is None:
+            return int(disponibilidad_cache.invalidate((especialista_id, fecha_inicio)))
+
+        def coincide(clave, _):
+            esp_id, fecha = clave
+            if esp_id != especialista_id:
+                return False
+            return fecha_inicio is None or fecha_inicio <= fecha <= fecha_fin
+
+        return disponibilidad_cache.invalidate_where(coincide)
+
+    @staticmethod
+    def get_cache_stats() -> Dict:
+        stats = disponibilidad_cache.stats()
+        stats["recalculo_ms_promedio"] = round(stats["load_ms_total"] / stats["loads"], 4) if stats["loads"] else 0.0
+        return stats
 
     @staticmethod
-    def _generar_slots(
+    def buscar_combos(
+        db: Session,
+        sede_id: int,
+        servicio_ids: List[int],
         fecha_inicio: date,
-        fecha_fin: date,
-        horarios: List[HorarioEspecialista],
-        bloqueos: List[BloqueoEspecialista],
-        intervalo_minutos: int
-    ) -> List[SlotDisponible]:
-        """Generar slots de tiempo basados en horarios y bloqueos"""
-        slots = []
-        current_date = fecha_inicio
-
-        # Crear diccionario de horarios por día de semana
-        horarios_por_dia = {}
+        fecha_fin: Optional[date] = None,
+        hora_desde: Optional[time] = None,
+        max_espera_minutos: int = 15,
+        limite: int = 5,
+        intervalo_minutos: int = 15
+    ) -> List[ComboDisponibleResponse]:
+        """
+        Primeras horas en que se puede atender una secuencia de servicios (ej. alisado
+        y luego lavado) el mismo día, cada uno con un especialista que lo atiende y
+        con a lo sumo `max_espera_minutos` entre uno y otro. Se prefiere que el mismo
+        especialista continúe cuando puede. Las agendas salen del caché y la cadena se
+        resuelve sobre los mapas de bits (ver cadenas_servicios).
+        """
+        fecha_fin = DisponibilidadService._rango_busqueda(fecha_inicio, fecha_fin)
+
+        duraciones = dict(
+            db.query(Servicio.id, Servicio.duracion_minutos).filter(Servicio.id.in_(servicio_ids)).all()
+        )
+        if any(not duraciones.get(sid) for sid in servicio_ids):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Servicio no encontrado"
+            )
+
+        filas_por_servicio = {
+            sid: DisponibilidadService._especialistas_para_servicio(db, sede_id, sid)
+            for sid in set(servicio_ids)
+        }
+        nombres = {
+            fila.id: f"{fila.nombre} {fila.apellido}"
+            for filas in filas_por_servicio.values() for fila in filas
+        }
+        if not all(filas_por_servicio.values()):
+            return []
+
+        especialista_ids = sorted(nombres)
+        posicion = {esp_id: i for i, esp_id in enumerate(especialista_ids)}
+        agendas = DisponibilidadService._cargar_agendas(db, especialista_ids, fecha_inicio, fecha_fin)
+        lista = [agendas[esp_id] for esp_id in especialista_ids]
+        pasos = [
+            ([posicion[fila.id] for fila in filas_por_servicio[sid]], duraciones[sid])
+            for sid in servicio_ids
+        ]
+
+        cadenas = cadenas_servicios(
+            lista, pasos, max_espera_minutos, intervalo_minutos, limite,
+            minuto_desde=minuto_del_dia(hora_desde) if hora_desde else 0
+        )
+
+        combos = []
+        for dia, cadena in cadenas:
+            pasos_respuesta = [
+                ComboPasoResponse(
+                    servicio_id=sid,
+                    especialista_id=especialista_ids[pos],
+                    nombre_completo=nombres[especialista_ids[pos]],
+                    hora_inicio=hora_desde_minuto(minuto),
+                    hora_fin=hora_desde_minuto(minuto + duraciones[sid])
+                )
+                for sid, (pos, minuto) in zip(servicio_ids, cadena)
+            ]
+            fin = cadena[-1][1] + duraciones[servicio_ids[-1]]
+            combos.append(ComboDisponibleResponse(
+                fecha=lista[0].fecha(dia),
+                hora_inicio=pasos_respuesta[0].hora_inicio,
+                hora_fin=pasos_respuesta[-1].hora_fin,
+                espera_minutos=fin - cadena[0][1] - sum(duraciones[sid] for sid in servicio_ids),
+                pasos=pasos_respuesta
+            ))
+        return combos
+
+    @staticmethod
+    def _rango_busqueda(fecha_inicio: date, fecha_fin: Optional[date]) -> date:
+        """Fin del rango de búsqueda (una semana por defecto), validando el máximo"""
+        if fecha_fin is None:
+            fecha_fin = fecha_inicio + timedelta(days=DIAS_BUSQUEDA_DEFECTO - 1)
+        if fecha_fin < fecha_inicio:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="fecha_fin debe ser mayor o igual a fecha_inicio"
+            )
+        if (fecha_fin - fecha_inicio).days + 1 > MAX_DIAS_BUSQUEDA:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El rango de búsqueda no puede superar {MAX_DIAS_BUSQUEDA} días"
+            )
+        return fecha_fin
+
+    @staticmethod
+    def candidatos_asignacion(
+        db: Session,
+        sede_id: int,
+        servicio_id: int,
+        fecha: date,
+        hora_inicio: time
+    ) -> List[int]:
+        """
+        Especialistas que pueden atender el servicio a esa hora, de menor a mayor carga
+        del día, para asignar automáticamente las reservas del agente externo.
+        La carga es la fracción del horario del día ya reservada en citas activas
+        (a igual fracción, menos minutos reservados y luego menor id). Se usan las
+        agendas en caché y una consulta agregada de minutos reservados.
+        """
+        duracion = db.query(Servicio.duracion_minutos).filter(Servicio.id == servicio_id).scalar()
+        if not duracion:
+            return []
+        filas = DisponibilidadService._especialistas_para_servicio(db, sede_id, servicio_id)
+        if not filas:
+            return []
+
+        especialista_ids = [fila.id for fila in filas]
+        agendas = DisponibilidadService._cargar_agendas(db, especialista_ids, fecha, fecha)
+        lista = [agendas[esp_id] for esp_id in especialista_ids]
+        validos = inicios_validos_lote(lista, duracion)
+        minuto = minuto_del_dia(hora_inicio)
+
+        reservados = dict(
+            db.query(Cita.especialista_id, func.sum(Cita.duracion_minutos)).filter(
+                Cita.especialista_id.in_(especialista_ids),
+                Cita.fecha == fecha,
+                Cita.estado.notin_(ESTADOS_CITA_INACTIVOS)
+            ).group_by(Cita.especialista_id).all()
+        )
+
+        candidatos = []
+        for esp_id, agenda, matriz in zip(especialista_ids, lista, validos):
+            if not matriz[0, minuto]:
+                continue
+            minutos_reservados = int(reservados.get(esp_id) or 0)
+            jornada = agenda.minutos_horario(0) or 1
+            candidatos.append((minutos_reservados / jornada, minutos_reservados, esp_id))
+        candidatos.sort()
+        return [esp_id for _, _, esp_id in candidatos]
+
+    @staticmethod
+    def _especialistas_para_servicio(
+        db: Session,
+        sede_id: int,
+        servicio_id: int,
+        especialista_id: Optional[int] = None
+    ) -> list:
+        """
+        Especialistas activos de la sede que atienden el servicio (id, nombre, apellido).
+        Si hay asignaciones para el servicio se respetan; si la sede no las tiene
+        cargadas, cualquier especialista activo puede atenderlo. El filtro por
+        especialista va después: un preferido sin el servicio no entra por el respaldo.
+        """
+        from ..models.especialista import EspecialistaServicio
+
+        query = db.query(
+            Especialista.id,
+            Especialista.nombre,
+            Especialista.apellido,
+            EspecialistaServicio.servicio_id
+        ).outerjoin(
+            EspecialistaServicio,
+            and_(
+                EspecialistaServicio.especialista_id == Especialista.id,
+                EspecialistaServicio.servicio_id == servicio_id
+            )
+        ).filter(
+            Especialista.sede_id == sede_id,
+            Especialista.estado == "activo"
+        )
+        filas = query.order_by(Especialista.id).all()
+
+        if any(fila.servicio_id is not None for fila in filas):
+            filas = [fila for fila in filas if fila.servicio_id is not None]
+        if especialista_id:
+            filas = [fila for fila in filas if fila.id == especialista_id]
+        return filas
+
+    @staticmethod
+    def _duracion_servicio(db: Session, servicio_id: int, por_defecto: int) -> int:
+        """Duración del servicio; si no existe se evalúan slots del tamaño del intervalo"""
+        duracion = db.query(Servicio.duracion_minutos).filter(Servicio.id == servicio_id).scalar()
+        return duracion or por_defecto
+
+    @staticmethod
+    def _cargar_agendas(
+        db: Session,
+        especialista_ids: List[int],
+        fecha_inicio: date,
+        fecha_fin: date
+    ) -> Dict[int, AgendaBitmap]:
+        """
+        Agendas de varios especialistas armadas con los días cacheados por
+        (especialista, fecha). Los días faltantes se recalculan juntos con
+        _calcular_agendas sobre el menor rango que los cubre.
+        """
+        num_dias = max((fecha_fin - fecha_inicio).days + 1, 0)
+        fechas = [fecha_inicio + timedelta(days=i) for i in range(num_dias)]
+
+        dias_por_esp = {
+            especialista_id: [disponibilidad_cache.get((especialista_id, fecha)) for fecha in fechas]
+            for especialista_id in especialista_ids
+        }
+        pendientes = [
+            especialista_id for especialista_id, dias in dias_por_esp.items()
+            if any(dia is None for dia in dias)
+        ]
+
+        if pendientes:
+            faltantes = [
+                i for i in range(num_dias)
+                if any(dias_por_esp[especialista_id][i] is None for especialista_id in pendientes)
+            ]
+            desde, hasta = faltantes[0], faltantes[-1]
+
+            generation = disponibilidad_cache.generation
+            inicio = perf_counter()
+            calculadas = DisponibilidadService._calcular_agendas(db, pendientes, fechas[desde], fechas[hasta])
+            for especialista_id, agenda in calculadas.items():
+                dias = dias_por_esp[especialista_id]
+                for i in range(desde, hasta + 1):
+                    dias[i] = agenda.dia(i - desde)
+                    disponibilidad_cache.set((especialista_id, fechas[i]), dias[i], generation=generation)
+            disponibilidad_cache.record_load(perf_counter() - inicio, len(pendientes) * (hasta - desde + 1))
+
+        return {
+            especialista_id: AgendaBitmap.desde_dias(fecha_inicio, fecha_fin, dias)
+            for especialista_id, dias in dias_por_esp.items()
+        }
+
+    @staticmethod
+    def _calcular_agendas(
+        db: Session,
+        especialista_ids: List[int],
+        fecha_inicio: date,
+        fecha_fin: date
+    ) -> Dict[int, AgendaBitmap]:
+        """
+        Construir las agendas de varios especialistas con tres consultas en total:
+        horarios activos, bloqueos que tocan el rango y citas activas del rango.
+        """
+        agendas = {
+            especialista_id: AgendaBitmap(fecha_inicio, fecha_fin)
+            for especialista_id in especialista_ids
+        }
+
+        horarios = db.query(HorarioEspecialista).filter(
+            HorarioEspecialista.especialista_id.in_(especialista_ids),
+            HorarioEspecialista.activo == True
+        ).all()
+
+        bloqueos = DisponibilidadService._bloqueos_en_rango(db, especialista_ids, fecha_inicio, fecha_fin)
+
+        citas = db.query(Cita).filter(
+            Cita.especialista_id.in_(especialista_ids),
+            Cita.fecha.between(fecha_inicio, fecha_fin),
+            Cita.estado.notin_(ESTADOS_CITA_INACTIVOS)
+        ).all()
+
+        horarios_por_esp: Dict[int, list] = defaultdict(list)
         for horario in horarios:
-            if horario.dia_semana not in horarios_por_dia:
-                horarios_por_dia[horario.dia_semana] = []
-            horarios_por_dia[horario.dia_semana].append(horario)
-
-        while current_date <= fecha_fin:
-            dia_semana = current_date.weekday()
-            # Convertir de lunes=0 a domingo=0
-            dia_semana = (dia_semana + 1) % 7
-
-            # Verificar si hay horarios para este día
-            if dia_semana in horarios_por_dia:
-                for horario in horarios_por_dia[dia_semana]:
-                    # Generar slots para este horario
-                    hora_actual = horario.hora_inicio
-                    while hora_actual < horario.hora_fin:
-                        # Calcular hora fin del slot
-                        hora_fin_slot = DisponibilidadService._sumar_minutos(
-                            hora_actual, intervalo_minutos
-                        )
-
-                        if hora_fin_slot <= horario.hora_fin:
-                            # Verificar si está bloqueado
-                            bloqueado = DisponibilidadService._esta_bloqueado(
-                                current_date, hora_actual, hora_fin_slot, bloqueos
-                            )
-
-                            slots.append(SlotDisponible(
-                                fecha=current_date,
-                                hora_inicio=hora_actual,
-                                hora_fin=hora_fin_slot,
-                                disponible=not bloqueado
-                            ))
-
-                        hora_actual = hora_fin_slot
-
-            current_date += timedelta(days=1)
-
-        return slots
+            horarios_por_esp[horario.especialista_id].append(horario)
+        bloqueos_por_esp: Dict[int, list] = defaultdict(list)
+        for bloqueo in bloqueos:
+            bloqueos_por_esp[bloqueo.especialista_id].append(bloqueo)
+        citas_por_esp: Dict[int, list] = defaultdict(list)
+        for cita in citas:
+            citas_por_esp[cita.especialista_id].append(cita)
+
+        for especialista_id, agenda in agendas.items():
+            agenda.aplicar_horarios(horarios_por_esp[especialista_id])
+            agenda.aplicar_bloqueos(bloqueos_por_esp[especialista_id])
+            agenda.aplicar_citas(citas_por_esp[especialista_id])
+
+        return agendas
+
+    @staticmethod
+    def _bloqueos_en_rango(
+        db: Session,
+        especialista_ids: List[int],
+        fecha_inicio: date,
+        fecha_fin: date
+    ) -> List[BloqueoEspecialista]:
+        """Bloqueos que tocan el rango (usa ix_bloqueos_especialista_fechas)"""
+        return db.query(BloqueoEspecialista).filter(
+            BloqueoEspecialista.especialista_id.in_(especialista_ids),
+            BloqueoEspecialista.fecha_inicio <= fecha_fin,
+            BloqueoEspecialista.fecha_fin >= fecha_inicio
+        ).all()
 
     @staticmethod
     def _esta_bloqueado(
@@ -320,29 +658,4 @@ class DisponibilidadService:
         bloqueos: List[BloqueoEspecialista]
     ) -> bool:
         """Verificar si un slot está bloqueado"""
-        for bloqueo in bloqueos:
-            # Verificar si la fecha está en el rango del bloqueo
-            if bloqueo.fecha_inicio <= fecha <= bloqueo.fecha_fin:
-                # Si es recurrente, verificar día de semana
-                if bloqueo.es_recurrente:
-                    dia_semana = (fecha.weekday() + 1) % 7
-                    if bloqueo.dias_semana and dia_semana not in bloqueo.dias_semana:
-                        continue
-
-                # Si el bloqueo tiene horas específicas, verificarlas
-                if bloqueo.hora_inicio and bloqueo.hora_fin:
-                    # Hay solapamiento si no se cumple que uno termina antes que el otro empiece
-                    if not (hora_fin <= bloqueo.hora_inicio or bloqueo.hora_fin <= hora_inicio):
-                        return True
-                else:
-                    # Bloqueo de todo el día
-                    return True
-
-        return False
-
-    @staticmethod
-    def _sumar_minutos(hora: time, minutos: int) -> time:
-        """Sumar minutos a una hora"""
-        dt = datetime.combine(date.today(), hora)
-        dt += timedelta(minutes=minutos)
-        return dt.time()
+        return ReglasBloqueo(bloqueos, fecha, fecha).bloquea(fecha, hora_inicio, hora_fin)
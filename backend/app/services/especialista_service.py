@@ -1,7 +1,8 @@
+import hashlib
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
-from typing import List, Optional
-from datetime import date, datetime
+from typing import List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
 from fastapi import HTTPException, status
 
 from ..models.especialista import Especialista, HorarioEspecialista, BloqueoEspecialista, EspecialistaServicio
@@ -9,11 +10,15 @@ from ..schemas.especialista import (
     EspecialistaCreate, EspecialistaUpdate,
     HorarioEspecialistaCreate, HorarioEspecialistaUpdate,
     BloqueoEspecialistaCreate, BloqueoEspecialistaUpdate,
-    EspecialistaServicioCreate, EspecialistaServicioUpdate
+    EspecialistaServicioCreate, EspecialistaServicioUpdate,
+    EspecialistaResponse, EspecialistaCalendarioResponse, HorarioEspecialistaResponse,
+    BloqueoEspecialistaResponse, BloqueoDiaResponse
 )
 from ..services.servicio_service import ServicioService
 from ..services.comision_especialista_service import ComisionEspecialistaService
 from ..services.horario_service import HorarioService
+from ..services.disponibilidad_service import DisponibilidadService
+from ..services.agenda_bitmap import dia_semana_app, fechas_bloqueo
 
 
 class EspecialistaService:
@@ -34,6 +39,66 @@ class EspecialistaService:
         """Listar solo especialistas activos de una sede (para agenda)"""
         return db.query(Especialista).filter(and_(Especialista.estado == "activo", Especialista.sede_id == sede_id)).all()
 
+    @staticmethod
+    def get_calendario(
+        db: Session,
+        sede_id: int,
+        fecha_inicio: date,
+        fecha_fin: Optional[date] = None
+    ) -> Tuple[List[EspecialistaCalendarioResponse], str]:
+        """
+        Especialistas activos con lo necesario para pintar el calendario en el rango:
+        horarios activos de los días de semana del rango, bloqueos que tocan el rango
+        y esos bloqueos ya expandidos por fecha (los recurrentes solo en sus días).
+        Tres consultas sin importar el historial de bloqueos. Retorna (respuesta, etag).
+        """
+        fecha_fin = DisponibilidadService._rango_busqueda(fecha_inicio, fecha_fin)
+
+        especialistas = db.query(Especialista).filter(
+            Especialista.estado == "activo",
+            Especialista.sede_id == sede_id
+        ).order_by(Especialista.id).all()
+        ids = [e.id for e in especialistas]
+
+        dias_semana = {dia_semana_app(fecha_inicio + timedelta(days=n)) for n in range((fecha_fin - fecha_inicio).days + 1)}
+        horarios = db.query(HorarioEspecialista).filter(
+            HorarioEspecialista.especialista_id.in_(ids),
+            HorarioEspecialista.activo == True,
+            HorarioEspecialista.dia_semana.in_(dias_semana)
+        ).order_by(HorarioEspecialista.dia_semana, HorarioEspecialista.hora_inicio).all() if ids else []
+        bloqueos = db.query(BloqueoEspecialista).filter(
+            BloqueoEspecialista.especialista_id.in_(ids),
+            BloqueoEspecialista.fecha_inicio <= fecha_fin,
+            BloqueoEspecialista.fecha_fin >= fecha_inicio
+        ).order_by(BloqueoEspecialista.fecha_inicio, BloqueoEspecialista.id).all() if ids else []
+
+        horarios_por_esp = {esp_id: [] for esp_id in ids}
+        for h in horarios:
+            horarios_por_esp[h.especialista_id].append(HorarioEspecialistaResponse.model_validate(h))
+        bloqueos_por_esp = {esp_id: [] for esp_id in ids}
+        dias_por_esp = {esp_id: [] for esp_id in ids}
+        for b in bloqueos:
+            bloqueos_por_esp[b.especialista_id].append(BloqueoEspecialistaResponse.model_validate(b))
+            dias_por_esp[b.especialista_id].extend(
+                BloqueoDiaResponse(
+                    bloqueo_id=b.id, fecha=fecha, hora_inicio=b.hora_inicio,
+                    hora_fin=b.hora_fin, motivo=b.motivo
+                )
+                for fecha in fechas_bloqueo(b, fecha_inicio, fecha_fin)
+            )
+
+        respuesta = [
+            EspecialistaCalendarioResponse(
+                **EspecialistaResponse.model_validate(e).model_dump(),
+                horarios=horarios_por_esp[e.id],
+                bloqueos=bloqueos_por_esp[e.id],
+                bloqueos_dia=sorted(dias_por_esp[e.id], key=lambda d: (d.fecha, d.hora_inicio or time.min))
+            )
+            for e in especialistas
+        ]
+        etag = f'W/"{hashlib.sha1(repr(respuesta).encode()).hexdigest()}"'
+        return respuesta, etag
+
     @staticmethod
     def get_by_id(db: Session, especialista_id: int) -> Optional[Especialista]:
         """Obtener especialista por ID"""
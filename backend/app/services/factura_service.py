@@ -26,6 +26,7 @@ from ..models.cliente import Cliente
 from ..models.abono import Abono, RedencionAbono
 from ..schemas.caja import FacturaCreate, DetalleFacturaCreate, FacturaFromPendientesCreate, FacturaUpdate
 from .caja_service import CajaService
+from . import cliente_estadisticas  # noqa: F401  mantiene visitas y gasto al confirmar
 
 
 class FacturaService:
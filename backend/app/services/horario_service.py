@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List
+from sqlalchemy import and_, insert
+from typing import Iterable, List, Optional, Tuple
 from datetime import time
 from fastapi import HTTPException, status
 
-from ..models.especialista import HorarioEspecialista
+from ..models.especialista import Especialista, HorarioEspecialista
 from ..schemas.especialista import HorarioEspecialistaCreate, HorarioEspecialistaUpdate
+from .disponibilidad_service import DisponibilidadService
 
 
 class HorarioService:
@@ -35,6 +36,7 @@ class HorarioService:
         )
         db.add(db_horario)
         db.commit()
+        DisponibilidadService.invalidar_agenda(especialista_id)
         db.refresh(db_horario)
         return db_horario
 
@@ -44,37 +46,48 @@ class HorarioService:
         Guardar múltiples horarios (batch)
         Reemplaza todos los horarios existentes del especialista
         """
-        # Eliminar horarios existentes
-        db.query(HorarioEspecialista).filter(
-            HorarioEspecialista.especialista_id == especialista_id
-        ).delete()
-
-        # Crear nuevos horarios
-        db_horarios = []
-        for horario in horarios:
-            # Validar solapamiento entre los nuevos horarios
-            for existing in db_horarios:
-                if existing.dia_semana == horario.dia_semana:
-                    if HorarioService._hay_solapamiento(
-                        horario.hora_inicio, horario.hora_fin,
-                        existing.hora_inicio, existing.hora_fin
-                    ):
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"Horarios solapados en día {horario.dia_semana}"
-                        )
-
-            db_horario = HorarioEspecialista(
-                especialista_id=especialista_id,
-                **horario.model_dump()
+        HorarioService._validar_semana(horarios)
+        HorarioService._reemplazar(db, [especialista_id], horarios)
+        return HorarioService.get_by_especialista(db, especialista_id)
+
+    @staticmethod
+    def aplicar_plantilla(db: Session, especialista_ids: List[int], horarios: List[HorarioEspecialistaCreate]) -> int:
+        """
+        Aplicar la misma semana de horarios a varios especialistas.
+        Reemplaza sus horarios existentes; retorna la cantidad de horarios creados.
+        """
+        especialista_ids = list(dict.fromkeys(especialista_ids))
+        existentes = {
+            esp_id for (esp_id,) in db.query(Especialista.id).filter(Especialista.id.in_(especialista_ids))
+        }
+        faltantes = [esp_id for esp_id in especialista_ids if esp_id not in existentes]
+        if faltantes:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Especialistas no encontrados: {faltantes}"
             )
-            db_horarios.append(db_horario)
 
-        db.add_all(db_horarios)
+        HorarioService._validar_semana(horarios)
+        return HorarioService._reemplazar(db, especialista_ids, horarios)
+
+    @staticmethod
+    def _reemplazar(db: Session, especialista_ids: List[int], horarios: List[HorarioEspecialistaCreate]) -> int:
+        """Borrar los horarios de los especialistas e insertar los nuevos en un solo INSERT"""
+        db.query(HorarioEspecialista).filter(
+            HorarioEspecialista.especialista_id.in_(especialista_ids)
+        ).delete(synchronize_session=False)
+
+        filas = [
+            {"especialista_id": esp_id, **horario.model_dump()}
+            for esp_id in especialista_ids
+            for horario in horarios
+        ]
+        if filas:
+            db.execute(insert(HorarioEspecialista), filas)
         db.commit()
-        for horario in db_horarios:
-            db.refresh(horario)
-        return db_horarios
+        for esp_id in especialista_ids:
+            DisponibilidadService.invalidar_agenda(esp_id)
+        return len(filas)
 
     @staticmethod
     def update(db: Session, horario_id: int, horario: HorarioEspecialistaUpdate) -> HorarioEspecialista:
@@ -111,6 +124,7 @@ class HorarioService:
 
         db.commit()
         db.refresh(db_horario)
+        DisponibilidadService.invalidar_agenda(db_horario.especialista_id)
         return db_horario
 
     @staticmethod
@@ -123,8 +137,10 @@ class HorarioService:
                 detail="Horario no encontrado"
             )
 
+        especialista_id = db_horario.especialista_id
         db.delete(db_horario)
         db.commit()
+        DisponibilidadService.invalidar_agenda(especialista_id)
         return True
 
     @staticmethod
@@ -145,17 +161,40 @@ class HorarioService:
         if excluir_id:
             query = query.filter(HorarioEspecialista.id != excluir_id)
 
-        horarios_existentes = query.all()
+        intervalos = [(dia_semana, h.hora_inicio, h.hora_fin) for h in query.all()]
+        intervalos.append((dia_semana, hora_inicio, hora_fin))
 
-        for horario in horarios_existentes:
-            if HorarioService._hay_solapamiento(hora_inicio, hora_fin, 
-                                               horario.hora_inicio, horario.hora_fin):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"El horario se solapa con otro horario existente del día {dia_semana}"
-                )
+        if HorarioService._primer_solapamiento(intervalos) is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El horario se solapa con otro horario existente del día {dia_semana}"
+            )
 
     @staticmethod
-    def _hay_solapamiento(inicio1: time, fin1: time, inicio2: time, fin2: time) -> bool:
-        """Verificar si dos rangos de tiempo se solapan"""
-        return not (fin1 <= inicio2 or fin2 <= inicio1)
+    def _validar_semana(horarios: List[HorarioEspecialistaCreate]):
+        """RN-ESP-004 sobre una semana completa enviada de una vez"""
+        dia = HorarioService._primer_solapamiento(
+            (h.dia_semana, h.hora_inicio, h.hora_fin) for h in horarios
+        )
+        if dia is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Horarios solapados en día {dia}"
+            )
+
+    @staticmethod
+    def _primer_solapamiento(intervalos: Iterable[Tuple[int, time, time]]) -> Optional[int]:
+        """
+        Barrido por día: ordena (dia_semana, hora_inicio, hora_fin) y compara cada
+        intervalo con el mayor fin visto en el mismo día. Retorna el primer día con
+        solapamiento o None. Intervalos contiguos (fin == inicio) no se solapan.
+        """
+        dia_actual, fin_maximo = None, None
+        for dia, inicio, fin in sorted(intervalos):
+            if dia != dia_actual:
+                dia_actual, fin_maximo = dia, fin
+                continue
+            if inicio < fin_maximo:
+                return dia
+            fin_maximo = max(fin_maximo, fin)
+        return None
@@ -1,26 +1,62 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional
+from ..config import settings
 from ..models.user import Usuario, Rol
 from ..models.auth import Permiso, RolPermiso
+from ..utils.cache import TTLCache
+
+# Códigos de permiso por rol_id. Se invalida al reasignar permisos o eliminar
+# un rol; el TTL cubre cambios hechos desde otros procesos (scripts, otros workers).
+role_permission_cache = TTLCache(ttl_seconds=settings.permission_cache_ttl_seconds)
 
 class PermissionService:
     """Servicio para verificación de permisos"""
     
+    @staticmethod
+    def get_role_permission_codes(db: Session, rol_id: int) -> FrozenSet[str]:
+        """Obtener los códigos de permiso de un rol (cacheado por rol_id)"""
+        def load() -> FrozenSet[str]:
+            rows = db.query(Permiso.codigo).join(
+                RolPermiso, RolPermiso.permiso_id == Permiso.id
+            ).filter(
+                RolPermiso.rol_id == rol_id
+            ).all()
+            return frozenset(codigo for (codigo,) in rows)
+        
+        return role_permission_cache.get_or_load(rol_id, load)
+    
+    @staticmethod
+    def role_has_permission(db: Session, rol_id: int, permission_code: str) -> bool:
+        """Verificar si un rol tiene un permiso específico"""
+        return permission_code in PermissionService.get_role_permission_codes(db, rol_id)
+    
+    @staticmethod
+    def role_has_any_permission(db: Session, rol_id: int, permission_codes: List[str]) -> bool:
+        """Verificar si un rol tiene al menos uno de los permisos especificados"""
+        permissions = PermissionService.get_role_permission_codes(db, rol_id)
+        return any(code in permissions for code in permission_codes)
+    
+    @staticmethod
+    def invalidate_role_permissions(rol_id: Optional[int] = None) -> None:
+        """Invalidar el caché de permisos de un rol (o de todos si rol_id es None)"""
+        if rol_id is None:
+            role_permission_cache.clear()
+        else:
+            role_permission_cache.invalidate(rol_id)
+    
+    @staticmethod
+    def get_cache_stats() -> Dict:
+        """Métricas del caché de permisos por rol"""
+        return role_permission_cache.stats()
+    
     @staticmethod
     def get_user_permissions(db: Session, user_id: int) -> List[str]:
         """Obtener todos los códigos de permisos de un usuario"""
-        user = db.query(Usuario).filter(Usuario.id == user_id).first()
-        if not user:
+        rol_id = db.query(Usuario.rol_id).filter(Usuario.id == user_id).scalar()
+        if rol_id is None:
             return []
         
-        # Get permissions through role
-        permisos = db.query(Permiso).join(
-            RolPermiso, RolPermiso.permiso_id == Permiso.id
-        ).filter(
-            RolPermiso.rol_id == user.rol_id
-        ).all()
-        
-        return [p.codigo for p in permisos]
+        return list(PermissionService.get_role_permission_codes(db, rol_id))
     
     @staticmethod
     def user_has_permission(db: Session, user_id: int, permission_code: str) -> bool:
@@ -61,4 +97,5 @@ class PermissionService:
             db.add(rol_permiso)
         
         db.commit()
+        PermissionService.invalidate_role_permissions(rol_id)
         return True
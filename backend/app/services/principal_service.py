@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.orm import Session, contains_eager
+from typing import FrozenSet, Iterable, Optional, Tuple
+from ..models.auth import Permiso, RolPermiso, Sesion
+from ..models.user import Usuario, Rol
+from .permission_service import PermissionService, role_permission_cache
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identidad inmutable del usuario autenticado en la petición actual"""
+    usuario_id: int
+    username: str
+    rol_id: int
+    sede_id: Optional[int]
+    especialista_id: Optional[int]
+    estado: str
+    permisos: FrozenSet[str]
+
+    def has_permission(self, permission_code: str) -> bool:
+        return permission_code in self.permisos
+
+    def has_any_permission(self, permission_codes: Iterable[str]) -> bool:
+        return any(code in self.permisos for code in permission_codes)
+
+    @classmethod
+    def from_user(cls, user: Usuario, permisos: FrozenSet[str]) -> "Principal":
+        return cls(
+            usuario_id=user.id,
+            username=user.username,
+            rol_id=user.rol_id,
+            sede_id=user.sede_id,
+            especialista_id=user.especialista_id,
+            estado=user.estado,
+            permisos=permisos,
+        )
+
+
+class PrincipalService:
+    """Resolución de sesión, usuario, rol y permisos para peticiones autenticadas"""
+
+    @staticmethod
+    def load_by_token(db: Session, token: str) -> Optional[Tuple[Usuario, datetime, FrozenSet[str]]]:
+        """
+        Resolver sesión vigente + usuario + rol + códigos de permiso en una sola consulta.
+        Devuelve (usuario, fecha_expiracion de la sesión, permisos) o None si la sesión no es válida.
+        """
+        generation = role_permission_cache.generation
+        rows = db.query(Usuario, Sesion.fecha_expiracion, Permiso.codigo).select_from(Sesion).join(
+            Usuario, Usuario.id == Sesion.usuario_id
+        ).join(
+            Rol, Rol.id == Usuario.rol_id
+        ).outerjoin(
+            RolPermiso, RolPermiso.rol_id == Rol.id
+        ).outerjoin(
+            Permiso, Permiso.id == RolPermiso.permiso_id
+        ).options(
+            contains_eager(Usuario.rol)
+        ).filter(
+            Sesion.token == token,
+            Sesion.fecha_expiracion > datetime.utcnow()
+        ).all()
+
+        if not rows:
+            return None
+
+        user, fecha_expiracion, _ = rows[0]
+        permisos = frozenset(codigo for _, _, codigo in rows if codigo is not None)
+        # Aprovechar la consulta para poblar el caché de permisos del rol
+        role_permission_cache.set(user.rol_id, permisos, generation=generation)
+        return user, fecha_expiracion, permisos
+
+    @staticmethod
+    def for_user(db: Session, user: Usuario) -> Principal:
+        """Construir el Principal de un usuario ya cargado (permisos desde el caché por rol)"""
+        permisos = PermissionService.get_role_permission_codes(db, user.rol_id)
+        return Principal.from_user(user, permisos)
@@ -1,8 +1,45 @@
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List, Optional
+import hashlib
+from dataclasses import dataclass
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from ..config import settings
 from ..models.auth import Sesion
 from ..models.user import Usuario
+from ..utils.cache import TTLCache
+
+# Sesiones ya validadas, por hash del token. Evita el decode del JWT y las
+# consultas de Sesion y Usuario en cada petición autenticada.
+session_cache = TTLCache(
+    ttl_seconds=settings.session_cache_ttl_seconds,
+    maxsize=settings.session_cache_maxsize
+)
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    """Sesión validada: id del usuario y una copia inmutable de sus columnas"""
+    usuario_id: int
+    user_state: tuple
+
+    def attach(self, db: Session) -> Usuario:
+        """Reconstruir el Usuario dentro de la sesión de BD sin consultar"""
+        user = Usuario(**dict(self.user_state))
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _as_timestamp(value: datetime) -> float:
+    # Las fechas se guardan con datetime.utcnow(); sin zona se asumen UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
 
 class SessionService:
     """Servicio para control de sesiones activas"""
@@ -28,6 +65,7 @@ class SessionService:
         """Invalidar una sesión específica"""
         result = db.query(Sesion).filter(Sesion.token == token).delete()
         db.commit()
+        SessionService.forget_token(token)
         return result > 0
     
     @staticmethod
@@ -35,6 +73,7 @@ class SessionService:
         """Invalidar todas las sesiones de un usuario"""
         result = db.query(Sesion).filter(Sesion.usuario_id == user_id).delete()
         db.commit()
+        SessionService.forget_user(user_id)
         return result
     
     @staticmethod
@@ -53,3 +92,42 @@ class SessionService:
             Sesion.usuario_id == user_id,
             Sesion.fecha_expiracion > datetime.utcnow()
         ).count()
+    
+    # ----- Caché de sesiones validadas -----
+    
+    @staticmethod
+    def get_cached_session(token: str) -> Optional[CachedSession]:
+        """Obtener la sesión validada en caché para un token, si existe"""
+        return session_cache.get(_token_key(token))
+    
+    @staticmethod
+    def cache_session(token: str, fecha_expiracion: datetime, user: Usuario, token_exp: Optional[int] = None) -> None:
+        """Guardar una sesión validada hasta su fecha de expiración"""
+        expires_at = _as_timestamp(fecha_expiracion)
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        
+        columns = inspect(Usuario).column_attrs
+        state = tuple((attr.key, getattr(user, attr.key)) for attr in columns)
+        session_cache.set(
+            _token_key(token),
+            CachedSession(usuario_id=user.id, user_state=state),
+            expires_at=expires_at
+        )
+    
+    @staticmethod
+    def forget_token(token: str) -> None:
+        """Quitar un token del caché (logout)"""
+        session_cache.invalidate(_token_key(token))
+    
+    @staticmethod
+    def forget_user(user_id: int) -> int:
+        """Quitar del caché todas las sesiones de un usuario (logout global, cambios en el usuario)"""
+        return session_cache.invalidate_where(
+            lambda key, cached: cached.usuario_id == user_id
+        )
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """Métricas del caché de sesiones"""
+        return session_cache.stats()
@@ -0,0 +1,144 @@
+"""
+Caché en memoria (por proceso) con expiración por entrada, límite LRU y métricas.
+
+Cada worker de uvicorn mantiene su propia copia; por eso toda entrada tiene un
+TTL que acota cuánto puede quedar desactualizada frente a escrituras hechas por
+otro proceso. Las escrituras del mismo proceso invalidan explícitamente.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché thread-safe clave -> valor.
+
+    - ttl_seconds: vida por defecto de cada entrada
+    - maxsize: si se indica, descarta la entrada menos usada al superarlo (LRU)
+
+    Para evitar repoblar con datos viejos cuando una invalidación ocurre mientras
+    se consulta la BD, `set` acepta la generación leída antes de la consulta y
+    descarta el valor si hubo invalidaciones entre medio (ver `get_or_load`).
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+        generation: Optional[int] = None
+    ) -> bool:
+        """Guardar un valor. `expires_at` (epoch) tiene prioridad sobre el TTL."""
+        now = time.time()
+        limit = now + (self.ttl_seconds if ttl is None else ttl)
+        if expires_at is not None:
+            limit = min(limit, expires_at)
+        if limit <= now:
+            return False
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._data[key] = (limit, value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return True
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self._generation
+        started = time.perf_counter()
+        value = loader()
+        self.record_load(time.perf_counter() - started)
+        self.set(key, value, ttl=ttl, generation=generation)
+        return value
+
+    def record_load(self, seconds: float, count: int = 1) -> None:
+        """Registrar el tiempo de cálculo de `count` valores cargados fuera de get_or_load"""
+        with self._lock:
+            self.loads += count
+            self.load_seconds += seconds
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            return self._data.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Eliminar todas las entradas para las que predicate(key, value) sea verdadero"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._data.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.invalidations = self.loads = 0
+            self.load_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+                "loads": self.loads,
+                "load_ms_total": round(self.load_seconds * 1000, 3),
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
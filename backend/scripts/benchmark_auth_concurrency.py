@@ -0,0 +1,162 @@
+"""
+Benchmark de concurrencia para endpoints protegidos.
+
+Mide el throughput de GET /api/usuarios/me (get_current_user) con 1..N clientes
+en paralelo. Cada consulta SQL recibe una latencia artificial para simular el
+viaje de red a Postgres en producción.
+
+Modos:
+- threadpool: dependencias de autenticación síncronas (comportamiento actual)
+- bloqueante: get_current_user ejecutado dentro del event loop (comportamiento anterior)
+
+Por defecto se desactiva el caché de sesiones para medir la ruta que consulta
+la BD (primer uso de cada token); --con-cache mide la ruta caliente.
+
+Uso (desde backend/):
+    python scripts/benchmark_auth_concurrency.py --clientes 1,2,4,8,16 --latencia-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Base de datos temporal antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.append(os.getcwd())
+
+import httpx
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base, get_db
+from app.dependencies import get_current_user, oauth2_scheme
+from app.main import app
+from app.models.auth import Permiso, RolPermiso, Sesion
+from app.models.user import Rol, Usuario
+from app.services.session_service import session_cache
+from app.utils.jwt import create_access_token
+
+
+def preparar_datos(SessionLocal):
+    db = SessionLocal()
+    try:
+        rol = Rol(nombre="Bench", descripcion="Rol benchmark", es_sistema=False)
+        db.add(rol)
+        db.flush()
+        permiso = Permiso(codigo="usuarios.leer", nombre="Leer Usuarios", modulo="usuarios")
+        db.add(permiso)
+        db.flush()
+        db.add(RolPermiso(rol_id=rol.id, permiso_id=permiso.id))
+        user = Usuario(
+            username="bench_user",
+            email="bench@example.com",
+            password_hash="x",
+            nombre="Bench",
+            rol_id=rol.id,
+            estado="activo",
+        )
+        db.add(user)
+        db.flush()
+        token = create_access_token(data={"sub": user.username, "user_id": user.id})
+        db.add(Sesion(
+            usuario_id=user.id,
+            token=token,
+            fecha_expiracion=datetime.utcnow() + timedelta(hours=1),
+        ))
+        db.commit()
+        return token
+    finally:
+        db.close()
+
+
+async def medir(token: str, clientes: int, total: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    por_cliente = max(1, total // clientes)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in range(por_cliente):
+                response = await client.get("/api/usuarios/me", headers=headers)
+                assert response.status_code == 200, response.text
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clientes)))
+        duracion = time.perf_counter() - inicio
+
+    return (por_cliente * clientes) / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", default="1,2,4,8,16", help="Niveles de concurrencia separados por coma")
+    parser.add_argument("--peticiones", type=int, default=160, help="Peticiones por nivel")
+    parser.add_argument("--latencia-ms", type=float, default=5.0, help="Latencia simulada por consulta SQL")
+    parser.add_argument("--con-cache", action="store_true", help="Mantener activo el caché de sesiones")
+    args = parser.parse_args()
+
+    if not args.con_cache:
+        session_cache.maxsize = 0
+
+    # Mismo dimensionamiento de pool que app/database.py
+    engine = create_engine(
+        os.environ["DATABASE_URL"],
+        connect_args={"check_same_thread": False},
+        pool_size=20,
+        max_overflow=10,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    latencia = args.latencia_ms / 1000.0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _simular_red(conn, cursor, statement, parameters, context, executemany):
+        if latencia:
+            time.sleep(latencia)
+
+    token = preparar_datos(SessionLocal)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    niveles = [int(n) for n in args.clientes.split(",") if n.strip()]
+
+    print(f"Latencia simulada por consulta: {args.latencia_ms} ms (caché de sesiones: {'sí' if args.con_cache else 'no'})")
+    print(f"{'modo':<12}{'clientes':>10}{'req/s':>12}")
+
+    for modo in ("bloqueante", "threadpool"):
+        if modo == "bloqueante":
+            async def current_user_bloqueante(
+                request: Request,
+                token: str = Depends(oauth2_scheme),
+                db: Session = Depends(get_db)
+            ):
+                return get_current_user(request=request, token=token, db=db)
+            app.dependency_overrides[get_current_user] = current_user_bloqueante
+        else:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        for clientes in niveles:
+            rps = asyncio.run(medir(token, clientes, args.peticiones))
+            print(f"{modo:<12}{clientes:>10}{rps:>12.1f}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark de la búsqueda rápida de clientes (autocompletado) con 200k clientes.
+
+Compara la consulta anterior (ILIKE '%q%' sobre nombre, apellido, teléfono y cédula)
+con ClienteBusqueda sobre una base SQLite temporal, es decir con el índice de
+trigramas en memoria que se usa cuando no hay pg_trgm. Reporta el tiempo de
+construcción del índice y p50/p95 por consulta. Objetivo: < 10 ms por consulta.
+
+Uso (desde backend/):
+    python scripts/benchmark_busqueda_clientes.py --clientes 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time as timer
+
+# Base de datos temporal antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_clientes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import and_, create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401  registra todas las tablas
+from app.models.cliente import Cliente
+from app.services.cliente_busqueda import ClienteBusqueda, texto_busqueda
+
+NOMBRES = [
+    "Ana", "María", "José", "Luis", "Camila", "Valentina", "Sofía", "Andrés", "Juan", "Daniela",
+    "Alejandra", "Carolina", "Natalia", "Paola", "Ángela", "Jhon", "Sebastián", "Isabella", "Lucía", "Mónica",
+]
+APELLIDOS = [
+    "Gómez", "Rodríguez", "Martínez", "López", "García", "Hernández", "Pérez", "Sánchez", "Ramírez", "Torres",
+    "Díaz", "Muñoz", "Rojas", "Vargas", "Castro", "Ortiz", "Jiménez", "Moreno", "Ruiz", "Álvarez",
+]
+
+CONSULTAS = [
+    "ana", "maria gom", "Sofía Muñoz", "valen", "lopez", "an", "jose perez", "carol rui",
+    "300 1", "+57 315", "1094", "gmail", "angela alv", "xyz",
+]
+
+
+def busqueda_anterior(db, sede_id, query, limite=10):
+    search_term = f"%{query}%"
+    return db.query(Cliente).filter(
+        and_(
+            Cliente.estado == 'activo',
+            Cliente.sede_id == sede_id,
+            or_(
+                Cliente.nombre.ilike(search_term),
+                Cliente.apellido.ilike(search_term),
+                Cliente.telefono.ilike(search_term),
+                Cliente.cedula.ilike(search_term)
+            )
+        )
+    ).order_by(Cliente.nombre).limit(limite).all()
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = timer.perf_counter()
+        funcion()
+        tiempos.append((timer.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=200000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--sin-anterior", action="store_true", help="No medir la consulta ILIKE anterior")
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+
+    rng = random.Random(42)
+    inicio = timer.perf_counter()
+    lote = []
+    for n in range(args.clientes):
+        nombre = rng.choice(NOMBRES)
+        apellido = f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        cedula = str(10_000_000 + n * 4999 + rng.randint(0, 4998))
+        telefono = f"+57 3{rng.randint(0, 2)}{rng.randint(0, 9)} {rng.randint(1_000_000, 9_999_999)}"
+        email = f"{nombre.lower()}.{n}@{rng.choice(('gmail.com', 'hotmail.com', 'yahoo.com'))}" if n % 3 else None
+        lote.append({
+            "nombre": nombre, "apellido": apellido, "cedula": cedula, "telefono": telefono, "email": email,
+            "sede_id": 1, "estado": "activo" if n % 10 else "inactivo",
+            "busqueda": texto_busqueda(nombre, apellido, cedula, telefono, email),
+        })
+        if len(lote) == 10000:
+            db.execute(insert(Cliente), lote)
+            lote = []
+    if lote:
+        db.execute(insert(Cliente), lote)
+    db.commit()
+    print(f"{args.clientes} clientes generados en {timer.perf_counter() - inicio:.1f} s\n")
+
+    inicio = timer.perf_counter()
+    indice = ClienteBusqueda.indice(db, 1)
+    print(f"índice en memoria: {len(indice)} clientes, construido en {timer.perf_counter() - inicio:.2f} s\n")
+
+    print(f"{'consulta':<14} {'resultados':>10} {'nuevo p50':>10} {'nuevo p95':>10} {'ILIKE p50':>10}")
+    for consulta in CONSULTAS:
+        resultados = len(ClienteBusqueda.buscar_ids(db, 1, consulta))
+        p50, p95 = medir(lambda: ClienteBusqueda.buscar_ids(db, 1, consulta), args.repeticiones)
+        anterior = "-"
+        if not args.sin_anterior:
+            anterior = f"{medir(lambda: busqueda_anterior(db, 1, consulta), 3)[0]:.1f} ms"
+        print(f"{consulta:<14} {resultados:>10} {p50:>7.2f} ms {p95:>7.2f} ms {anterior:>10}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
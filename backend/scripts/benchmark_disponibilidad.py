@@ -0,0 +1,202 @@
+"""
+Benchmark del cálculo de disponibilidad: 50 especialistas x 30 días.
+
+Compara el recorrido slot a slot anterior (_generar_slots + _esta_bloqueado lineal,
+sin citas) con AgendaBitmap (horarios, bloqueos y citas en mapas de bits por minuto),
+tanto por especialista como en lote (inicios_validos_lote). También compara la
+verificación de bloqueos por slot: recorrido lineal frente a ReglasBloqueo, y mide
+la búsqueda de combos de 3 servicios seguidos (cadenas_servicios) en toda la sede.
+Los datos se generan en memoria; no requiere base de datos.
+
+Uso (desde backend/):
+    python scripts/benchmark_disponibilidad.py --especialistas 50 --dias 30
+"""
+import argparse
+import os
+import random
+import sys
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.append(os.getcwd())
+
+from app.models.especialista import HorarioEspecialista, BloqueoEspecialista
+from app.models.cita import Cita
+from app.schemas.especialista import SlotDisponible
+from app.services.agenda_bitmap import AgendaBitmap, ReglasBloqueo, cadenas_servicios, inicios_validos_lote
+
+
+def esta_bloqueado_anterior(fecha, hora_inicio, hora_fin, bloqueos):
+    """Verificación previa: recorre todos los bloqueos del especialista en cada slot"""
+    for bloqueo in bloqueos:
+        if bloqueo.fecha_inicio <= fecha <= bloqueo.fecha_fin:
+            if bloqueo.es_recurrente:
+                dia_semana = (fecha.weekday() + 1) % 7
+                if bloqueo.dias_semana and dia_semana not in bloqueo.dias_semana:
+                    continue
+            if bloqueo.hora_inicio and bloqueo.hora_fin:
+                if not (hora_fin <= bloqueo.hora_inicio or bloqueo.hora_fin <= hora_inicio):
+                    return True
+            else:
+                return True
+    return False
+
+
+def generar_slots_anterior(fecha_inicio, fecha_fin, horarios, bloqueos, intervalo_minutos):
+    """Implementación previa: un datetime.combine y un recorrido de bloqueos por slot"""
+    def sumar_minutos(hora, minutos):
+        return (datetime.combine(date.today(), hora) + timedelta(minutes=minutos)).time()
+
+    slots = []
+    horarios_por_dia = {}
+    for horario in horarios:
+        horarios_por_dia.setdefault(horario.dia_semana, []).append(horario)
+
+    current_date = fecha_inicio
+    while current_date <= fecha_fin:
+        dia_semana = (current_date.weekday() + 1) % 7
+        for horario in horarios_por_dia.get(dia_semana, []):
+            hora_actual = horario.hora_inicio
+            while hora_actual < horario.hora_fin:
+                hora_fin_slot = sumar_minutos(hora_actual, intervalo_minutos)
+                if hora_fin_slot <= horario.hora_fin:
+                    bloqueado = esta_bloqueado_anterior(
+                        current_date, hora_actual, hora_fin_slot, bloqueos
+                    )
+                    slots.append(SlotDisponible(
+                        fecha=current_date,
+                        hora_inicio=hora_actual,
+                        hora_fin=hora_fin_slot,
+                        disponible=not bloqueado
+                    ))
+                hora_actual = hora_fin_slot
+        current_date += timedelta(days=1)
+    return slots
+
+
+def generar_datos(rng, especialistas, fecha_inicio, dias, bloqueos_historicos):
+    datos = []
+    fecha_fin = fecha_inicio + timedelta(days=dias - 1)
+    for _ in range(especialistas):
+        horarios = [
+            HorarioEspecialista(dia_semana=d, hora_inicio=time(8, 0), hora_fin=time(12, 0), activo=True)
+            for d in range(1, 7)
+        ] + [
+            HorarioEspecialista(dia_semana=d, hora_inicio=time(13, 0), hora_fin=time(19, 0), activo=True)
+            for d in range(1, 7)
+        ]
+
+        # Bloqueos acumulados a lo largo del tiempo (la mayoría fuera de la ventana)
+        bloqueos = []
+        for _ in range(bloqueos_historicos):
+            inicio = fecha_inicio - timedelta(days=rng.randint(0, 720))
+            hora = rng.randint(8, 17)
+            bloqueos.append(BloqueoEspecialista(
+                fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=rng.randint(0, 2)),
+                hora_inicio=time(hora, 0), hora_fin=time(hora + 1, 0), es_recurrente=False
+            ))
+        bloqueos.append(BloqueoEspecialista(
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+            hora_inicio=time(12, 0), hora_fin=time(13, 0),
+            es_recurrente=True, dias_semana=[1, 3, 5]
+        ))
+
+        citas = []
+        for d in range(dias):
+            fecha = fecha_inicio + timedelta(days=d)
+            for _ in range(rng.randint(2, 6)):
+                hora = rng.randint(8, 17)
+                citas.append(Cita(
+                    fecha=fecha, hora_inicio=time(hora, 0), hora_fin=time(hora, 45), estado="agendada"
+                ))
+        datos.append((horarios, bloqueos, citas))
+    return datos, fecha_fin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--especialistas", type=int, default=50)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--bloqueos", type=int, default=40, help="Bloqueos históricos por especialista")
+    parser.add_argument("--duracion", type=int, default=60, help="Duración del servicio en minutos")
+    parser.add_argument("--intervalo", type=int, default=15)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    fecha_inicio = date(2026, 3, 2)
+    datos, fecha_fin = generar_datos(rng, args.especialistas, fecha_inicio, args.dias, args.bloqueos)
+
+    inicio = timer.perf_counter()
+    total_anterior = 0
+    for horarios, bloqueos, _ in datos:
+        total_anterior += len(generar_slots_anterior(fecha_inicio, fecha_fin, horarios, bloqueos, args.intervalo))
+    t_anterior = timer.perf_counter() - inicio
+
+    inicio = timer.perf_counter()
+    total_bitmap = 0
+    for horarios, bloqueos, citas in datos:
+        agenda = AgendaBitmap.construir(fecha_inicio, fecha_fin, horarios, bloqueos, citas)
+        total_bitmap += len(agenda.slots(args.duracion, args.intervalo))
+    t_bitmap = timer.perf_counter() - inicio
+
+    inicio = timer.perf_counter()
+    for horarios, bloqueos, citas in datos:
+        agenda = AgendaBitmap.construir(fecha_inicio, fecha_fin, horarios, bloqueos, citas)
+        agenda.inicios_validos(args.duracion)
+    t_matriz = timer.perf_counter() - inicio
+
+    inicio = timer.perf_counter()
+    agendas = [
+        AgendaBitmap.construir(fecha_inicio, fecha_fin, horarios, bloqueos, citas)
+        for horarios, bloqueos, citas in datos
+    ]
+    inicios_validos_lote(agendas, args.duracion)
+    t_lote = timer.perf_counter() - inicio
+
+    # Verificación de bloqueos slot a slot (cada 15 min, 8:00-19:00)
+    consultas = [
+        (fecha_inicio + timedelta(days=d), time(h, m), time(h, m + 14))
+        for d in range(args.dias) for h in range(8, 19) for m in (0, 15, 30, 45)
+    ]
+    inicio = timer.perf_counter()
+    bloqueados_lineal = sum(
+        esta_bloqueado_anterior(f, hi, hf, bloqueos)
+        for _, bloqueos, _ in datos for f, hi, hf in consultas
+    )
+    t_lineal = timer.perf_counter() - inicio
+
+    inicio = timer.perf_counter()
+    bloqueados_reglas = 0
+    for _, bloqueos, _ in datos:
+        reglas = ReglasBloqueo(bloqueos, fecha_inicio, fecha_fin)
+        bloqueados_reglas += sum(reglas.bloquea(f, hi, hf) for f, hi, hf in consultas)
+    t_reglas = timer.perf_counter() - inicio
+
+    # Combo alisado (90) + lavado (30) + secado (45): cada servicio lo atiende la mitad
+    # de la sede, con hasta 15 minutos de espera entre pasos
+    pasos = [
+        ([p for p in range(len(agendas)) if p % 2 == 0], 90),
+        (list(range(len(agendas))), 30),
+        ([p for p in range(len(agendas)) if p % 2 == 1], 45),
+    ]
+    inicio = timer.perf_counter()
+    combos = cadenas_servicios(agendas, pasos, 15, args.intervalo, 10)
+    t_combos = timer.perf_counter() - inicio
+
+    print(f"{args.especialistas} especialistas x {args.dias} días, {args.bloqueos} bloqueos históricos c/u")
+    print(f"anterior (sin citas)      : {t_anterior * 1000:8.1f} ms  ({total_anterior} slots)")
+    print(f"bitmap + slots pydantic   : {t_bitmap * 1000:8.1f} ms  ({total_bitmap} slots)")
+    print(f"bitmap, solo matriz       : {t_matriz * 1000:8.1f} ms")
+    print(f"bitmap, matriz en lote    : {t_lote * 1000:8.1f} ms")
+    print(f"bloqueos por slot, lineal : {t_lineal * 1000:8.1f} ms  ({bloqueados_lineal} bloqueados)")
+    print(f"bloqueos por slot, reglas : {t_reglas * 1000:8.1f} ms  ({bloqueados_reglas} bloqueados)")
+    print(f"combos de 3 servicios     : {t_combos * 1000:8.1f} ms  ({len(combos)} combos)")
+
+
+if __name__ == "__main__":
+    main()
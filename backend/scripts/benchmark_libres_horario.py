@@ -0,0 +1,116 @@
+"""
+Benchmark de GET /api/especialistas/libres-en-horario (¿quién está libre ahora?).
+
+Crea una sede con N especialistas (horarios, bloqueos y citas del día) en una
+base SQLite temporal y mide DisponibilidadService.get_especialistas_libres_horario,
+que resuelve toda la sede en una consulta. Objetivo: < 20 ms con 100 especialistas.
+
+Uso (desde backend/):
+    python scripts/benchmark_libres_horario.py --especialistas 100 --repeticiones 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time as timer
+from datetime import date, time, timedelta
+
+# Base de datos temporal antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_libres_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401  registra todas las tablas
+from app.models.cita import Cita
+from app.models.cliente import Cliente
+from app.models.especialista import Especialista, HorarioEspecialista, BloqueoEspecialista
+from app.models.servicio import Servicio
+from app.services.disponibilidad_service import DisponibilidadService
+
+SEDE_ID = 1
+
+
+def preparar_datos(db, rng, especialistas, fecha):
+    servicio = Servicio(nombre="Bench", duracion_minutos=45, precio_base=10000)
+    cliente = Cliente(nombre="Cliente", apellido="Bench")
+    db.add_all([servicio, cliente])
+    db.flush()
+
+    for n in range(especialistas):
+        esp = Especialista(nombre=f"Esp{n}", apellido="Bench", estado="activo", sede_id=SEDE_ID)
+        db.add(esp)
+        db.flush()
+        for dia in range(1, 7):
+            db.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=dia,
+                hora_inicio=time(8, 0), hora_fin=time(19, 0), activo=True
+            ))
+        # Bloqueos históricos (fuera de la fecha) y uno recurrente vigente
+        for _ in range(20):
+            inicio = fecha - timedelta(days=rng.randint(1, 365))
+            db.add(BloqueoEspecialista(
+                especialista_id=esp.id, fecha_inicio=inicio, fecha_fin=inicio,
+                hora_inicio=time(12, 0), hora_fin=time(13, 0), es_recurrente=False
+            ))
+        db.add(BloqueoEspecialista(
+            especialista_id=esp.id, fecha_inicio=fecha - timedelta(days=30),
+            fecha_fin=fecha + timedelta(days=30), hora_inicio=time(13, 0), hora_fin=time(14, 0),
+            es_recurrente=True, dias_semana=[1, 3, 5]
+        ))
+        for dia in range(-3, 4):
+            # Horas distintas: los triggers de cita_solapada rechazan citas que se crucen
+            for hora in rng.sample(range(8, 18), rng.randint(3, 8)):
+                db.add(Cita(
+                    cliente_id=cliente.id, especialista_id=esp.id, servicio_id=servicio.id,
+                    sede_id=SEDE_ID, fecha=fecha + timedelta(days=dia),
+                    hora_inicio=time(hora, 0), hora_fin=time(hora, 45),
+                    duracion_minutos=45, estado="agendada"
+                ))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--especialistas", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    fecha = date(2026, 3, 2)
+    db = SessionLocal()
+    preparar_datos(db, random.Random(42), args.especialistas, fecha)
+
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *a: consultas.append(1))
+
+    tiempos = []
+    for i in range(args.repeticiones):
+        db.expunge_all()
+        hora = time(8 + i % 10, 30)
+        inicio = timer.perf_counter()
+        resultado = DisponibilidadService.get_especialistas_libres_horario(db, SEDE_ID, fecha, hora)
+        tiempos.append((timer.perf_counter() - inicio) * 1000)
+    db.close()
+
+    tiempos.sort()
+    print(f"{args.especialistas} especialistas, {args.repeticiones} repeticiones ({len(resultado)} filas por respuesta)")
+    print(f"consultas por llamada : {len(consultas) / args.repeticiones:.1f}")
+    print(f"mediana               : {statistics.median(tiempos):6.2f} ms")
+    print(f"p95                   : {tiempos[int(len(tiempos) * 0.95) - 1]:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
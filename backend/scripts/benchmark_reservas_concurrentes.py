@@ -0,0 +1,147 @@
+"""
+Prueba de estrés de reservas concurrentes (recepción + bot reservando a la vez).
+
+Lanza N hilos que reservan con CitaService.crear horarios aleatorios de unos pocos
+especialistas en el mismo día, sobre una base SQLite temporal. Reporta reservas
+confirmadas, conflictos, throughput y citas activas solapadas al final (debe ser 0).
+
+Con --sin-proteccion se eliminan los triggers de solapamiento para mostrar que la
+verificación previa (leer y luego insertar) por sí sola permite dobles reservas.
+Cada consulta recibe una latencia artificial para abrir la ventana de carrera como
+lo haría el viaje de red a Postgres.
+
+Uso (desde backend/):
+    python scripts/benchmark_reservas_concurrentes.py --hilos 16 --reservas 400
+    python scripts/benchmark_reservas_concurrentes.py --hilos 16 --reservas 400 --sin-proteccion
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time as timer
+from datetime import date, time
+
+# Base de datos temporal antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_reservas_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401  registra todas las tablas
+from app.models.cliente import Cliente
+from app.models.especialista import Especialista
+from app.models.servicio import Servicio
+from app.schemas.cita import CitaCreate
+from app.services.cita_service import CitaService
+
+FECHA = date(2026, 3, 2)
+
+CONSULTA_SOLAPADAS = """
+    SELECT COUNT(*) FROM citas a
+    JOIN citas b ON a.especialista_id = b.especialista_id AND a.fecha = b.fecha AND a.id < b.id
+    WHERE a.estado NOT IN ('cancelada', 'no_show') AND b.estado NOT IN ('cancelada', 'no_show')
+      AND a.hora_inicio < b.hora_fin AND b.hora_inicio < a.hora_fin
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--reservas", type=int, default=400, help="Intentos de reserva en total")
+    parser.add_argument("--especialistas", type=int, default=3)
+    parser.add_argument("--latencia-ms", type=float, default=2.0, help="Latencia simulada por consulta")
+    parser.add_argument("--sin-proteccion", action="store_true", help="Eliminar los triggers de solapamiento")
+    args = parser.parse_args()
+
+    engine = create_engine(
+        os.environ["DATABASE_URL"],
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=args.hilos,
+        max_overflow=0
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    if args.sin_proteccion:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER trg_citas_sin_solapamiento_insert"))
+            conn.execute(text("DROP TRIGGER trg_citas_sin_solapamiento_update"))
+
+    db = SessionLocal()
+    servicio = Servicio(nombre="Bench", duracion_minutos=60, precio_base=50000)
+    cliente = Cliente(nombre="Cliente", apellido="Bench")
+    especialistas = [Especialista(nombre=f"Esp{n}", apellido="Bench", estado="activo") for n in range(args.especialistas)]
+    db.add_all([servicio, cliente, *especialistas])
+    db.commit()
+    servicio_id, cliente_id = servicio.id, cliente.id
+    especialista_ids = [e.id for e in especialistas]
+    db.close()
+
+    latencia = args.latencia_ms / 1000
+    if latencia:
+        event.listen(engine, "before_cursor_execute", lambda *a: timer.sleep(latencia))
+
+    # Horarios en pasos de 30 minutos con servicios de 60: muchos choques posibles
+    rng = random.Random(42)
+    intentos = [
+        (rng.choice(especialista_ids), time(rng.randint(8, 17), rng.choice((0, 30))))
+        for _ in range(args.reservas)
+    ]
+    resultados = {"ok": 0, "conflicto": 0, "error": 0}
+    lock = threading.Lock()
+    siguiente = iter(intentos)
+
+    def trabajador():
+        while True:
+            with lock:
+                intento = next(siguiente, None)
+            if intento is None:
+                return
+            especialista_id, hora = intento
+            sesion = SessionLocal()
+            try:
+                CitaService.crear(sesion, CitaCreate(
+                    cliente_id=cliente_id, especialista_id=especialista_id,
+                    servicio_id=servicio_id, fecha=FECHA, hora_inicio=hora
+                ), usuario_id=1, sede_id=1)
+                clave = "ok"
+            except ValueError:
+                clave = "conflicto"
+            except Exception:
+                clave = "error"
+            finally:
+                sesion.close()
+            with lock:
+                resultados[clave] += 1
+
+    inicio = timer.perf_counter()
+    hilos = [threading.Thread(target=trabajador) for _ in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = timer.perf_counter() - inicio
+
+    with engine.connect() as conn:
+        solapadas = conn.execute(text(CONSULTA_SOLAPADAS)).scalar()
+
+    modo = "sin protección" if args.sin_proteccion else "con protección en BD"
+    print(f"{modo}: {args.hilos} hilos, {args.reservas} intentos, {args.especialistas} especialistas")
+    print(f"confirmadas : {resultados['ok']}")
+    print(f"conflictos  : {resultados['conflicto']}")
+    print(f"errores     : {resultados['error']}")
+    print(f"throughput  : {args.reservas / duracion:.1f} intentos/s ({duracion:.2f} s)")
+    print(f"solapadas   : {solapadas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Buscar y fusionar clientes duplicados por cédula o teléfono normalizados.
+
+Sin --aplicar solo informa los grupos encontrados. Con --aplicar fusiona cada grupo
+en el cliente con más visitas (citas, facturas y abonos pasan a él), confirma cada
+--lote grupos y llena telefono_normalizado / cedula_normalizada de todos los
+clientes. Después se puede aplicar db/migraciones/013_identidad_clientes_unica.sql.
+
+Uso (desde backend/):
+    python scripts/deduplicar_clientes.py
+    python scripts/deduplicar_clientes.py --aplicar --lote 200
+"""
+import argparse
+import os
+import sys
+import time as timer
+
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal
+import app.models  # noqa: F401  registra todas las tablas con referencias a clientes
+from app.services.cliente_busqueda import ClienteBusqueda
+from app.services.cliente_identidad import ClienteIdentidad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aplicar", action="store_true", help="Fusionar los duplicados (por defecto solo informa)")
+    parser.add_argument("--lote", type=int, default=200, help="Grupos fusionados por transacción")
+    parser.add_argument("--mostrar", type=int, default=20, help="Grupos a listar en el informe")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    inicio = timer.perf_counter()
+    try:
+        if not args.aplicar:
+            grupos = ClienteIdentidad.grupos_duplicados(db)
+            for grupo in grupos[:args.mostrar]:
+                print("  ids:", ", ".join(map(str, grupo)))
+            if len(grupos) > args.mostrar:
+                print(f"  ... y {len(grupos) - args.mostrar} grupos más")
+            print(f"{len(grupos)} grupos, {sum(len(g) - 1 for g in grupos)} clientes duplicados "
+                  f"({timer.perf_counter() - inicio:.1f} s). Use --aplicar para fusionarlos.")
+            return
+        resultado = ClienteIdentidad.deduplicar(db, aplicar=True, lote=args.lote)
+    finally:
+        db.close()
+    ClienteBusqueda.invalidar()
+    print(f"{resultado['grupos']} grupos, {resultado['fusionados']} clientes fusionados, "
+          f"{resultado['claves_actualizadas']} claves normalizadas actualizadas "
+          f"en {timer.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
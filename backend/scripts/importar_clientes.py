@@ -0,0 +1,58 @@
+"""
+Importar clientes desde un archivo CSV o XLSX.
+
+Lee el archivo en streaming, valida y normaliza las filas por lotes y las guarda
+con INSERT de varias filas (COPY en Postgres). Los clientes que ya existen (misma
+cédula o teléfono normalizados) se actualizan con los valores no vacíos del
+archivo, salvo con --solo-nuevos. Muestra el avance después de cada lote.
+
+Uso (desde backend/):
+    python scripts/importar_clientes.py clientes.xlsx --sede-id 1
+    python scripts/importar_clientes.py clientes.csv --sede-id 2 --solo-nuevos --lote 10000
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal
+from app.services.cliente_importacion import ArchivoClientes, ImportadorClientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo")
+    parser.add_argument("--sede-id", type=int, required=True, help="Sede de los clientes nuevos")
+    parser.add_argument("--lote", type=int, default=5000, help="Filas por transacción")
+    parser.add_argument("--solo-nuevos", action="store_true", help="No modificar clientes existentes")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.archivo, "rb") as archivo:
+            try:
+                filas = ArchivoClientes(archivo, args.archivo)
+            except ValueError as e:
+                sys.exit(f"Error: {e}")
+            for resumen in ImportadorClientes.importar(
+                db, filas, args.sede_id, actualizar=not args.solo_nuevos, lote=args.lote
+            ):
+                print(
+                    f"{resumen['filas']} filas: {resumen['insertados']} nuevos, "
+                    f"{resumen['actualizados']} actualizados, {resumen['repetidos']} repetidos, "
+                    f"{resumen['omitidos']} omitidos, {resumen['con_error']} con error "
+                    f"({resumen['segundos']:.1f} s)",
+                    end="\n" if resumen["terminado"] else "\r"
+                )
+    finally:
+        db.close()
+
+    for error in resumen["errores"]:
+        print(f"  fila {error['fila']}: {error['error']}")
+    if resumen["con_error"] > len(resumen["errores"]):
+        print(f"  ... y {resumen['con_error'] - len(resumen['errores'])} errores más")
+
+
+if __name__ == "__main__":
+    main()
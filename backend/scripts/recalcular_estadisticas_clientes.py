@@ -0,0 +1,38 @@
+"""
+Recalcular las estadísticas de todos los clientes (visitas, primera y última visita,
+total gastado y último servicio) desde sus citas completadas y facturas pagadas.
+
+Se ejecuta una vez después de la migración 014; desde entonces la aplicación las
+mantiene al confirmar cada factura o cita. Recorre los clientes por id en lotes.
+
+Uso (desde backend/):
+    python scripts/recalcular_estadisticas_clientes.py
+    python scripts/recalcular_estadisticas_clientes.py --lote 5000
+"""
+import argparse
+import os
+import sys
+import time as timer
+
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal
+from app.services.cliente_estadisticas import ClienteEstadisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    inicio = timer.perf_counter()
+    try:
+        total = ClienteEstadisticas.recalcular_todos(db, lote=args.lote)
+    finally:
+        db.close()
+    print(f"{total} clientes recalculados en {timer.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Recalcular clientes.busqueda (texto normalizado para la búsqueda de clientes).
+
+Se ejecuta una vez después de la migración 010 o si cambia la normalización.
+Recorre la tabla por id en lotes y actualiza cada lote con un solo executemany.
+
+Uso (desde backend/):
+    python scripts/reindexar_busqueda_clientes.py
+    python scripts/reindexar_busqueda_clientes.py --solo-vacios --lote 5000
+"""
+import argparse
+import os
+import sys
+import time as timer
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models.cliente import Cliente
+from app.services.cliente_busqueda import ClienteBusqueda, texto_busqueda
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=2000)
+    parser.add_argument("--solo-vacios", action="store_true", help="Solo clientes sin texto de búsqueda")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    inicio = timer.perf_counter()
+    ultimo_id, total = 0, 0
+    try:
+        while True:
+            q = db.query(
+                Cliente.id, Cliente.nombre, Cliente.apellido, Cliente.cedula, Cliente.telefono, Cliente.email
+            ).filter(Cliente.id > ultimo_id)
+            if args.solo_vacios:
+                q = q.filter(Cliente.busqueda.is_(None))
+            filas = q.order_by(Cliente.id).limit(args.lote).all()
+            if not filas:
+                break
+            db.execute(update(Cliente), [
+                {"id": id_, "busqueda": texto_busqueda(nombre, apellido, cedula, telefono, email)}
+                for id_, nombre, apellido, cedula, telefono, email in filas
+            ])
+            db.commit()
+            ultimo_id = filas[-1][0]
+            total += len(filas)
+            print(f"{total} clientes actualizados...", end="\r")
+    finally:
+        db.close()
+    ClienteBusqueda.invalidar()
+    print(f"{total} clientes actualizados en {timer.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,19 @@ from app.utils.jwt import create_access_token
 # Base de datos de prueba en memoria
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
+@pytest.fixture(autouse=True)
+def clear_in_process_caches():
+    """Limpiar cachés en memoria: la BD se recrea en cada prueba y los IDs se reutilizan"""
+    from app.services.permission_service import role_permission_cache
+    from app.services.session_service import session_cache
+    from app.services.disponibilidad_service import disponibilidad_cache
+    from app.services.catalogo_nombres import catalogo_cache
+    from app.services.cliente_busqueda import clientes_busqueda_cache
+    for cache in (role_permission_cache, session_cache, disponibilidad_cache, catalogo_cache, clientes_busqueda_cache):
+        cache.clear()
+        cache.reset_stats()
+    yield
+
 @pytest.fixture(scope="function")
 def db_engine():
     """Crear engine de base de datos para pruebas"""
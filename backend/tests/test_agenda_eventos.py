@@ -0,0 +1,84 @@
+"""
+Pruebas del canal de eventos de agenda (push por sede)
+"""
+import asyncio
+import pytest
+from datetime import date, time
+from app.models.cliente import Cliente
+from app.models.especialista import Especialista
+from app.models.servicio import Servicio
+from app.schemas.cita import CitaCreate
+from app.services.agenda_eventos import CanalAgenda, agenda_eventos
+from app.services.cita_service import CitaService
+
+FECHA = date(2026, 3, 2)
+
+
+async def _recibir(suscripcion, timeout=2):
+    return await asyncio.wait_for(suscripcion.cola.get(), timeout=timeout)
+
+
+class TestCanalAgenda:
+    """Pruebas del reparto de eventos"""
+
+    async def test_filtra_por_sede(self):
+        """Prueba que cada suscriptor recibe solo su sede (None recibe todas)"""
+        canal = CanalAgenda()
+        sede_1 = canal.suscribir(1)
+        sede_2 = canal.suscribir(2)
+        todas = canal.suscribir(None)
+
+        await asyncio.to_thread(canal.despachar, {"tipo": "cita", "id": 7, "sede_id": 1})
+
+        assert (await _recibir(sede_1))["id"] == 7
+        assert (await _recibir(todas))["id"] == 7
+        await asyncio.sleep(0)
+        assert sede_2.cola.empty()
+
+        canal.cancelar(sede_1)
+        assert canal.suscriptores == 2
+
+    async def test_cola_llena_pide_resync(self):
+        """Prueba que un cliente lento recibe resync en lugar de crecer sin límite"""
+        canal = CanalAgenda(maxsize_cola=3)
+        lento = canal.suscribir(1)
+        for n in range(5):
+            canal.despachar({"tipo": "cita", "id": n, "sede_id": 1})
+        await asyncio.sleep(0.05)
+
+        eventos = []
+        while not lento.cola.empty():
+            eventos.append(lento.cola.get_nowait())
+        assert {"tipo": "resync"} in eventos
+        assert len(eventos) <= 3
+
+
+class TestEventosCitaService:
+    """Pruebas de la publicación desde CitaService"""
+
+    async def test_crear_y_eliminar_publican(self, db_session):
+        """Prueba que las escrituras confirmadas llegan a los suscriptores de la sede"""
+        especialista = Especialista(nombre="Ana", apellido="Test", estado="activo")
+        servicio = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=100000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        db_session.add_all([especialista, servicio, cliente])
+        db_session.commit()
+
+        suscripcion = agenda_eventos.suscribir(1)
+        try:
+            cita = await asyncio.to_thread(CitaService.crear, db_session, CitaCreate(
+                cliente_id=cliente.id, especialista_id=especialista.id,
+                servicio_id=servicio.id, fecha=FECHA, hora_inicio=time(10, 0)
+            ), 1, 1)
+            creada = await _recibir(suscripcion)
+            assert creada == {
+                "tipo": "cita", "accion": "creada", "id": cita.id, "sede_id": 1,
+                "especialista_id": especialista.id, "fecha": "2026-03-02",
+                "hora_inicio": "10:00:00", "hora_fin": "11:00:00", "estado": "agendada"
+            }
+
+            await asyncio.to_thread(CitaService.eliminar, db_session, cita.id)
+            eliminada = await _recibir(suscripcion)
+            assert (eliminada["accion"], eliminada["id"]) == ("eliminada", cita.id)
+        finally:
+            agenda_eventos.cancelar(suscripcion)
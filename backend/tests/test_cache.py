@@ -0,0 +1,68 @@
+"""
+Pruebas unitarias para la caché en memoria (app.utils.cache)
+"""
+import time
+from app.utils.cache import TTLCache
+
+
+class TestTTLCache:
+    """Pruebas para TTLCache"""
+
+    def test_get_set_and_stats(self):
+        """Prueba aciertos, fallos y métricas"""
+        cache = TTLCache(ttl_seconds=60)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_load_stats(self):
+        """Prueba que se contabilizan las cargas y su tiempo"""
+        cache = TTLCache(ttl_seconds=60)
+        assert cache.get_or_load("a", lambda: 1) == 1
+        assert cache.get_or_load("a", lambda: 2) == 1
+        cache.record_load(0.5, count=4)
+
+        stats = cache.stats()
+        assert stats["loads"] == 5
+        assert stats["load_ms_total"] >= 500
+
+    def test_expiration(self):
+        """Prueba que las entradas expiradas no se devuelven"""
+        cache = TTLCache(ttl_seconds=60)
+        cache.set("a", 1, expires_at=time.time() + 0.01)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.set("b", 2, expires_at=time.time() - 1) is False
+
+    def test_lru_eviction(self):
+        """Prueba que se descarta la entrada menos usada al superar maxsize"""
+        cache = TTLCache(ttl_seconds=60, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_stale_load_discarded_after_invalidation(self):
+        """Prueba que un valor cargado antes de una invalidación no se guarda"""
+        cache = TTLCache(ttl_seconds=60)
+        generation = cache.generation
+        cache.invalidate("a")
+        assert cache.set("a", "viejo", generation=generation) is False
+        assert cache.get("a") is None
+
+    def test_invalidate_where(self):
+        """Prueba la invalidación por predicado"""
+        cache = TTLCache(ttl_seconds=60)
+        cache.set(("u", 1), "x")
+        cache.set(("u", 2), "y")
+        removed = cache.invalidate_where(lambda key, value: key[1] == 1)
+        assert removed == 1
+        assert cache.get(("u", 2)) == "y"
@@ -0,0 +1,93 @@
+"""
+Pruebas de la resolución de nombres del catálogo
+"""
+from sqlalchemy import event
+from app.models.caja import MetodoPago
+from app.models.especialista import Especialista
+from app.models.sede import Sede
+from app.models.servicio import Servicio
+from app.services.catalogo_nombres import CatalogoNombres, IndiceNombres, normalizar_nombre
+
+
+class TestIndiceNombres:
+    """Pruebas del índice en memoria"""
+
+    def test_normalizar_nombre(self):
+        """Prueba que se eliminan tildes, mayúsculas y signos"""
+        assert normalizar_nombre("  Peluquería  CALI-Norte ") == "peluqueria cali norte"
+        assert normalizar_nombre("Repolarización") == "repolarizacion"
+        assert normalizar_nombre(None) == ""
+
+    def test_ranking(self):
+        """Prueba el orden: exacta, palabras en otro orden, prefijo/subcadena, aproximada"""
+        indice = IndiceNombres([
+            (1, "Alisado Premium", 10),
+            (2, "Alisado", 10),
+            (3, "Repolarización", 10),
+            (4, "María José Gómez", 10),
+            (5, "Alisado", 20),
+        ])
+
+        assert indice.mejor("ALISADO", 10) == 2
+        assert indice.mejor("alisado prem", 10) == 1
+        assert indice.mejor("repolarizacion", 10) == 3
+        assert indice.mejor("gomez maria jose", 10) == 4
+        assert indice.mejor("maria gom", 10) == 4
+        assert indice.mejor("repolarisacion", 10) == 3  # error de tipeo
+        assert indice.mejor("alisado", 20) == 5
+        assert indice.mejor("keratina", 10) is None
+        assert [id_ for id_, _ in indice.buscar("alisado", 10)] == [2, 1]
+
+
+class TestCatalogoNombres:
+    """Pruebas de la resolución contra la BD con caché"""
+
+    def test_resolver_y_cache(self, db_engine, db_session):
+        """Prueba que la segunda resolución no consulta la BD"""
+        sede = Sede(codigo="CALI", nombre="Sede Cali Norte", estado="activa")
+        db_session.add(sede)
+        db_session.flush()
+        db_session.add_all([
+            Servicio(nombre="Alisado Brasileño", duracion_minutos=60, precio_base=100, sede_id=sede.id),
+            Especialista(nombre="Ana", apellido="Gómez", estado="activo", sede_id=sede.id),
+            Especialista(nombre="Ana", apellido="Ruiz", estado="inactivo", sede_id=sede.id),
+            MetodoPago(nombre="Transferencia", activo=True),
+        ])
+        db_session.commit()
+
+        assert CatalogoNombres.resolver_sede(db_session, "cali norte") == sede.id
+
+        consultas = []
+        contar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            assert CatalogoNombres.resolver_sede(db_session, "CALI") == sede.id
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+        assert consultas == []
+
+        servicio_id = CatalogoNombres.resolver_servicio(db_session, "alisado brasileno", sede.id)
+        assert db_session.get(Servicio, servicio_id).nombre == "Alisado Brasileño"
+        assert CatalogoNombres.resolver_servicio(db_session, "alisado", sede.id + 1) is None
+        ana = CatalogoNombres.resolver_especialista(db_session, "ana", sede.id)
+        assert db_session.get(Especialista, ana).apellido == "Gómez"
+        assert CatalogoNombres.resolver_metodo_pago(db_session, "transferencia") is not None
+
+    def test_escrituras_invalidan(self, db_session):
+        """Prueba que un cambio confirmado en el catálogo se refleja en la siguiente resolución"""
+        servicio = Servicio(nombre="Lavado", duracion_minutos=30, precio_base=100, sede_id=1)
+        db_session.add(servicio)
+        db_session.commit()
+        assert CatalogoNombres.resolver_servicio(db_session, "lavado", 1) == servicio.id
+        assert CatalogoNombres.resolver_servicio(db_session, "hidratacion", 1) is None
+
+        servicio.nombre = "Hidratación"
+        db_session.commit()
+        assert CatalogoNombres.resolver_servicio(db_session, "hidratacion", 1) == servicio.id
+
+        # Un cambio revertido no invalida nada
+        nuevo = Servicio(nombre="Keratina", duracion_minutos=30, precio_base=100, sede_id=1)
+        db_session.add(nuevo)
+        db_session.flush()
+        db_session.rollback()
+        assert CatalogoNombres.resolver_servicio(db_session, "keratina", 1) is None
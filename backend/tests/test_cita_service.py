@@ -0,0 +1,313 @@
+"""
+Pruebas para CitaService
+"""
+import threading
+import pytest
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.models.cita import Cita
+from app.models.cliente import Cliente
+from app.models.especialista import Especialista
+from app.models.servicio import Servicio
+from app.models.auth import Permiso, RolPermiso
+from app.schemas.cita import CitaCreate, CitaUpdate
+from app.services.cita_service import CitaService
+
+FECHA = date(2026, 3, 2)
+
+
+@pytest.fixture
+def agenda_base(db_session):
+    """Especialista, servicio de 60 minutos y cliente para reservar"""
+    especialista = Especialista(nombre="Ana", apellido="Test", estado="activo")
+    servicio = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=100000)
+    cliente = Cliente(nombre="Cliente", apellido="Test")
+    db_session.add_all([especialista, servicio, cliente])
+    db_session.commit()
+    return {"especialista_id": especialista.id, "servicio_id": servicio.id, "cliente_id": cliente.id}
+
+
+def _cita_create(agenda_base, hora_inicio):
+    return CitaCreate(
+        cliente_id=agenda_base["cliente_id"],
+        especialista_id=agenda_base["especialista_id"],
+        servicio_id=agenda_base["servicio_id"],
+        fecha=FECHA,
+        hora_inicio=hora_inicio
+    )
+
+
+class TestSolapamientoCitas:
+    """Pruebas de la protección contra citas solapadas"""
+
+    def test_bd_rechaza_cita_solapada(self, db_session, agenda_base):
+        """Prueba que la BD rechaza una cita solapada aunque no pase por CitaService"""
+        CitaService.crear(db_session, _cita_create(agenda_base, time(10, 0)), usuario_id=1, sede_id=1)
+
+        db_session.add(Cita(
+            cliente_id=agenda_base["cliente_id"], especialista_id=agenda_base["especialista_id"],
+            servicio_id=agenda_base["servicio_id"], fecha=FECHA,
+            hora_inicio=time(10, 30), hora_fin=time(11, 30), duracion_minutos=60, estado="agendada"
+        ))
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+        db_session.rollback()
+
+        # Las citas canceladas no ocupan agenda y las contiguas no se solapan
+        db_session.add_all([
+            Cita(
+                cliente_id=agenda_base["cliente_id"], especialista_id=agenda_base["especialista_id"],
+                servicio_id=agenda_base["servicio_id"], fecha=FECHA,
+                hora_inicio=time(10, 30), hora_fin=time(11, 30), duracion_minutos=60, estado="cancelada"
+            ),
+            Cita(
+                cliente_id=agenda_base["cliente_id"], especialista_id=agenda_base["especialista_id"],
+                servicio_id=agenda_base["servicio_id"], fecha=FECHA,
+                hora_inicio=time(11, 0), hora_fin=time(12, 0), duracion_minutos=60, estado="agendada"
+            ),
+        ])
+        db_session.commit()
+
+    def test_actualizar_a_horario_ocupado(self, db_session, agenda_base):
+        """Prueba que mover o reactivar una cita sobre otra se informa como conflicto"""
+        CitaService.crear(db_session, _cita_create(agenda_base, time(9, 0)), usuario_id=1, sede_id=1)
+        otra = CitaService.crear(db_session, _cita_create(agenda_base, time(11, 0)), usuario_id=1, sede_id=1)
+
+        with pytest.raises(ValueError, match="ya tiene una cita"):
+            CitaService.actualizar(db_session, otra.id, CitaUpdate(hora_inicio=time(9, 30)))
+
+        CitaService.cambiar_estado(db_session, otra.id, "cancelada")
+        CitaService.actualizar(db_session, otra.id, CitaUpdate(hora_inicio=time(9, 30)))
+        with pytest.raises(ValueError, match="ya tiene una cita"):
+            CitaService.cambiar_estado(db_session, otra.id, "agendada")
+
+    def test_reservas_concurrentes_mismo_horario(self, db_engine, db_session, agenda_base):
+        """Prueba que de varias reservas simultáneas del mismo horario solo una se confirma"""
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+        hilos = 8
+        barrera = threading.Barrier(hilos)
+        resultados = []
+
+        def reservar():
+            db = SessionLocal()
+            try:
+                barrera.wait()
+                CitaService.crear(db, _cita_create(agenda_base, time(15, 0)), usuario_id=1, sede_id=1)
+                resultados.append("ok")
+            except ValueError:
+                resultados.append("conflicto")
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=reservar) for _ in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert resultados.count("ok") == 1
+        assert resultados.count("conflicto") == hilos - 1
+        assert db_session.query(Cita).filter(Cita.hora_inicio == time(15, 0)).count() == 1
+
+
+class TestListadoCitas:
+    """Pruebas del listado del calendario"""
+
+    def _crear_citas(self, db_session, agenda_base, cantidad):
+        otros = [Especialista(nombre=f"Esp{n}", apellido="Lista", estado="activo") for n in range(cantidad)]
+        db_session.add_all(otros)
+        db_session.flush()
+        for esp in otros:
+            db_session.add(Cita(
+                cliente_id=agenda_base["cliente_id"], especialista_id=esp.id,
+                servicio_id=agenda_base["servicio_id"], fecha=FECHA,
+                hora_inicio=time(9, 0), hora_fin=time(10, 0), duracion_minutos=60, estado="agendada"
+            ))
+        db_session.commit()
+        db_session.expunge_all()
+
+    def _contar_consultas(self, db_engine, funcion):
+        consultas = []
+        escuchar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", escuchar)
+        try:
+            funcion()
+        finally:
+            event.remove(db_engine, "before_cursor_execute", escuchar)
+        return len(consultas)
+
+    def test_listado_sin_consultas_por_cita(self, db_engine, db_session, agenda_base):
+        """Prueba que formatear el listado no dispara consultas por cada cita"""
+        self._crear_citas(db_session, agenda_base, 12)
+
+        def listar():
+            citas = CitaService.get_by_fecha(db_session, FECHA)
+            filas = [CitaService.format_cita_list(c) for c in citas]
+            assert len(filas) == 12
+            assert all(f["cliente_nombre"] == "Cliente Test" for f in filas)
+
+        assert self._contar_consultas(db_engine, listar) == 1
+
+    def test_formato_columnar(self, db_session, agenda_base):
+        """Prueba que el formato columnar equivale al listado por filas"""
+        self._crear_citas(db_session, agenda_base, 3)
+        filas = [CitaService.format_cita_list(c) for c in CitaService.get_by_fecha(db_session, FECHA)]
+        columnar = CitaService.get_calendario_columnar(db_session, FECHA)
+
+        assert columnar["total"] == 3
+        assert columnar["citas"]["id"] == [f["id"] for f in filas]
+        assert columnar["citas"]["cliente_nombre"] == [f["cliente_nombre"] for f in filas]
+        for i, fila in enumerate(filas):
+            esp_id = columnar["citas"]["especialista_id"][i]
+            serv_id = columnar["citas"]["servicio_id"][i]
+            assert columnar["especialistas"][esp_id]["nombre"] == fila["especialista_nombre"]
+            assert columnar["servicios"][serv_id] == {
+                "nombre": fila["servicio_nombre"], "color": fila["servicio_color"]
+            }
+        # El servicio se repite en las tres citas pero aparece una sola vez
+        assert len(columnar["servicios"]) == 1
+
+
+class TestCambiosAgenda:
+    """Pruebas de la sincronización incremental (GET /api/citas/cambios)"""
+
+    def _crear(self, db_session, agenda_base, hora):
+        return CitaService.crear(db_session, _cita_create(agenda_base, hora), usuario_id=1, sede_id=1)
+
+    def test_sin_cursor_devuelve_rango_completo(self, db_session, agenda_base):
+        """Prueba que sin cursor se entrega la agenda completa con un cursor nuevo"""
+        self._crear(db_session, agenda_base, time(9, 0))
+        self._crear(db_session, agenda_base, time(11, 0))
+
+        respuesta, etag = CitaService.get_cambios(db_session, FECHA, sede_id=1)
+        assert respuesta["completo"] is True
+        assert [c["hora_inicio"] for c in respuesta["citas"]] == [time(9, 0), time(11, 0)]
+        assert respuesta["cursor"]
+        assert etag.startswith('W/"')
+
+    def test_cambios_desde_cursor(self, db_session, agenda_base):
+        """Prueba que se reportan modificaciones, eliminaciones y citas movidas fuera del rango"""
+        a = self._crear(db_session, agenda_base, time(9, 0))
+        b = self._crear(db_session, agenda_base, time(11, 0))
+        c = self._crear(db_session, agenda_base, time(14, 0))
+        cursor = CitaService.get_cambios(db_session, FECHA, sede_id=1)[0]["cursor"]
+
+        sin_cambios, etag = CitaService.get_cambios(db_session, FECHA, sede_id=1, cursor=cursor)
+        assert sin_cambios["completo"] is False
+        assert CitaService.get_cambios(db_session, FECHA, sede_id=1, cursor=cursor)[1] == etag
+
+        CitaService.cambiar_estado(db_session, a.id, "confirmada")
+        CitaService.eliminar(db_session, b.id)
+        CitaService.actualizar(db_session, c.id, CitaUpdate(fecha=FECHA + timedelta(days=1)))
+
+        respuesta, nuevo_etag = CitaService.get_cambios(db_session, FECHA, sede_id=1, cursor=cursor)
+        assert nuevo_etag != etag
+        assert {x["id"]: x["estado"] for x in respuesta["citas"]} == {a.id: "confirmada"}
+        assert respuesta["eliminadas"] == sorted([b.id, c.id])
+
+    def test_cursor_invalido_o_vencido(self, db_session, agenda_base):
+        """Prueba que un cursor ilegible falla y uno fuera de la retención recibe todo"""
+        self._crear(db_session, agenda_base, time(9, 0))
+        with pytest.raises(ValueError, match="Cursor"):
+            CitaService.get_cambios(db_session, FECHA, sede_id=1, cursor="ayer")
+
+        viejo = (datetime.utcnow() - timedelta(days=365)).isoformat()
+        respuesta, _ = CitaService.get_cambios(db_session, FECHA, sede_id=1, cursor=viejo)
+        assert respuesta["completo"] is True
+        assert len(respuesta["citas"]) == 1
+
+    def test_endpoint_responde_304_sin_cambios(self, client, db_session, agenda_base, admin_user, admin_headers, active_session):
+        """Prueba que el endpoint devuelve 304 cuando el ETag del cliente sigue vigente"""
+        permiso = Permiso(codigo="agenda.ver", nombre="Ver agenda", modulo="agenda")
+        db_session.add(permiso)
+        db_session.flush()
+        db_session.add(RolPermiso(rol_id=admin_user.rol_id, permiso_id=permiso.id))
+        db_session.commit()
+        self._crear(db_session, agenda_base, time(9, 0))
+
+        url = f"/api/citas/cambios?fecha_inicio={FECHA.isoformat()}"
+        primera = client.get(url, headers=admin_headers)
+        assert primera.status_code == 200
+        assert len(primera.json()["citas"]) == 1
+
+        segunda = client.get(url, headers={**admin_headers, "If-None-Match": primera.headers["ETag"]})
+        assert segunda.status_code == 304
+        assert segunda.content == b""
+
+
+class TestCrearLote:
+    """Pruebas de la creación masiva (POST /api/citas/bulk)"""
+
+    def test_resultados_por_item(self, db_engine, db_session, agenda_base):
+        """Prueba validación de referencias y conflictos contra la BD y dentro del lote"""
+        CitaService.crear(db_session, _cita_create(agenda_base, time(9, 0)), usuario_id=1, sede_id=1)
+        sin_servicio = _cita_create(agenda_base, time(16, 0))
+        sin_servicio.servicio_id = 9999
+        lote = [
+            _cita_create(agenda_base, time(9, 30)),   # choca con la existente de 9:00
+            _cita_create(agenda_base, time(12, 30)),  # choca con la de 12:00 del lote
+            _cita_create(agenda_base, time(12, 0)),
+            _cita_create(agenda_base, time(10, 0)),   # contigua a la existente
+            sin_servicio,
+        ]
+
+        consultas = []
+        contar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            resultados = CitaService.crear_lote(db_session, lote, usuario_id=1, sede_id=1)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+
+        assert [r["ok"] for r in resultados] == [False, False, True, True, False]
+        assert resultados[0]["error"] == "El especialista ya tiene una cita a esa hora"
+        assert resultados[1]["error"] == "Se solapa con otra cita del lote"
+        assert resultados[4]["error"] == "Servicio no encontrado"
+        # 4 lecturas + inserciones en un solo flush; no depende de cuántas citas haya
+        assert len(consultas) <= 8
+        horas = [c.hora_inicio for c in db_session.query(Cita).order_by(Cita.hora_inicio)]
+        assert horas == [time(9, 0), time(10, 0), time(12, 0)]
+
+    def test_existentes_solapadas_entre_si(self, db_session, agenda_base):
+        """Prueba el barrido con citas antiguas que ya se solapaban (anteriores a la 008)"""
+        db_session.execute(text("DROP TRIGGER trg_citas_sin_solapamiento_insert"))
+        for inicio, fin in ((time(9, 0), time(13, 0)), (time(9, 30), time(10, 0))):
+            db_session.add(Cita(
+                cliente_id=agenda_base["cliente_id"], especialista_id=agenda_base["especialista_id"],
+                servicio_id=agenda_base["servicio_id"], fecha=FECHA, hora_inicio=inicio, hora_fin=fin,
+                duracion_minutos=60, estado="agendada"
+            ))
+        db_session.commit()
+
+        # La vecina anterior (9:30-10:00) no choca, pero la de 9:00-13:00 sí
+        lote = [_cita_create(agenda_base, time(11, 0)), _cita_create(agenda_base, time(13, 0))]
+        resultados = CitaService.crear_lote(db_session, lote, usuario_id=1, sede_id=1)
+
+        assert [r["ok"] for r in resultados] == [False, True]
+        assert resultados[0]["error"] == "El especialista ya tiene una cita a esa hora"
+
+    def test_todo_o_nada(self, db_session, agenda_base):
+        """Prueba que con todo_o_nada un ítem inválido impide crear el resto"""
+        lote = [_cita_create(agenda_base, time(9, 0)), _cita_create(agenda_base, time(9, 30))]
+        resultados = CitaService.crear_lote(db_session, lote, usuario_id=1, sede_id=1, todo_o_nada=True)
+
+        assert not any(r["ok"] for r in resultados)
+        assert resultados[0]["error"] == "No creada: el lote tiene errores"
+        assert db_session.query(Cita).count() == 0
+
+    def test_conflicto_al_confirmar_reintenta_por_item(self, db_session, agenda_base, monkeypatch):
+        """Prueba que si la BD rechaza el lote se conservan las citas que sí caben"""
+        CitaService.crear(db_session, _cita_create(agenda_base, time(9, 0)), usuario_id=1, sede_id=1)
+        # Simula una reserva concurrente: la lectura previa no ve la cita de las 9:00
+        monkeypatch.setattr(
+            "app.services.cita_service.ESTADOS_CITA_INACTIVOS", ("cancelada", "no_show", "agendada")
+        )
+
+        lote = [_cita_create(agenda_base, time(9, 30)), _cita_create(agenda_base, time(14, 0))]
+        resultados = CitaService.crear_lote(db_session, lote, usuario_id=1, sede_id=1)
+
+        assert [r["ok"] for r in resultados] == [False, True]
+        assert resultados[0]["error"] == "El especialista ya tiene una cita a esa hora"
+        assert db_session.query(Cita).count() == 2
@@ -0,0 +1,97 @@
+"""
+Pruebas de la búsqueda de clientes
+"""
+from sqlalchemy import event
+from app.models.cliente import Cliente
+from app.schemas.cliente import ClienteCreate, ClienteUpdate
+from app.services.cliente_busqueda import IndiceClientes, terminos_busqueda, texto_busqueda
+from app.services.cliente_service import ClienteService
+
+
+class TestNormalizacion:
+    """Pruebas del texto indexado y de los términos de consulta"""
+
+    def test_texto_y_terminos(self):
+        """Prueba que se quitan tildes y signos y que los números quedan solo en dígitos"""
+        assert texto_busqueda("María José", "Gómez", "1.094-555", "+57 300 123 4567", "maria.g@Mail.com") == (
+            "maria jose gomez 1094555 573001234567 maria g mail com"
+        )
+        assert texto_busqueda("Ana", None, None, None, None) == "ana"
+        assert terminos_busqueda("  Gómez  MARÍA ") == ["gomez", "maria"]
+        assert terminos_busqueda("+57 (300) 123-45") == ["5730012345"]
+        assert terminos_busqueda("  ") == []
+
+
+class TestIndiceClientes:
+    """Pruebas del índice de trigramas en memoria"""
+
+    def test_orden_por_relevancia(self):
+        """Prueba el orden: empieza por la consulta, inicio de palabra, subcadena"""
+        indice = IndiceClientes([
+            (1, texto_busqueda("Juliana", "Ríos"), True),
+            (2, texto_busqueda("Ana", "Gómez"), True),
+            (3, texto_busqueda("Pedro", "Anaya"), True),
+            (4, texto_busqueda("Ana", "Inactiva"), False),
+            (5, texto_busqueda("Anabel", "Ruiz", telefono="3001234567"), True),
+        ])
+
+        assert indice.buscar("ana") == [2, 5, 3, 1]
+        assert indice.buscar("ana", solo_activos=False) == [2, 4, 5, 3, 1]
+        assert indice.buscar("an") == [2, 5, 3]  # términos cortos: solo inicio de palabra
+        assert indice.buscar("gomez ana") == [2]
+        assert indice.buscar("300 123") == [5]
+        assert indice.buscar("ana", limite=2) == [2, 5]
+        assert indice.buscar("xyz") == []
+
+
+class TestBusquedaClientes:
+    """Pruebas de ClienteService con el índice de búsqueda"""
+
+    def test_busqueda_rapida(self, db_session, db_engine):
+        """Prueba tildes, teléfono con prefijo, caché e invalidación al escribir"""
+        ana = ClienteService.create(db_session, ClienteCreate(
+            nombre="Ána María", apellido="Gómez", telefono="+57 300 123 4567"
+        ), sede_id=1)
+        ClienteService.create(db_session, ClienteCreate(nombre="Ana", apellido="Otra Sede"), sede_id=2)
+        assert ana.busqueda == "ana maria gomez 573001234567"
+
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "ana gom")] == [ana.id]
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "300-123")] == [ana.id]
+
+        consultas = []
+        contar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            ClienteService.busqueda_rapida(db_session, 1, "maria")
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+        assert len(consultas) == 1  # solo la carga de los clientes encontrados
+
+        ClienteService.update(db_session, ana.id, ClienteUpdate(apellido="Ruiz"))
+        assert ClienteService.busqueda_rapida(db_session, 1, "gomez") == []
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "ruiz")] == [ana.id]
+
+        nueva = ClienteService.create(db_session, ClienteCreate(nombre="Anabel", apellido="Pérez"), sede_id=1)
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "ana")] == [ana.id, nueva.id]
+
+        # Cambio de sede: sale del índice de la sede anterior
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 2, "ruiz")] == []
+        ana.sede_id = 2
+        db_session.commit()
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "ana")] == [nueva.id]
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 2, "ruiz")] == [ana.id]
+
+    def test_listado_filtra_por_texto(self, db_session):
+        """Prueba que el listado paginado usa el mismo filtro normalizado"""
+        db_session.add_all([
+            Cliente(nombre="José", apellido="Pérez", cedula="1094555", sede_id=1, estado="activo"),
+            Cliente(nombre="Josefina", apellido="López", sede_id=1, estado="activo"),
+            Cliente(nombre="Pedro", apellido="Jose", sede_id=1, estado="inactivo"),
+        ])
+        db_session.commit()
+
+        resultado = ClienteService.get_all_paginado(db_session, 1, query="jose")
+        assert {c["nombre"] for c in resultado["items"]} == {"José", "Josefina"}
+        assert ClienteService.get_all_paginado(db_session, 1, query="perez jose")["total"] == 1
+        assert ClienteService.get_all_paginado(db_session, 1, query="1094")["total"] == 1
+        assert ClienteService.get_all_paginado(db_session, 1, query="jose", estado="todos")["total"] == 3
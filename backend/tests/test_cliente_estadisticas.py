@@ -0,0 +1,112 @@
+"""
+Pruebas de las estadísticas guardadas en los clientes
+"""
+import pytest
+from datetime import date, datetime, time
+from decimal import Decimal
+from sqlalchemy import update
+from app.models.caja import DetalleFactura, Factura
+from app.models.cita import Cita
+from app.models.cliente import Cliente
+from app.models.especialista import Especialista
+from app.models.servicio import Servicio
+from app.services.cliente_estadisticas import ClienteEstadisticas
+
+
+@pytest.fixture
+def base(db_session, admin_user):
+    especialista = Especialista(nombre="Ana", apellido="Test", estado="activo")
+    alisado = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=100000)
+    corte = Servicio(nombre="Corte", duracion_minutos=30, precio_base=30000)
+    cliente = Cliente(nombre="Cliente", apellido="Test")
+    db_session.add_all([especialista, alisado, corte, cliente])
+    db_session.commit()
+    return {
+        "especialista": especialista, "alisado": alisado, "corte": corte,
+        "cliente": cliente, "usuario_id": admin_user.id,
+    }
+
+
+def _estadisticas(db_session, cliente_id):
+    db_session.expire_all()
+    cliente = db_session.get(Cliente, cliente_id)
+    return cliente.total_visitas, cliente.ultima_visita, cliente.total_gastado, cliente.ultimo_servicio_id
+
+
+class TestEstadisticasClientes:
+    """Pruebas del mantenimiento al confirmar citas y facturas"""
+
+    def test_cita_y_facturas(self, db_session, base):
+        """Prueba completar cita, facturarla el mismo día, otra factura y anulaciones"""
+        cliente_id = base["cliente"].id
+        cita = Cita(
+            cliente_id=cliente_id, especialista_id=base["especialista"].id, servicio_id=base["alisado"].id,
+            fecha=date(2026, 3, 2), hora_inicio=time(10, 0), hora_fin=time(11, 0), duracion_minutos=60,
+            estado="agendada"
+        )
+        db_session.add(cita)
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (0, None, 0, None)
+
+        cita.estado = "completada"
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (1, date(2026, 3, 2), 0, base["alisado"].id)
+
+        # La factura de la cita es la misma visita
+        factura = Factura(
+            numero_factura="F-1", cliente_id=cliente_id, estado="pagada", subtotal=100000, total=100000,
+            usuario_id=base["usuario_id"], fecha=datetime(2026, 3, 2, 11, 5)
+        )
+        db_session.add(factura)
+        db_session.flush()
+        db_session.add(DetalleFactura(
+            factura_id=factura.id, tipo="servicio", item_id=base["alisado"].id, cantidad=1,
+            precio_unitario=100000, subtotal=100000, cita_id=cita.id
+        ))
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (1, date(2026, 3, 2), Decimal("100000"), base["alisado"].id)
+
+        # Venta sin cita otro día: nueva visita y último servicio
+        otra = Factura(
+            numero_factura="F-2", cliente_id=cliente_id, estado="pagada", subtotal=30000, total=30000,
+            usuario_id=base["usuario_id"], fecha=datetime(2026, 4, 10, 9, 0),
+            detalle=[DetalleFactura(
+                tipo="servicio", item_id=base["corte"].id, cantidad=1, precio_unitario=30000, subtotal=30000
+            )]
+        )
+        db_session.add(otra)
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (2, date(2026, 4, 10), Decimal("130000"), base["corte"].id)
+
+        otra.estado = "anulada"
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (1, date(2026, 3, 2), Decimal("100000"), base["alisado"].id)
+
+        # Sin la cita completada sigue contando la factura pagada de ese día
+        cita.estado = "cancelada"
+        db_session.commit()
+        assert _estadisticas(db_session, cliente_id) == (1, date(2026, 3, 2), Decimal("100000"), base["alisado"].id)
+
+        # Un rollback no deja clientes pendientes de recalcular
+        factura.estado = "anulada"
+        db_session.flush()
+        db_session.rollback()
+        assert "estadisticas_clientes" not in db_session.info
+        assert _estadisticas(db_session, cliente_id)[0] == 1
+
+    def test_recalcular_todos(self, db_session, base):
+        """Prueba que el backfill corrige contadores desincronizados"""
+        cliente_id = base["cliente"].id
+        db_session.add(Factura(
+            numero_factura="F-1", cliente_id=cliente_id, estado="pagada", subtotal=50000, total=50000,
+            usuario_id=base["usuario_id"], fecha=datetime(2026, 2, 1, 12, 0)
+        ))
+        sin_visitas = Cliente(nombre="Nuevo")
+        db_session.add(sin_visitas)
+        db_session.commit()
+        db_session.execute(update(Cliente).values(total_visitas=7, ultima_visita=date(2020, 1, 1)))
+        db_session.commit()
+
+        assert ClienteEstadisticas.recalcular_todos(db_session, lote=1) == 2
+        assert _estadisticas(db_session, cliente_id) == (1, date(2026, 2, 1), Decimal("50000"), None)
+        assert _estadisticas(db_session, sin_visitas.id) == (0, None, 0, None)
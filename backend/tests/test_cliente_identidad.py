@@ -0,0 +1,144 @@
+"""
+Pruebas de la identidad normalizada y la fusión de clientes duplicados
+"""
+import pytest
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app.models.caja import Factura
+from app.models.cliente import Cliente, ClienteEtiqueta, ClienteEtiquetaAsignacion, ClientePreferencia
+from app.schemas.cliente import ClienteCreate, ClienteUpdate
+from app.services.cliente_identidad import ClienteIdentidad, normalizar_cedula, normalizar_telefono
+from app.services.cliente_service import ClienteService
+
+
+class TestNormalizacion:
+    """Pruebas de las claves normalizadas"""
+
+    def test_telefono_e164(self):
+        """Prueba que el mismo número escrito de varias formas da la misma clave"""
+        for telefono in ("3001234567", "300 123 4567", "+57 300-123-4567", "0057 3001234567", "573001234567"):
+            assert normalizar_telefono(telefono) == "+573001234567"
+        assert normalizar_telefono("+1 (415) 555-0100") == "+14155550100"
+        assert normalizar_telefono("123") is None
+        assert normalizar_telefono(None) is None
+
+    def test_cedula(self):
+        """Prueba que se quitan separadores y ceros a la izquierda"""
+        assert normalizar_cedula(" 01.094-555 ") == "1094555"
+        assert normalizar_cedula("ab-12345") == "AB12345"
+        assert normalizar_cedula("000") is None
+
+
+class TestObtenerOCrear:
+    """Pruebas del alta atómica de clientes"""
+
+    def test_reutiliza_por_telefono_o_cedula(self, db_session):
+        """Prueba que el bot y recepción reconocen al cliente con otro formato"""
+        datos = ClienteCreate(nombre="Ana", cedula="01094555", telefono="300 123 4567")
+        ana, creado = ClienteIdentidad.obtener_o_crear(db_session, datos, 1)
+        assert creado
+        assert (ana.cedula_normalizada, ana.telefono_normalizado) == ("1094555", "+573001234567")
+        assert ana.preferencias is not None
+
+        mismo, creado = ClienteIdentidad.obtener_o_crear(
+            db_session, ClienteCreate(nombre="Ana M", telefono="+57 3001234567"), 1
+        )
+        assert (mismo.id, creado) == (ana.id, False)
+
+        with pytest.raises(HTTPException) as error:
+            ClienteService.create(db_session, ClienteCreate(nombre="Otra", cedula="1094555"), 1)
+        assert error.value.status_code == 400
+        assert "cédula" in error.value.detail
+
+        otro = ClienteService.create(db_session, ClienteCreate(nombre="Beto", telefono="3109876543"), 1)
+        with pytest.raises(HTTPException):
+            ClienteService.update(db_session, otro.id, ClienteUpdate(telefono="+573001234567"))
+        assert db_session.query(Cliente).count() == 2
+
+    def test_update_valida_cada_clave(self, db_session):
+        """Prueba que la cédula propia no oculta un teléfono de otro cliente al actualizar"""
+        ana = ClienteService.create(db_session, ClienteCreate(nombre="Ana", cedula="1094555", telefono="3001111111"), 1)
+        ClienteService.create(db_session, ClienteCreate(nombre="Beto", cedula="2020202", telefono="3002222222"), 1)
+
+        with pytest.raises(HTTPException) as error:
+            ClienteService.update(db_session, ana.id, ClienteUpdate(cedula="1094555", telefono="300 222 2222"))
+        assert error.value.status_code == 400
+        assert "teléfono" in error.value.detail
+
+        actualizada = ClienteService.update(db_session, ana.id, ClienteUpdate(cedula="01094555", telefono="3003333333"))
+        assert actualizada.telefono_normalizado == "+573003333333"
+
+    def test_insercion_concurrente(self, db_session, monkeypatch):
+        """Prueba que si otro proceso crea el cliente tras la búsqueda se reutiliza su registro"""
+        primero, _ = ClienteIdentidad.obtener_o_crear(db_session, ClienteCreate(nombre="Ana", telefono="3001234567"), 1)
+        buscar = ClienteIdentidad.buscar
+        llamadas = []
+
+        def buscar_tarde(db, cedula=None, telefono=None):
+            llamadas.append(1)
+            return None if len(llamadas) == 1 else buscar(db, cedula, telefono)
+
+        monkeypatch.setattr(ClienteIdentidad, "buscar", staticmethod(buscar_tarde))
+        cliente, creado = ClienteIdentidad.obtener_o_crear(
+            db_session, ClienteCreate(nombre="Ana", telefono="300-123-4567"), 1
+        )
+        assert (cliente.id, creado) == (primero.id, False)
+        assert db_session.query(Cliente).count() == 1
+
+
+class TestDeduplicar:
+    """Pruebas del trabajo de fusión de duplicados"""
+
+    def test_fusiona_grupos_transitivos(self, db_session, admin_user):
+        """Prueba que se fusionan referencias, etiquetas, datos y estadísticas"""
+        # Registros anteriores a las claves normalizadas (INSERT sin eventos del ORM)
+        filas = [
+            {"nombre": "Ana", "cedula": "1094555", "telefono": "3001234567", "total_visitas": 1,
+             "ultima_visita": date(2026, 1, 5), "fecha_primera_visita": date(2025, 3, 1)},
+            {"nombre": "Ana María", "telefono": "+57 300 123 4567", "email": "ana@mail.com", "total_visitas": 4,
+             "ultima_visita": date(2026, 2, 1), "fecha_primera_visita": date(2025, 6, 1)},
+            {"nombre": "Ana", "cedula": "01094555-", "telefono": "3155550000", "total_visitas": 0},
+            {"nombre": "Beto", "cedula": "2200", "telefono": "3109876543", "total_visitas": 2},
+        ]
+        ids = [
+            db_session.execute(insert(Cliente).values(sede_id=1, estado="activo", **fila)).inserted_primary_key[0]
+            for fila in filas
+        ]
+        vip = ClienteEtiqueta(nombre="VIP")
+        db_session.add(vip)
+        db_session.flush()
+        db_session.add_all([
+            ClienteEtiquetaAsignacion(cliente_id=ids[0], etiqueta_id=vip.id),
+            ClienteEtiquetaAsignacion(cliente_id=ids[1], etiqueta_id=vip.id),
+            ClientePreferencia(cliente_id=ids[0], alergias="Amoníaco"),
+            ClientePreferencia(cliente_id=ids[1]),
+            Factura(numero_factura="F-1", cliente_id=ids[0], estado="pagada", total=1000, subtotal=1000,
+                    usuario_id=admin_user.id, fecha=datetime(2026, 1, 5, 10)),
+            Factura(numero_factura="F-2", cliente_id=ids[2], estado="pagada", total=2000, subtotal=2000,
+                    usuario_id=admin_user.id, fecha=datetime(2026, 3, 1, 16)),
+        ])
+        db_session.commit()
+
+        informe = ClienteIdentidad.deduplicar(db_session)
+        assert (informe["grupos"], informe["duplicados"], informe["fusionados"]) == (1, 2, 0)
+
+        resultado = ClienteIdentidad.deduplicar(db_session, aplicar=True)
+        assert resultado["fusionados"] == 2
+        db_session.expire_all()
+
+        restantes = db_session.query(Cliente).order_by(Cliente.id).all()
+        assert [c.id for c in restantes] == [ids[1], ids[3]]
+        ana = restantes[0]
+        assert ana.nombre == "Ana María"  # el de más visitas se conserva
+        assert (ana.cedula, ana.email) == ("1094555", "ana@mail.com")
+        # Estadísticas recalculadas desde las facturas ya unificadas
+        assert (ana.total_visitas, ana.fecha_primera_visita, ana.ultima_visita) == (2, date(2026, 1, 5), date(2026, 3, 1))
+        assert ana.total_gastado == 3000
+        assert (ana.cedula_normalizada, ana.telefono_normalizado) == ("1094555", "+573001234567")
+        assert ana.preferencias.alergias == "Amoníaco"
+        assert [a.etiqueta_id for a in ana.etiquetas_asignadas] == [vip.id]
+        assert {f.cliente_id for f in db_session.query(Factura)} == {ana.id}
+        assert restantes[1].telefono_normalizado == "+573109876543"
+
+        assert ClienteIdentidad.deduplicar(db_session, aplicar=True)["grupos"] == 0
@@ -0,0 +1,102 @@
+"""
+Pruebas de la importación masiva de clientes
+"""
+import io
+import json
+from datetime import date, datetime
+from openpyxl import Workbook
+from app.models.auth import Permiso, RolPermiso
+from app.models.cliente import Cliente
+from app.schemas.cliente import ClienteCreate
+from app.services.cliente_importacion import ArchivoClientes, ImportadorClientes
+from app.services.cliente_service import ClienteService
+
+CSV = (
+    "Nombre;Apellidos;Documento;Celular;Correo;Fecha de nacimiento;Columna extra\n"
+    "Ana;Gómez;1094555;300 123 4567;ANA@Mail.com;15/03/1990;x\n"
+    "Beto;Ruiz;;+57 310 987 6543;;;\n"
+    "Beto;;;3109876543;beto@mail.com;;\n"
+    "X;Corto;;;;;\n"
+    ";;;;;;\n"
+    "Carla;Díaz;22334455;3155550000;carla@mail;;\n"
+)
+
+
+class TestImportacionClientes:
+    """Pruebas del importador por lotes"""
+
+    def test_endpoint_csv(self, client, db_session, admin_user, admin_headers, active_session):
+        """Prueba alias de columnas, filas repetidas e inválidas, upsert y búsqueda"""
+        permiso = Permiso(codigo="clientes.crear", nombre="Crear clientes", modulo="clientes")
+        db_session.add(permiso)
+        db_session.flush()
+        db_session.add(RolPermiso(rol_id=admin_user.rol_id, permiso_id=permiso.id))
+        admin_user.sede_id = 1
+        db_session.commit()
+        existente = ClienteService.create(db_session, ClienteCreate(
+            nombre="Ana María", telefono="3001234567", notas="Cliente antigua"
+        ), sede_id=1)
+        assert ClienteService.busqueda_rapida(db_session, 1, "gomez") == []
+
+        respuesta = client.post(
+            "/api/clientes/importar", headers=admin_headers,
+            files={"archivo": ("clientes.csv", CSV.encode("utf-8"), "text/csv")}
+        )
+        assert respuesta.status_code == 200
+        resumen = json.loads(respuesta.text.strip().splitlines()[-1])
+        assert resumen["terminado"] is True
+        assert (resumen["filas"], resumen["insertados"], resumen["actualizados"]) == (5, 1, 1)
+        assert (resumen["repetidos"], resumen["con_error"]) == (1, 2)
+        assert [e["fila"] for e in resumen["errores"]] == [5, 7]
+
+        db_session.expire_all()
+        ana = db_session.get(Cliente, existente.id)
+        # Se completan y sobrescriben los datos del archivo; el teléfono guardado se conserva
+        assert (ana.nombre, ana.apellido, ana.cedula, ana.telefono) == ("Ana", "Gómez", "1094555", "3001234567")
+        assert (ana.email, ana.fecha_nacimiento, ana.notas) == ("ana@mail.com", date(1990, 3, 15), "Cliente antigua")
+        assert ana.cedula_normalizada == "1094555"
+
+        beto = db_session.query(Cliente).filter(Cliente.nombre == "Beto").one()
+        assert (beto.apellido, beto.email, beto.sede_id, beto.estado) == ("Ruiz", "beto@mail.com", 1, "activo")
+        assert beto.telefono_normalizado == "+573109876543"
+        assert beto.busqueda == "beto ruiz 3109876543 beto mail com"
+
+        # El índice de búsqueda en memoria se invalida al terminar
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "gomez")] == [ana.id]
+        assert [c.id for c in ClienteService.busqueda_rapida(db_session, 1, "310 987")] == [beto.id]
+
+    def test_xlsx_por_lotes(self, db_session):
+        """Prueba XLSX en modo read_only, progreso por lote y modo solo nuevos"""
+        db_session.add(Cliente(nombre="Existente", cedula="1000001", sede_id=2))
+        db_session.commit()
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(["nombre", "cedula", "telefono", "fecha_nacimiento", "es_colaborador"])
+        hoja.append(["Reemplazo", 1000001.0, None, None, None])
+        for n in range(2, 8):
+            hoja.append([f"Cliente {n}", 1000000.0 + n, 3000000000 + n, datetime(1990, 1, n), "Sí" if n == 2 else None])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+
+        progreso = list(ImportadorClientes.importar(
+            db_session, ArchivoClientes(archivo, "clientes.xlsx"), sede_id=1, actualizar=False, lote=3
+        ))
+        assert [p["filas"] for p in progreso] == [3, 6, 7]
+        assert [p["terminado"] for p in progreso] == [False, False, True]
+        assert (progreso[-1]["insertados"], progreso[-1]["omitidos"], progreso[-1]["con_error"]) == (6, 1, 0)
+
+        clientes = db_session.query(Cliente).order_by(Cliente.id).all()
+        assert clientes[0].nombre == "Existente"
+        assert (clientes[1].cedula, clientes[1].telefono) == ("1000002", "3000000002")
+        assert clientes[1].fecha_nacimiento == date(1990, 1, 2)
+        assert [c.es_colaborador for c in clientes[1:3]] == [True, False]
+
+    def test_archivo_invalido(self):
+        """Prueba que formato y encabezado se validan antes de importar"""
+        for contenido, nombre in ((b"nombre\nAna\n", "clientes.txt"), (b"telefono\n300\n", "clientes.csv"), (b"", "c.csv")):
+            try:
+                ArchivoClientes(io.BytesIO(contenido), nombre)
+            except ValueError:
+                continue
+            raise AssertionError(f"{nombre} debió rechazarse")
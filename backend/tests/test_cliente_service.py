@@ -0,0 +1,119 @@
+"""
+Pruebas del listado paginado de clientes
+"""
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from app.models.cliente import Cliente, ClienteEtiqueta, ClienteEtiquetaAsignacion
+from app.services.cliente_service import ClienteService
+
+
+def _recorrer(db_session, **kwargs):
+    """Ids de todas las páginas siguiendo siguiente_cursor"""
+    ids, cursor = [], None
+    while True:
+        pagina = ClienteService.get_all_paginado(db_session, 1, por_pagina=3, cursor=cursor, **kwargs)
+        ids += [c["id"] for c in pagina["items"]]
+        cursor = pagina["siguiente_cursor"]
+        if cursor is None:
+            return ids
+
+
+class TestListadoClientes:
+    """Pruebas de paginación por cursor y carga de etiquetas"""
+
+    @pytest.fixture
+    def clientes(self, db_session):
+        nombres = ["Ana", "Beto", "Ana", "Carla", "Diana", "Ana", "Elena", "Fabio"]
+        clientes = [
+            Cliente(
+                nombre=nombre, apellido=f"Test{n}", sede_id=1, estado="activo", total_visitas=n % 3,
+                ultima_visita=None if n % 4 == 0 else date(2026, 1, 1) + timedelta(days=n % 3)
+            )
+            for n, nombre in enumerate(nombres)
+        ]
+        db_session.add_all(clientes)
+        db_session.add(Cliente(nombre="Otra", sede_id=2, estado="activo"))
+        db_session.flush()
+        vip = ClienteEtiqueta(nombre="VIP", color="#ff0000")
+        nueva = ClienteEtiqueta(nombre="Nueva")
+        db_session.add_all([vip, nueva])
+        db_session.flush()
+        db_session.add_all([
+            ClienteEtiquetaAsignacion(cliente_id=clientes[0].id, etiqueta_id=vip.id),
+            ClienteEtiquetaAsignacion(cliente_id=clientes[0].id, etiqueta_id=nueva.id),
+            ClienteEtiquetaAsignacion(cliente_id=clientes[3].id, etiqueta_id=vip.id),
+        ])
+        db_session.commit()
+        return clientes
+
+    @pytest.mark.parametrize("ordenar_por,orden", [
+        ("nombre", "asc"), ("nombre", "desc"), ("ultima_visita", "asc"),
+        ("ultima_visita", "desc"), ("total_visitas", "desc"), ("total_gastado", "desc"),
+    ])
+    def test_cursor_recorre_igual_que_offset(self, db_session, clientes, ordenar_por, orden):
+        """Prueba que el cursor recorre todo sin repetir ni saltar, igual que las páginas"""
+        completa = ClienteService.get_all_paginado(
+            db_session, 1, por_pagina=100, ordenar_por=ordenar_por, orden=orden
+        )
+        esperado = [c["id"] for c in completa["items"]]
+        assert len(esperado) == len(clientes)
+        assert _recorrer(db_session, ordenar_por=ordenar_por, orden=orden) == esperado
+
+    @pytest.mark.parametrize("orden,operador,indice", [
+        ("asc", ">", "(sede_id, total_visitas, id)"),
+        ("desc", "<", "(sede_id, total_visitas DESC NULLS LAST, id DESC)"),
+    ])
+    def test_cursor_como_rango_del_indice(self, db_session, clientes, orden, operador, indice):
+        """Prueba que en Postgres el cursor es una comparación de filas en el orden de un índice"""
+        cursor = ClienteService.get_all_paginado(
+            db_session, 1, por_pagina=2, ordenar_por="total_visitas", orden=orden
+        )["siguiente_cursor"]
+        condicion, nulos_despues = ClienteService._despues_del_cursor(cursor, "total_visitas", orden)
+        consulta = select(Cliente.id).where(condicion).order_by(
+            *ClienteService._orden_keyset("total_visitas", orden == "desc")
+        )
+        sql = str(consulta.compile(dialect=postgresql.dialect()))
+        assert f"WHERE (clientes.total_visitas, clientes.id) {operador} (" in sql
+        assert " OR " not in sql
+        assert nulos_despues is True  # los NULL se leen aparte, al final
+
+        # El ORDER BY recorre un índice en su orden (el ascendente, hacia adelante)
+        direccion = orden.upper()
+        assert sql.endswith(f"ORDER BY clientes.total_visitas {direccion} NULLS LAST, clientes.id {direccion}")
+        ddl = [
+            str(CreateIndex(i).compile(dialect=postgresql.dialect()))
+            for i in Cliente.__table__.indexes if i.name.startswith("ix_clientes_sede_visitas")
+        ]
+        assert any(d.endswith(f"ON clientes {indice}") for d in ddl)
+
+    def test_pagina_con_consultas_constantes(self, db_session, db_engine, clientes):
+        """Prueba conteo + página + etiquetas de toda la página en tres consultas"""
+        consultas = []
+        contar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            pagina = ClienteService.get_all_paginado(db_session, 1, por_pagina=5)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+
+        assert len(consultas) == 3
+        assert pagina["total"] == 8
+        assert pagina["total_paginas"] == 2
+        etiquetas = {c["id"]: [e["nombre"] for e in c["etiquetas"]] for c in pagina["items"]}
+        assert etiquetas[clientes[0].id] == ["Nueva", "VIP"]
+
+        sin_conteo = ClienteService.get_all_paginado(db_session, 1, por_pagina=5, conteo="ninguno")
+        assert (sin_conteo["total"], sin_conteo["total_paginas"]) == (None, None)
+        # Sin Postgres la estimación cae al conteo exacto
+        assert ClienteService.get_all_paginado(db_session, 1, conteo="estimado")["total_estimado"] is False
+
+    def test_cursor_invalido(self, db_session, clientes):
+        """Prueba que un cursor ajeno al orden pedido o corrupto se rechaza"""
+        cursor = ClienteService.get_all_paginado(db_session, 1, por_pagina=2)["siguiente_cursor"]
+        with pytest.raises(ValueError):
+            ClienteService.get_all_paginado(db_session, 1, cursor=cursor, ordenar_por="apellido")
+        with pytest.raises(ValueError):
+            ClienteService.get_all_paginado(db_session, 1, cursor="no-es-un-cursor")
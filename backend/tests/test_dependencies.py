@@ -0,0 +1,152 @@
+"""
+Pruebas para las dependencias de autenticación (app.dependencies)
+"""
+import inspect
+import pytest
+from starlette.requests import Request
+from app.dependencies import get_current_user, get_current_active_user, require_permission
+
+
+def make_request():
+    """Request mínimo para invocar las dependencias directamente"""
+    return Request({"type": "http", "headers": []})
+
+
+class TestAuthDependencies:
+    """Pruebas para get_current_user y require_permission"""
+
+    def test_dependencies_are_sync(self):
+        """Las dependencias deben ser síncronas para ejecutarse en el threadpool"""
+        assert not inspect.iscoroutinefunction(get_current_user)
+        assert not inspect.iscoroutinefunction(get_current_active_user)
+        assert not inspect.iscoroutinefunction(require_permission("usuarios.leer"))
+
+    def test_require_permission_allows(self, db_session, admin_user, permissions):
+        """Prueba que require_permission permite con el permiso asignado"""
+        checker = require_permission("usuarios.leer")
+        result = checker(request=make_request(), current_user=admin_user, db=db_session)
+        assert result["user"].id == admin_user.id
+
+    def test_require_permission_denies(self, db_session, normal_user):
+        """Prueba que require_permission rechaza sin el permiso"""
+        from fastapi import HTTPException
+        checker = require_permission(["usuarios.crear", "usuarios.eliminar"])
+        with pytest.raises(HTTPException) as exc:
+            checker(request=make_request(), current_user=normal_user, db=db_session)
+        assert exc.value.status_code == 403
+
+
+class TestSessionCache:
+    """Pruebas del caché de sesiones validadas en get_current_user"""
+
+    def test_second_request_served_from_cache(self, client, admin_user, active_session, admin_headers):
+        """Prueba que la segunda petición no vuelve a validar la sesión en BD"""
+        from app.services.session_service import SessionService
+
+        assert client.get("/api/usuarios/me", headers=admin_headers).status_code == 200
+        response = client.get("/api/usuarios/me", headers=admin_headers)
+
+        assert response.status_code == 200
+        assert response.json()["username"] == "admin_test"
+        assert SessionService.get_cache_stats()["hits"] == 1
+
+    def test_logout_evicts_cached_session(self, client, admin_user, active_session, admin_headers):
+        """Prueba que tras logout el token cacheado deja de ser válido"""
+        assert client.get("/api/usuarios/me", headers=admin_headers).status_code == 200
+        assert client.post("/api/auth/logout", headers=admin_headers).status_code == 200
+
+        response = client.get("/api/usuarios/me", headers=admin_headers)
+        assert response.status_code == 401
+
+    def test_deactivation_evicts_cached_session(self, db_session, admin_user, active_session, admin_token):
+        """Prueba que desactivar al usuario invalida sus sesiones cacheadas"""
+        from fastapi import HTTPException
+        from app.services.session_service import SessionService
+
+        assert get_current_user(request=make_request(), token=admin_token, db=db_session).id == admin_user.id
+
+        admin_user.estado = "inactivo"
+        db_session.commit()
+        SessionService.forget_user(admin_user.id)
+
+        with pytest.raises(HTTPException) as exc:
+            get_current_user(request=make_request(), token=admin_token, db=db_session)
+        assert exc.value.status_code == 403
+
+    def test_local_role_split_evicts_cached_sessions(self, db_session, normal_user, user_role, user_token):
+        """Prueba que al crear la copia local de un rol global sus usuarios resuelven el rol nuevo"""
+        from datetime import datetime, timedelta
+        from app.models.auth import Sesion
+        from app.routers.roles import ensure_local_role
+
+        normal_user.sede_id = 1
+        db_session.add(Sesion(
+            usuario_id=normal_user.id,
+            token=user_token,
+            fecha_expiracion=datetime.utcnow() + timedelta(minutes=15)
+        ))
+        db_session.commit()
+        get_current_user(request=make_request(), token=user_token, db=db_session)
+
+        local_rol = ensure_local_role(db_session, user_role, 1)
+        assert local_rol.id != user_role.id
+
+        request = make_request()
+        user = get_current_user(request=request, token=user_token, db=db_session)
+        assert user.rol_id == local_rol.id
+        assert request.state.principal.rol_id == local_rol.id
+
+
+class TestPrincipal:
+    """Pruebas de la resolución del Principal"""
+
+    def test_principal_exposed_on_request(self, db_session, admin_user, active_session, admin_token):
+        """Prueba que get_current_user deja un Principal inmutable con permisos y sede"""
+        from dataclasses import FrozenInstanceError
+
+        request = make_request()
+        user = get_current_user(request=request, token=admin_token, db=db_session)
+        principal = request.state.principal
+
+        assert principal.usuario_id == user.id
+        assert principal.rol_id == admin_user.rol_id
+        assert principal.sede_id == admin_user.sede_id
+        assert principal.has_permission("usuarios.crear")
+        with pytest.raises(FrozenInstanceError):
+            principal.rol_id = 99
+
+    def test_principal_resolved_in_single_query(self, db_session, db_engine, admin_user, active_session, admin_token):
+        """Prueba que en frío la sesión, el usuario y los permisos salen de una consulta"""
+        from sqlalchemy import event
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db_engine, "before_cursor_execute", listener)
+        try:
+            db_session.expunge_all()
+            request = make_request()
+            user = get_current_user(request=request, token=admin_token, db=db_session)
+            require_permission("usuarios.leer")(request=request, current_user=user, db=db_session)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+
+    def test_permission_checker_uses_principal(self, db_session, normal_user, user_token):
+        """Prueba que require_permission usa los permisos del Principal de la petición"""
+        from datetime import datetime, timedelta
+        from fastapi import HTTPException
+        from app.models.auth import Sesion
+
+        db_session.add(Sesion(
+            usuario_id=normal_user.id,
+            token=user_token,
+            fecha_expiracion=datetime.utcnow() + timedelta(minutes=15)
+        ))
+        db_session.commit()
+
+        request = make_request()
+        user = get_current_user(request=request, token=user_token, db=db_session)
+        with pytest.raises(HTTPException) as exc:
+            require_permission("usuarios.leer")(request=request, current_user=user, db=db_session)
+        assert exc.value.status_code == 403
@@ -0,0 +1,569 @@
+"""
+Pruebas del motor de disponibilidad (AgendaBitmap) y DisponibilidadService
+"""
+import pytest
+from fastapi import HTTPException
+from datetime import date, time
+from app.models.especialista import Especialista, HorarioEspecialista, BloqueoEspecialista
+from app.models.cita import Cita
+from app.models.cliente import Cliente
+from app.models.servicio import Servicio
+from app.services.agenda_bitmap import AgendaBitmap, ReglasBloqueo
+from app.services.disponibilidad_service import DisponibilidadService
+
+LUNES = date(2026, 3, 2)  # dia_semana app = 1
+
+
+def _slots_por_hora(slots):
+    return {s.hora_inicio.strftime("%H:%M"): s.disponible for s in slots}
+
+
+class TestAgendaBitmap:
+    """Pruebas unitarias del mapa de bits por minuto"""
+
+    def test_slots_respect_bloqueos_and_citas(self):
+        """Prueba que bloqueos y citas activas marcan los slots como no disponibles"""
+        horarios = [HorarioEspecialista(dia_semana=1, hora_inicio=time(9, 0), hora_fin=time(12, 0), activo=True)]
+        bloqueos = [BloqueoEspecialista(
+            fecha_inicio=LUNES, fecha_fin=LUNES,
+            hora_inicio=time(10, 0), hora_fin=time(10, 30), es_recurrente=False
+        )]
+        citas = [
+            Cita(fecha=LUNES, hora_inicio=time(11, 0), hora_fin=time(11, 30), estado="agendada"),
+            Cita(fecha=LUNES, hora_inicio=time(9, 0), hora_fin=time(9, 30), estado="cancelada"),
+        ]
+
+        agenda = AgendaBitmap.construir(LUNES, LUNES, horarios, bloqueos, citas)
+        slots = _slots_por_hora(agenda.slots(30, 15))
+
+        assert slots["09:00"] is True       # la cita cancelada no ocupa
+        assert slots["09:30"] is True
+        assert slots["09:45"] is False      # termina dentro del bloqueo
+        assert slots["10:15"] is False
+        assert slots["10:30"] is True
+        assert slots["10:45"] is False      # choca con la cita de las 11:00
+        assert slots["11:30"] is True
+        assert "11:45" not in slots         # no cabe antes del cierre
+
+    def test_recurring_bloqueo_only_on_its_weekdays(self):
+        """Prueba que un bloqueo recurrente solo aplica en sus días de semana"""
+        horarios = [
+            HorarioEspecialista(dia_semana=d, hora_inicio=time(9, 0), hora_fin=time(10, 0), activo=True)
+            for d in (1, 2)
+        ]
+        bloqueos = [BloqueoEspecialista(
+            fecha_inicio=LUNES, fecha_fin=date(2026, 3, 31),
+            es_recurrente=True, dias_semana=[2]
+        )]
+
+        agenda = AgendaBitmap.construir(LUNES, date(2026, 3, 3), horarios, bloqueos)
+        slots = agenda.slots(60, 15)
+
+        assert [(s.fecha, s.disponible) for s in slots] == [
+            (LUNES, True),
+            (date(2026, 3, 3), False),
+        ]
+
+
+class TestReglasBloqueo:
+    """Pruebas de los bloqueos compilados por día de semana y por fecha"""
+
+    def test_reglas_coinciden_con_recorrido_lineal(self):
+        """Prueba que las reglas compiladas dan el mismo resultado que revisar bloqueo por bloqueo"""
+        import random
+        from datetime import timedelta
+
+        def bloqueado_lineal(fecha, inicio, fin, bloqueos):
+            for b in bloqueos:
+                if not (b.fecha_inicio <= fecha <= b.fecha_fin):
+                    continue
+                if b.es_recurrente and b.dias_semana and (fecha.weekday() + 1) % 7 not in b.dias_semana:
+                    continue
+                if not (b.hora_inicio and b.hora_fin) or not (fin <= b.hora_inicio or b.hora_fin <= inicio):
+                    return True
+            return False
+
+        rng = random.Random(7)
+        bloqueos = []
+        for _ in range(60):
+            desde = LUNES + timedelta(days=rng.randint(-20, 20))
+            hora = rng.randint(6, 20)
+            bloqueos.append(BloqueoEspecialista(
+                fecha_inicio=desde, fecha_fin=desde + timedelta(days=rng.randint(0, 40)),
+                hora_inicio=None if rng.random() < 0.1 else time(hora, rng.choice((0, 30))),
+                hora_fin=None if rng.random() < 0.1 else time(hora + 1, rng.choice((0, 30))),
+                es_recurrente=rng.random() < 0.5,
+                dias_semana=rng.sample(range(7), rng.randint(1, 3))
+            ))
+
+        fecha_fin = LUNES + timedelta(days=13)
+        reglas = ReglasBloqueo(bloqueos, LUNES, fecha_fin)
+        for d in range(14):
+            fecha = LUNES + timedelta(days=d)
+            for h in range(6, 22):
+                for m in (0, 20, 40):
+                    inicio, fin = time(h, m), time(h, m + 19)
+                    assert reglas.bloquea(fecha, inicio, fin) == bloqueado_lineal(fecha, inicio, fin, bloqueos)
+
+    def test_intervalos_fusionados(self):
+        """Prueba que los intervalos del día se unen y ordenan"""
+        bloqueos = [
+            BloqueoEspecialista(
+                fecha_inicio=LUNES, fecha_fin=date(2026, 6, 30), hora_inicio=time(12, 0),
+                hora_fin=time(13, 0), es_recurrente=True, dias_semana=[1]
+            ),
+            BloqueoEspecialista(
+                fecha_inicio=LUNES, fecha_fin=LUNES, hora_inicio=time(12, 30),
+                hora_fin=time(14, 0), es_recurrente=False
+            ),
+            BloqueoEspecialista(
+                fecha_inicio=LUNES, fecha_fin=LUNES, hora_inicio=time(8, 0),
+                hora_fin=time(9, 0), es_recurrente=False
+            ),
+        ]
+        reglas = ReglasBloqueo(bloqueos, LUNES, date(2026, 3, 9))
+
+        assert reglas.intervalos(LUNES) == [(480, 540), (720, 840)]
+        assert reglas.intervalos(date(2026, 3, 9)) == [(720, 780)]
+        assert reglas.intervalos(date(2026, 3, 3)) == []
+        with pytest.raises(ValueError):
+            reglas.bloquea(date(2026, 3, 10), time(12, 0), time(12, 30))
+
+
+class TestDisponibilidadService:
+    """Pruebas de integración de la disponibilidad con la BD"""
+
+    def test_disponibilidad_excluye_citas(self, db_session):
+        """Prueba que las citas existentes ocupan los slots del especialista"""
+        esp = Especialista(nombre="Ana", apellido="Test", estado="activo")
+        svc = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=100000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        db_session.add_all([esp, svc, cliente])
+        db_session.flush()
+        db_session.add(HorarioEspecialista(
+            especialista_id=esp.id, dia_semana=1,
+            hora_inicio=time(9, 0), hora_fin=time(12, 0), activo=True
+        ))
+        db_session.add(Cita(
+            cliente_id=cliente.id, especialista_id=esp.id, servicio_id=svc.id,
+            fecha=LUNES, hora_inicio=time(10, 0), hora_fin=time(11, 0),
+            duracion_minutos=60, estado="confirmada"
+        ))
+        db_session.commit()
+
+        respuesta = DisponibilidadService.get_disponibilidad_especialista(
+            db_session, esp.id, svc.id, LUNES, LUNES
+        )
+        slots = _slots_por_hora(respuesta.slots)
+
+        assert slots["09:00"] is True
+        assert slots["09:15"] is False
+        assert slots["10:45"] is False
+        assert slots["11:00"] is True
+        assert all(s.hora_fin == time(s.hora_inicio.hour + 1, s.hora_inicio.minute) for s in respuesta.slots)
+
+    def test_disponibilidad_general_consultas_constantes(self, db_session, db_engine):
+        """Prueba que la disponibilidad general usa las mismas consultas con 2 o con 6 especialistas"""
+        from sqlalchemy import event
+        from app.models.especialista import EspecialistaServicio
+
+        svc = Servicio(nombre="Corte", duracion_minutos=30, precio_base=30000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        db_session.add_all([svc, cliente])
+        db_session.flush()
+
+        def agregar_especialistas(cantidad):
+            for n in range(cantidad):
+                esp = Especialista(nombre=f"Esp{n}", apellido="Test", estado="activo")
+                db_session.add(esp)
+                db_session.flush()
+                db_session.add(EspecialistaServicio(
+                    especialista_id=esp.id, servicio_id=svc.id,
+                    tipo_comision="porcentaje", valor_comision=40
+                ))
+                db_session.add(HorarioEspecialista(
+                    especialista_id=esp.id, dia_semana=1,
+                    hora_inicio=time(9, 0), hora_fin=time(10, 0), activo=True
+                ))
+                db_session.add(Cita(
+                    cliente_id=cliente.id, especialista_id=esp.id, servicio_id=svc.id,
+                    fecha=LUNES, hora_inicio=time(9, 0), hora_fin=time(9, 30),
+                    duracion_minutos=30, estado="agendada"
+                ))
+            db_session.commit()
+
+        def contar_consultas():
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db_engine, "before_cursor_execute", listener)
+            try:
+                respuesta = DisponibilidadService.get_disponibilidad_general(db_session, svc.id, LUNES, LUNES)
+            finally:
+                event.remove(db_engine, "before_cursor_execute", listener)
+            return respuesta, len(statements)
+
+        agregar_especialistas(2)
+        _, consultas_pocos = contar_consultas()
+        agregar_especialistas(4)
+        respuesta, consultas_muchos = contar_consultas()
+
+        assert consultas_muchos == consultas_pocos
+        assert len(respuesta) == 6
+        for disponibilidad in respuesta:
+            slots = _slots_por_hora(disponibilidad.slots)
+            assert slots["09:00"] is False
+            assert slots["09:15"] is False
+            assert slots["09:30"] is True
+
+    def test_libres_en_horario_una_consulta(self, db_session, db_engine):
+        """Prueba que el estado de toda la sede sale de una consulta con los flags correctos"""
+        from sqlalchemy import event
+
+        svc = Servicio(nombre="Manicure", duracion_minutos=30, precio_base=20000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        libre = Especialista(nombre="Libre", apellido="Test", estado="activo", sede_id=1)
+        ocupada = Especialista(nombre="Ocupada", apellido="Test", estado="activo", sede_id=1)
+        bloqueada = Especialista(nombre="Bloqueada", apellido="Test", estado="activo", sede_id=1)
+        fuera = Especialista(nombre="Fuera", apellido="Test", estado="activo", sede_id=1)
+        otra_sede = Especialista(nombre="Otra", apellido="Sede", estado="activo", sede_id=2)
+        db_session.add_all([svc, cliente, libre, ocupada, bloqueada, fuera, otra_sede])
+        db_session.flush()
+
+        for esp in (libre, ocupada, bloqueada, otra_sede):
+            db_session.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=1,
+                hora_inicio=time(9, 0), hora_fin=time(18, 0), activo=True
+            ))
+        db_session.add(Cita(
+            cliente_id=cliente.id, especialista_id=ocupada.id, servicio_id=svc.id,
+            fecha=LUNES, hora_inicio=time(10, 0), hora_fin=time(11, 0),
+            duracion_minutos=60, estado="agendada"
+        ))
+        # Dos bloqueos vigentes en la fecha: solo el recurrente de los lunes aplica a la hora
+        db_session.add_all([
+            BloqueoEspecialista(
+                especialista_id=bloqueada.id, fecha_inicio=LUNES, fecha_fin=date(2026, 3, 31),
+                hora_inicio=time(10, 0), hora_fin=time(12, 0), es_recurrente=True, dias_semana=[1]
+            ),
+            BloqueoEspecialista(
+                especialista_id=bloqueada.id, fecha_inicio=LUNES, fecha_fin=LUNES,
+                hora_inicio=time(15, 0), hora_fin=time(16, 0), es_recurrente=False
+            ),
+        ])
+        db_session.commit()
+        db_session.expunge_all()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db_engine, "before_cursor_execute", listener)
+        try:
+            resultado = DisponibilidadService.get_especialistas_libres_horario(
+                db_session, sede_id=1, fecha=LUNES, hora=time(10, 30)
+            )
+        finally:
+            event.remove(db_engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        por_nombre = {r["nombre_completo"]: r for r in resultado}
+        assert set(por_nombre) == {"Libre Test", "Ocupada Test", "Bloqueada Test", "Fuera Test"}
+        assert por_nombre["Libre Test"]["disponible"] is True
+        assert por_nombre["Ocupada Test"]["tiene_cita"] is True
+        assert por_nombre["Bloqueada Test"]["tiene_bloqueo"] is True
+        assert por_nombre["Bloqueada Test"]["tiene_cita"] is False
+        assert por_nombre["Fuera Test"]["esta_en_horario"] is False
+
+        solo_libres = DisponibilidadService.get_especialistas_libres_horario(
+            db_session, sede_id=1, fecha=LUNES, hora=time(10, 30), solo_disponibles=True
+        )
+        assert [r["nombre_completo"] for r in solo_libres] == ["Libre Test"]
+
+    def test_primeros_disponibles_en_orden(self, db_session):
+        """Prueba que se devuelven los primeros inicios libres entre especialistas, en orden"""
+        svc = Servicio(nombre="Keratina", duracion_minutos=60, precio_base=80000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        ana = Especialista(nombre="Ana", apellido="Test", estado="activo", sede_id=1)
+        luz = Especialista(nombre="Luz", apellido="Test", estado="activo", sede_id=1)
+        db_session.add_all([svc, cliente, ana, luz])
+        db_session.flush()
+
+        for esp in (ana, luz):
+            db_session.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=1,
+                hora_inicio=time(9, 0), hora_fin=time(12, 0), activo=True
+            ))
+        # Ana ocupada de 9:00 a 10:30; Luz bloqueada toda la mañana del lunes
+        db_session.add(Cita(
+            cliente_id=cliente.id, especialista_id=ana.id, servicio_id=svc.id,
+            fecha=LUNES, hora_inicio=time(9, 0), hora_fin=time(10, 30),
+            duracion_minutos=90, estado="agendada"
+        ))
+        db_session.add(BloqueoEspecialista(
+            especialista_id=luz.id, fecha_inicio=LUNES, fecha_fin=LUNES, es_recurrente=False
+        ))
+        db_session.commit()
+
+        primeros = DisponibilidadService.buscar_primeros_disponibles(
+            db_session, sede_id=1, servicio_id=svc.id, fecha_inicio=LUNES, limite=3
+        )
+        assert [(p.nombre_completo, p.fecha, p.hora_inicio) for p in primeros] == [
+            ("Ana Test", LUNES, time(10, 30)),
+            ("Ana Test", LUNES, time(10, 45)),
+            ("Ana Test", LUNES, time(11, 0)),
+        ]
+        assert primeros[0].hora_fin == time(11, 30)
+
+        # La semana siguiente Luz está libre: con preferencia solo aparece ella
+        preferida = DisponibilidadService.buscar_primeros_disponibles(
+            db_session, sede_id=1, servicio_id=svc.id, fecha_inicio=LUNES,
+            fecha_fin=date(2026, 3, 9), especialista_id=luz.id, hora_desde=time(10, 0), limite=1
+        )
+        assert [(p.especialista_id, p.fecha, p.hora_inicio) for p in preferida] == [
+            (luz.id, date(2026, 3, 9), time(9, 0))
+        ]
+
+    def test_preferido_sin_el_servicio(self, db_session):
+        """Prueba que un especialista preferido que no atiende el servicio no tiene inicios"""
+        from app.models.especialista import EspecialistaServicio
+
+        svc = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=90000)
+        ana = Especialista(nombre="Ana", apellido="Test", estado="activo", sede_id=1)
+        beto = Especialista(nombre="Beto", apellido="Test", estado="activo", sede_id=1)
+        db_session.add_all([svc, ana, beto])
+        db_session.flush()
+        for esp in (ana, beto):
+            db_session.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=1,
+                hora_inicio=time(9, 0), hora_fin=time(12, 0), activo=True
+            ))
+        db_session.add(EspecialistaServicio(
+            especialista_id=ana.id, servicio_id=svc.id, tipo_comision="porcentaje", valor_comision=40
+        ))
+        db_session.commit()
+
+        assert DisponibilidadService.buscar_primeros_disponibles(
+            db_session, sede_id=1, servicio_id=svc.id, fecha_inicio=LUNES, especialista_id=beto.id
+        ) == []
+        preferida = DisponibilidadService.buscar_primeros_disponibles(
+            db_session, sede_id=1, servicio_id=svc.id, fecha_inicio=LUNES, especialista_id=ana.id, limite=1
+        )
+        assert [(p.especialista_id, p.hora_inicio) for p in preferida] == [(ana.id, time(9, 0))]
+
+    def test_asignacion_por_menor_carga(self, db_session):
+        """Prueba que se asigna al especialista libre con menos carga y con el servicio"""
+        from app.models.especialista import EspecialistaServicio
+
+        svc = Servicio(nombre="Lavado", duracion_minutos=30, precio_base=20000)
+        otro = Servicio(nombre="Color", duracion_minutos=30, precio_base=20000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        ana, luz, eva, sol = (
+            Especialista(nombre=n, apellido="Test", estado="activo", sede_id=1)
+            for n in ("Ana", "Luz", "Eva", "Sol")
+        )
+        db_session.add_all([svc, otro, cliente, ana, luz, eva, sol])
+        db_session.flush()
+        for esp in (ana, luz, eva, sol):
+            db_session.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=1,
+                hora_inicio=time(9, 0), hora_fin=time(17, 0), activo=True
+            ))
+        # Sol no atiende el servicio; las demás sí
+        for esp in (ana, luz, eva):
+            db_session.add(EspecialistaServicio(
+                especialista_id=esp.id, servicio_id=svc.id, tipo_comision="porcentaje", valor_comision=40
+            ))
+        db_session.add(EspecialistaServicio(
+            especialista_id=sol.id, servicio_id=otro.id, tipo_comision="porcentaje", valor_comision=40
+        ))
+
+        def cita(esp, hora, minutos):
+            fin = time(hora + minutos // 60, minutos % 60)
+            db_session.add(Cita(
+                cliente_id=cliente.id, especialista_id=esp.id, servicio_id=svc.id, fecha=LUNES,
+                hora_inicio=time(hora, 0), hora_fin=fin, duracion_minutos=minutos, estado="agendada"
+            ))
+        cita(ana, 9, 60)    # Ana: 120 min reservados, ocupada a las 9:00
+        cita(ana, 11, 60)
+        cita(luz, 13, 60)   # Luz: 60 min, ocupada a las 13:30
+        cita(eva, 14, 90)   # Eva: 90 min
+        db_session.commit()
+
+        candidatos = DisponibilidadService.candidatos_asignacion(
+            db_session, sede_id=1, servicio_id=svc.id, fecha=LUNES, hora_inicio=time(9, 0)
+        )
+        assert candidatos == [luz.id, eva.id]
+
+        # Con Luz ocupada a esa hora, Eva tiene menos carga que Ana
+        assert DisponibilidadService.candidatos_asignacion(
+            db_session, sede_id=1, servicio_id=svc.id, fecha=LUNES, hora_inicio=time(13, 30)
+        ) == [eva.id, ana.id]
+
+    def test_combos_encadenan_servicios(self, db_session):
+        """Prueba la búsqueda de secuencias de servicios entre especialistas calificados"""
+        from app.models.especialista import EspecialistaServicio
+
+        alisado = Servicio(nombre="Alisado", duracion_minutos=60, precio_base=100000)
+        lavado = Servicio(nombre="Lavado", duracion_minutos=30, precio_base=20000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        ana = Especialista(nombre="Ana", apellido="Test", estado="activo", sede_id=1)
+        luz = Especialista(nombre="Luz", apellido="Test", estado="activo", sede_id=1)
+        db_session.add_all([alisado, lavado, cliente, ana, luz])
+        db_session.flush()
+        for esp in (ana, luz):
+            db_session.add(HorarioEspecialista(
+                especialista_id=esp.id, dia_semana=1,
+                hora_inicio=time(9, 0), hora_fin=time(12, 0), activo=True
+            ))
+        # Solo Ana hace alisados; ambas lavan
+        for esp, svc in ((ana, alisado), (ana, lavado), (luz, lavado)):
+            db_session.add(EspecialistaServicio(
+                especialista_id=esp.id, servicio_id=svc.id, tipo_comision="porcentaje", valor_comision=40
+            ))
+        db_session.add(Cita(
+            cliente_id=cliente.id, especialista_id=ana.id, servicio_id=lavado.id, fecha=LUNES,
+            hora_inicio=time(10, 0), hora_fin=time(10, 30), duracion_minutos=30, estado="agendada"
+        ))
+        db_session.commit()
+
+        def resumen(combos):
+            return [
+                (c.hora_inicio, c.espera_minutos, [(p.especialista_id, p.hora_inicio) for p in c.pasos])
+                for c in combos
+            ]
+
+        combos = DisponibilidadService.buscar_combos(
+            db_session, sede_id=1, servicio_ids=[alisado.id, lavado.id],
+            fecha_inicio=LUNES, fecha_fin=LUNES, max_espera_minutos=0, limite=2
+        )
+        # 9:00 con Luz lavando a las 10:00; 10:30 con Ana en ambos servicios
+        assert resumen(combos) == [
+            (time(9, 0), 0, [(ana.id, time(9, 0)), (luz.id, time(10, 0))]),
+            (time(10, 30), 0, [(ana.id, time(10, 30)), (ana.id, time(11, 30))]),
+        ]
+        assert combos[0].hora_fin == time(10, 30)
+
+        # Con Luz también ocupada a las 10:00 hace falta esperar a que Ana termine
+        db_session.add(Cita(
+            cliente_id=cliente.id, especialista_id=luz.id, servicio_id=lavado.id, fecha=LUNES,
+            hora_inicio=time(10, 0), hora_fin=time(10, 30), duracion_minutos=30, estado="agendada"
+        ))
+        db_session.commit()
+        DisponibilidadService.invalidar_agenda(luz.id, LUNES)
+
+        sin_espera = DisponibilidadService.buscar_combos(
+            db_session, sede_id=1, servicio_ids=[alisado.id, lavado.id],
+            fecha_inicio=LUNES, fecha_fin=LUNES, max_espera_minutos=15, limite=1
+        )
+        assert sin_espera[0].hora_inicio == time(10, 30)
+        con_espera = DisponibilidadService.buscar_combos(
+            db_session, sede_id=1, servicio_ids=[alisado.id, lavado.id],
+            fecha_inicio=LUNES, fecha_fin=LUNES, max_espera_minutos=30, limite=1
+        )
+        assert resumen(con_espera) == [(time(9, 0), 30, [(ana.id, time(9, 0)), (ana.id, time(10, 30))])]
+
+
+class TestCalendarioEspecialistas:
+    """Pruebas de la carga inicial del calendario por rango de fechas"""
+
+    def test_calendario_acotado_al_rango(self, db_session, db_engine):
+        """Prueba que solo viajan horarios y bloqueos del rango, con recurrentes expandidos"""
+        from datetime import timedelta
+        from sqlalchemy import event
+        from app.services.especialista_service import EspecialistaService
+
+        ana = Especialista(nombre="Ana", apellido="Test", estado="activo", sede_id=1)
+        otra_sede = Especialista(nombre="Eva", apellido="Test", estado="activo", sede_id=2)
+        db_session.add_all([ana, otra_sede])
+        db_session.flush()
+        db_session.add_all([
+            HorarioEspecialista(especialista_id=ana.id, dia_semana=1, hora_inicio=time(9), hora_fin=time(18), activo=True),
+            HorarioEspecialista(especialista_id=ana.id, dia_semana=3, hora_inicio=time(9), hora_fin=time(18), activo=True),
+            HorarioEspecialista(especialista_id=ana.id, dia_semana=2, hora_inicio=time(9), hora_fin=time(18), activo=False),
+            # Historial que no debe viajar
+            *[
+                BloqueoEspecialista(especialista_id=ana.id, fecha_inicio=LUNES - timedelta(days=7 * n),
+                                    fecha_fin=LUNES - timedelta(days=7 * n), motivo="Pasado")
+                for n in range(1, 30)
+            ],
+            BloqueoEspecialista(
+                especialista_id=ana.id, fecha_inicio=date(2026, 1, 1), fecha_fin=date(2026, 12, 31),
+                hora_inicio=time(13), hora_fin=time(14), es_recurrente=True, dias_semana=[1, 3], motivo="Almuerzo"
+            ),
+            BloqueoEspecialista(especialista_id=ana.id, fecha_inicio=LUNES + timedelta(days=1),
+                                fecha_fin=LUNES + timedelta(days=1), motivo="Cita médica"),
+        ])
+        db_session.commit()
+
+        consultas = []
+        contar = lambda *a: consultas.append(1)
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            calendario, etag = EspecialistaService.get_calendario(db_session, 1, LUNES, LUNES + timedelta(days=1))
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+
+        assert len(consultas) == 3
+        assert [e.id for e in calendario] == [ana.id]
+        esp = calendario[0]
+        assert [h.dia_semana for h in esp.horarios] == [1]
+        assert sorted(b.motivo for b in esp.bloqueos) == ["Almuerzo", "Cita médica"]
+        assert [(d.fecha, d.hora_inicio, d.motivo) for d in esp.bloqueos_dia] == [
+            (LUNES, time(13), "Almuerzo"),
+            (LUNES + timedelta(days=1), None, "Cita médica"),
+        ]
+
+        assert EspecialistaService.get_calendario(db_session, 1, LUNES, LUNES + timedelta(days=1))[1] == etag
+        db_session.add(BloqueoEspecialista(especialista_id=ana.id, fecha_inicio=LUNES, fecha_fin=LUNES))
+        db_session.commit()
+        assert EspecialistaService.get_calendario(db_session, 1, LUNES, LUNES + timedelta(days=1))[1] != etag
+
+        with pytest.raises(HTTPException):
+            EspecialistaService.get_calendario(db_session, 1, LUNES, LUNES + timedelta(days=60))
+
+
+class TestDisponibilidadCache:
+    """Pruebas del caché de días de agenda y su invalidación por escrituras"""
+
+    def test_cache_se_invalida_con_citas_y_bloqueos(self, db_session):
+        """Prueba que el segundo cálculo sale del caché y que las escrituras lo invalidan"""
+        from app.schemas.especialista import BloqueoEspecialistaCreate
+        from app.services.bloqueo_service import BloqueoService
+        from app.services.cita_service import CitaService
+
+        esp = Especialista(nombre="Ana", apellido="Test", estado="activo")
+        svc = Servicio(nombre="Corte", duracion_minutos=30, precio_base=30000)
+        cliente = Cliente(nombre="Cliente", apellido="Test")
+        db_session.add_all([esp, svc, cliente])
+        db_session.flush()
+        db_session.add(HorarioEspecialista(
+            especialista_id=esp.id, dia_semana=1,
+            hora_inicio=time(9, 0), hora_fin=time(11, 0), activo=True
+        ))
+        cita = Cita(
+            cliente_id=cliente.id, especialista_id=esp.id, servicio_id=svc.id,
+            fecha=LUNES, hora_inicio=time(9, 0), hora_fin=time(9, 30),
+            duracion_minutos=30, estado="agendada"
+        )
+        db_session.add(cita)
+        db_session.commit()
+
+        def consultar():
+            return _slots_por_hora(DisponibilidadService.get_disponibilidad_especialista(
+                db_session, esp.id, svc.id, LUNES, LUNES
+            ).slots)
+
+        assert consultar()["09:00"] is False
+        assert consultar()["09:00"] is False
+        stats = DisponibilidadService.get_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["loads"] == 1
+
+        CitaService.cambiar_estado(db_session, cita.id, "cancelada")
+        assert consultar()["09:00"] is True
+
+        BloqueoService.create(db_session, esp.id, BloqueoEspecialistaCreate(
+            fecha_inicio=LUNES, fecha_fin=LUNES, hora_inicio=time(10, 0), hora_fin=time(11, 0)
+        ))
+        slots = consultar()
+        assert slots["09:00"] is True
+        assert slots["10:00"] is False
+        assert DisponibilidadService.get_cache_stats()["loads"] == 3
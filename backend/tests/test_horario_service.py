@@ -0,0 +1,89 @@
+"""
+Pruebas de los horarios semanales de especialistas
+"""
+import pytest
+from datetime import time
+from fastapi import HTTPException
+from sqlalchemy import event
+from app.models.especialista import Especialista, HorarioEspecialista
+from app.schemas.especialista import HorarioEspecialistaCreate
+from app.services.horario_service import HorarioService
+
+
+def _horario(dia, inicio, fin):
+    return HorarioEspecialistaCreate(dia_semana=dia, hora_inicio=time(inicio), hora_fin=time(fin))
+
+
+SEMANA = [_horario(dia, 8, 12) for dia in range(6)] + [_horario(dia, 14, 18) for dia in range(5)]
+
+
+class TestBarridoSolapamiento:
+    """Pruebas de la validación por barrido"""
+
+    def test_primer_solapamiento(self):
+        """Prueba que se detecta el día en conflicto sin importar el orden de entrada"""
+        assert HorarioService._primer_solapamiento([
+            (1, time(14), time(18)), (0, time(8), time(12)), (1, time(8), time(12)), (0, time(12), time(13))
+        ]) is None
+        assert HorarioService._primer_solapamiento([
+            (2, time(8), time(18)), (0, time(8), time(12)), (2, time(12), time(14))
+        ]) == 2
+        # Un intervalo largo que contiene a otros que no se tocan entre sí
+        assert HorarioService._primer_solapamiento([
+            (3, time(8), time(18)), (3, time(9), time(10)), (3, time(16), time(17))
+        ]) == 3
+
+
+class TestHorarioService:
+    """Pruebas de guardado por semana y por plantilla"""
+
+    def test_create_batch_reemplaza(self, db_session):
+        """Prueba que el guardado semanal reemplaza los horarios y rechaza solapes"""
+        especialista = Especialista(nombre="Ana", apellido="Test", estado="activo")
+        db_session.add(especialista)
+        db_session.commit()
+
+        HorarioService.create_batch(db_session, especialista.id, [_horario(0, 9, 10)])
+        guardados = HorarioService.create_batch(db_session, especialista.id, SEMANA)
+        assert len(guardados) == len(SEMANA)
+        assert (guardados[0].dia_semana, guardados[0].hora_inicio) == (0, time(8))
+
+        with pytest.raises(HTTPException) as exc:
+            HorarioService.create_batch(db_session, especialista.id, SEMANA + [_horario(4, 11, 15)])
+        assert exc.value.detail == "Horarios solapados en día 4"
+        assert len(HorarioService.get_by_especialista(db_session, especialista.id)) == len(SEMANA)
+
+        with pytest.raises(HTTPException):
+            HorarioService.create(db_session, especialista.id, _horario(2, 17, 19))
+        assert HorarioService.create(db_session, especialista.id, _horario(2, 18, 19)).id
+
+    def test_plantilla_un_insert(self, db_session, db_engine):
+        """Prueba que la plantilla se aplica a todos los especialistas con un solo INSERT"""
+        especialistas = [Especialista(nombre=f"Esp{n}", apellido="Test", estado="activo") for n in range(20)]
+        db_session.add_all(especialistas)
+        db_session.flush()
+        db_session.add(HorarioEspecialista(
+            especialista_id=especialistas[0].id, dia_semana=6, hora_inicio=time(8), hora_fin=time(9)
+        ))
+        db_session.commit()
+        ids = [e.id for e in especialistas]
+
+        sentencias = []
+        contar = lambda conn, cursor, sql, *a: sentencias.append(sql.split()[0].upper())
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            creados = HorarioService.aplicar_plantilla(db_session, ids, SEMANA)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+
+        assert creados == len(ids) * len(SEMANA)
+        assert sentencias.count("INSERT") == 1
+        assert sentencias.count("DELETE") == 1
+        assert db_session.query(HorarioEspecialista).count() == creados
+        assert not any(
+            h.dia_semana == 6 for h in HorarioService.get_by_especialista(db_session, ids[0])
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            HorarioService.aplicar_plantilla(db_session, [ids[0], 9999], SEMANA)
+        assert exc.value.status_code == 404
@@ -117,3 +117,27 @@ class TestPermissionService:
             RolPermiso.rol_id == admin_role.id
         ).all()
         assert len(assigned) == 2
+    
+    def test_role_permissions_cached(self, db_session, admin_user, permissions):
+        """Prueba que la segunda consulta de permisos del rol sale del caché"""
+        first = PermissionService.get_role_permission_codes(db_session, admin_user.rol_id)
+        second = PermissionService.get_role_permission_codes(db_session, admin_user.rol_id)
+        
+        assert isinstance(first, frozenset)
+        assert first is second
+        stats = PermissionService.get_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+    
+    def test_assign_permissions_invalidates_cache(self, db_session, admin_user, permissions):
+        """Prueba que reasignar permisos invalida el caché del rol"""
+        assert PermissionService.role_has_permission(db_session, admin_user.rol_id, "roles.leer")
+        
+        PermissionService.assign_permissions_to_role(
+            db_session,
+            admin_user.rol_id,
+            [permissions[0].id]
+        )
+        
+        assert not PermissionService.role_has_permission(db_session, admin_user.rol_id, "roles.leer")
+        assert PermissionService.role_has_permission(db_session, admin_user.rol_id, "usuarios.crear")
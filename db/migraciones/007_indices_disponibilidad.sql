@@ -0,0 +1,13 @@
+-- Migración de índices para las consultas de disponibilidad
+-- Fecha: 2026-10-18
+-- Descripción: Índices compuestos por especialista para /especialistas/libres-en-horario
+-- y el cálculo de disponibilidad (evita recorrer horarios, bloqueos y citas de toda la tabla)
+
+CREATE INDEX IF NOT EXISTS ix_horarios_especialista_dia
+ON horarios_especialista (especialista_id, dia_semana);
+
+CREATE INDEX IF NOT EXISTS ix_bloqueos_especialista_fechas
+ON bloqueos_especialista (especialista_id, fecha_inicio, fecha_fin);
+
+CREATE INDEX IF NOT EXISTS ix_citas_especialista_fecha
+ON citas (especialista_id, fecha);
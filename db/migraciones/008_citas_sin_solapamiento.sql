@@ -0,0 +1,28 @@
+-- Migración para impedir citas solapadas del mismo especialista
+-- Fecha: 2026-10-18
+-- Descripción: Restricción de exclusión sobre (especialista_id, rango de tiempo) para citas
+-- activas. Hace segura la reserva concurrente (recepción + bot de WhatsApp) sin bloqueos
+-- globales: si dos transacciones intentan ocupar el mismo horario, la segunda falla con
+-- SQLSTATE 23P01 (exclusion_violation) y CitaService la reporta como conflicto.
+-- Una hora_fin <= hora_inicio se interpreta como medianoche del día siguiente.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Antes de aplicar, revisar solapamientos existentes (deben resolverse manualmente):
+-- SELECT a.id, b.id, a.especialista_id, a.fecha, a.hora_inicio, a.hora_fin, b.hora_inicio, b.hora_fin
+-- FROM citas a
+-- JOIN citas b ON a.especialista_id = b.especialista_id AND a.fecha = b.fecha AND a.id < b.id
+-- WHERE a.estado NOT IN ('cancelada', 'no_show') AND b.estado NOT IN ('cancelada', 'no_show')
+--   AND a.hora_inicio < b.hora_fin AND b.hora_inicio < a.hora_fin;
+
+ALTER TABLE citas
+ADD CONSTRAINT excl_citas_solapadas
+EXCLUDE USING gist (
+    especialista_id WITH =,
+    tsrange(
+        fecha + hora_inicio,
+        fecha + hora_fin + CASE WHEN hora_fin <= hora_inicio THEN INTERVAL '1 day' ELSE INTERVAL '0' END,
+        '[)'
+    ) WITH &&
+)
+WHERE (estado NOT IN ('cancelada', 'no_show'));
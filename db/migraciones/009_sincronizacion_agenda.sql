@@ -0,0 +1,24 @@
+-- Migración para la sincronización incremental de la agenda
+-- Fecha: 2026-10-18
+-- Descripción: Registro de citas eliminadas (tombstones) e índice por fecha_actualizacion
+-- para GET /api/citas/cambios, que devuelve solo lo creado, modificado o eliminado
+-- desde el cursor del cliente.
+
+CREATE TABLE IF NOT EXISTS citas_eliminadas (
+    id SERIAL PRIMARY KEY,
+    cita_id INTEGER NOT NULL,
+    sede_id INTEGER,
+    especialista_id INTEGER,
+    fecha DATE,
+    fecha_eliminacion TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_citas_eliminadas_sede_fecha_eliminacion
+ON citas_eliminadas (sede_id, fecha_eliminacion);
+
+CREATE INDEX IF NOT EXISTS ix_citas_sede_actualizacion
+ON citas (sede_id, fecha_actualizacion);
+
+-- Los registros más viejos que agenda_sync_retencion_dias (30 por defecto) ya no se
+-- consultan: los cursores anteriores reciben la agenda completa. Limpieza periódica:
+-- DELETE FROM citas_eliminadas WHERE fecha_eliminacion < NOW() - INTERVAL '30 days';
@@ -0,0 +1,17 @@
+-- Migración de búsqueda de clientes
+-- Fecha: 2026-10-18
+-- Descripción: Columna clientes.busqueda (nombre, apellido, email sin tildes; teléfono y
+-- cédula solo con dígitos) con índice GIN pg_trgm para /api/clientes/buscar/rapida y
+-- el filtro de texto de GET /api/clientes. Los LIKE '%termino%' sobre la columna usan
+-- el índice en lugar de recorrer la tabla.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE clientes ADD COLUMN IF NOT EXISTS busqueda TEXT;
+
+CREATE INDEX IF NOT EXISTS ix_clientes_busqueda_trgm
+ON clientes USING gin (busqueda gin_trgm_ops);
+
+-- La aplicación mantiene la columna al crear o editar clientes. Para llenar los
+-- registros existentes (misma normalización que la aplicación):
+--   python scripts/reindexar_busqueda_clientes.py
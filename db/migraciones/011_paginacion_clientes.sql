@@ -0,0 +1,11 @@
+-- Migración de índices para el listado de clientes
+-- Fecha: 2026-10-18
+-- Descripción: Índices compuestos por sede para GET /api/clientes con paginación por
+-- cursor: el ORDER BY (campo, id) y la condición "después del cursor" se resuelven
+-- recorriendo el índice, sin OFFSET ni ordenar toda la sede.
+
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_nombre_id
+ON clientes (sede_id, nombre, id);
+
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_visitas_id
+ON clientes (sede_id, total_visitas, id);
@@ -0,0 +1,11 @@
+-- Migración de identidad normalizada de clientes
+-- Fecha: 2026-10-18
+-- Descripción: Teléfono en E.164 y cédula sin separadores para reconocer al mismo
+-- cliente escrito con formatos distintos. La aplicación las llena al guardar; para
+-- los clientes existentes y los duplicados ya creados, ejecutar después:
+--     python scripts/deduplicar_clientes.py            (informe)
+--     python scripts/deduplicar_clientes.py --aplicar  (fusiona y llena las claves)
+-- y luego 013_identidad_clientes_unica.sql.
+
+ALTER TABLE clientes ADD COLUMN IF NOT EXISTS telefono_normalizado VARCHAR(20);
+ALTER TABLE clientes ADD COLUMN IF NOT EXISTS cedula_normalizada VARCHAR(20);
@@ -0,0 +1,12 @@
+-- Migración de unicidad de la identidad de clientes
+-- Fecha: 2026-10-18
+-- Descripción: Índices únicos sobre las claves normalizadas (requiere haber fusionado
+-- los duplicados con scripts/deduplicar_clientes.py --aplicar). Con ellos el alta de
+-- clientes (recepción y bot) es atómica: un INSERT concurrente del mismo cliente
+-- falla y la aplicación reutiliza el registro existente.
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_clientes_telefono_normalizado
+ON clientes (telefono_normalizado);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_clientes_cedula_normalizada
+ON clientes (cedula_normalizada);
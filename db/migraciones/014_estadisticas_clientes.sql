@@ -0,0 +1,23 @@
+-- Migración de estadísticas de clientes
+-- Fecha: 2026-10-18
+-- Descripción: total_gastado y ultimo_servicio_id junto a total_visitas y
+-- ultima_visita, mantenidos por la aplicación al confirmar facturas y citas
+-- (services/cliente_estadisticas.py). El trigger tr_actualizar_visitas solo sumaba
+-- al completar una cita (nunca restaba ni veía las facturas) y se reemplaza.
+-- Después de aplicarla, llenar las columnas con:
+--     python scripts/recalcular_estadisticas_clientes.py
+
+ALTER TABLE clientes ADD COLUMN IF NOT EXISTS total_gastado DECIMAL(12, 2) DEFAULT 0;
+ALTER TABLE clientes ADD COLUMN IF NOT EXISTS ultimo_servicio_id INTEGER
+    REFERENCES servicios(id) ON DELETE SET NULL;
+
+DROP TRIGGER IF EXISTS tr_actualizar_visitas ON citas;
+DROP FUNCTION IF EXISTS actualizar_visitas_cliente();
+
+-- Recalcular un cliente lee sus citas y facturas por cliente_id
+CREATE INDEX IF NOT EXISTS idx_facturas_cliente ON facturas (cliente_id);
+CREATE INDEX IF NOT EXISTS idx_detalle_factura_factura ON detalle_factura (factura_id);
+
+-- Listados ordenados por última visita o por gasto (paginación por cursor)
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_ultima_visita_id ON clientes (sede_id, ultima_visita, id);
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_gastado_id ON clientes (sede_id, total_gastado, id);
@@ -0,0 +1,16 @@
+-- Migración de índices descendentes para el listado de clientes
+-- Fecha: 2026-10-18
+-- Descripción: El listado ordena los campos que admiten NULL con los NULL al final
+-- también en descendente (ORDER BY campo DESC NULLS LAST, id DESC). Los índices
+-- (sede_id, campo, id) de las migraciones 011/014 sirven el orden ascendente; estos
+-- sirven el descendente, de modo que la condición del cursor
+-- (campo, id) < (valor, id) es el inicio de un rango del índice.
+
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_visitas_desc_id
+ON clientes (sede_id, total_visitas DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_ultima_visita_desc_id
+ON clientes (sede_id, ultima_visita DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS ix_clientes_sede_gastado_desc_id
+ON clientes (sede_id, total_gastado DESC NULLS LAST, id DESC);
@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect, useRef, useMemo, useCallback } from 'react';
-import { format, addDays, subDays, isToday, getDay } from 'date-fns';
+import { format, addDays, subDays, isToday, getDay, startOfWeek } from 'date-fns';
 import { es } from 'date-fns/locale';
 import {
     ChevronLeft,
@@ -24,7 +24,7 @@ import { IACitasModal } from '@/components/calendario/IACitasModal';
 import { NotificationModal } from '@/components/calendario/NotificationModal';
 import { especialistasApi } from '@/lib/api/especialistas';
 import { citasApi, CitaListItem } from '@/lib/api/citas';
-import { Especialista, Horario, Bloqueo } from '@/types/especialista';
+import { Especialista, Horario, Bloqueo, BloqueoDia } from '@/types/especialista';
 import { toast } from 'sonner';
 
 // Colores para los especialistas
@@ -44,6 +44,7 @@ interface EspecialistaConHorario extends Especialista {
     color: string;
     horarios: Horario[];
     bloqueos: Bloqueo[];
+    bloqueos_dia: BloqueoDia[];
 }
 
 interface Cita {
@@ -101,15 +102,21 @@ export default function CalendarioPage() {
     const [error, setError] = useState<string | null>(null);
     const calendarRef = useRef<HTMLDivElement>(null);
 
+    // Semana visible: el backend solo devuelve horarios y bloqueos de ese rango
+    const semanaInicio = format(startOfWeek(selectedDate), 'yyyy-MM-dd');
+    const semanaFin = format(addDays(startOfWeek(selectedDate), 6), 'yyyy-MM-dd');
+
     // Cargar especialistas del backend
     useEffect(() => {
         const loadEspecialistas = async (retries = 3) => {
-            setIsLoading(true);
             setError(null);
 
             try {
                 // Obtener especialistas activos con horarios y bloqueos en UNA sola petición
-                const data = await especialistasApi.getActivosConCalendario();
+                const data = await especialistasApi.getActivosConCalendario({
+                    fecha_inicio: semanaInicio,
+                    fecha_fin: semanaFin,
+                });
 
                 const especialistasConHorarios: EspecialistaConHorario[] = data.map((esp, index) => ({
                     ...esp,
@@ -136,7 +143,7 @@ export default function CalendarioPage() {
         };
 
         loadEspecialistas();
-    }, []);
+    }, [semanaInicio, semanaFin]);
 
     // Scroll a la hora actual al cargar
     useEffect(() => {
@@ -213,12 +220,9 @@ export default function CalendarioPage() {
             const bloqueados = new Set<string>();
             const fechaStr = format(selectedDate, 'yyyy-MM-dd');
 
-            esp.bloqueos.forEach(bloqueo => {
-                // Verificar si el bloqueo aplica a esta fecha
-                const fechaInicio = bloqueo.fecha_inicio.split('T')[0];
-                const fechaFin = bloqueo.fecha_fin.split('T')[0];
-
-                if (fechaStr >= fechaInicio && fechaStr <= fechaFin) {
+            // Bloqueos ya expandidos por fecha en el backend (incluye recurrentes)
+            esp.bloqueos_dia.forEach(bloqueo => {
+                if (bloqueo.fecha === fechaStr) {
                     // Si es todo el día
                     if (!bloqueo.hora_inicio || !bloqueo.hora_fin) {
                         // Bloquear todas las horas
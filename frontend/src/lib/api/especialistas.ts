@@ -5,6 +5,7 @@ import {
     Horario,
     HorarioFormData,
     Bloqueo,
+    BloqueoDia,
     BloqueoFormData,
     EspecialistaServicio,
     EspecialistaServicioFormData,
@@ -27,9 +28,9 @@ export const especialistasApi = {
         return response.data;
     },
 
-    // Obtener especialistas activos con horarios y bloqueos (batch) para calendario
-    getActivosConCalendario: async (): Promise<(Especialista & { horarios: Horario[]; bloqueos: Bloqueo[] })[]> => {
-        const response = await apiClient.get('/especialistas/activos/calendario');
+    // Obtener especialistas activos con horarios y bloqueos (batch) para calendario en un rango de fechas
+    getActivosConCalendario: async (params?: { fecha_inicio?: string; fecha_fin?: string }): Promise<(Especialista & { horarios: Horario[]; bloqueos: Bloqueo[]; bloqueos_dia: BloqueoDia[] })[]> => {
+        const response = await apiClient.get('/especialistas/activos/calendario', { params });
         return response.data;
     },
 
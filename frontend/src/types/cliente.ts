@@ -42,6 +42,8 @@ export interface Cliente {
     fecha_primera_visita: string | null;
     ultima_visita: string | null;
     total_visitas: number;
+    total_gastado: number;
+    ultimo_servicio_id: number | null;
 
     // Estado
     estado: 'activo' | 'inactivo';
@@ -68,6 +70,7 @@ export interface ClienteListItem {
     email: string | null;
     total_visitas: number;
     ultima_visita: string | null;
+    total_gastado: number;
     etiquetas: ClienteEtiqueta[];
     estado: 'activo' | 'inactivo';
     es_colaborador: boolean;
@@ -126,7 +129,7 @@ export interface ClienteFilters {
     max_visitas?: number;
     pagina?: number;
     por_pagina?: number;
-    ordenar_por?: 'nombre' | 'fecha_creacion' | 'ultima_visita' | 'total_visitas';
+    ordenar_por?: 'nombre' | 'fecha_creacion' | 'ultima_visita' | 'total_visitas' | 'total_gastado';
     orden?: 'asc' | 'desc';
 }
 
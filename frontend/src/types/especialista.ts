@@ -58,6 +58,15 @@ export interface Bloqueo {
     fecha_creacion: string;
 }
 
+// Bloqueo ya expandido a una fecha concreta (sin horas: día completo)
+export interface BloqueoDia {
+    bloqueo_id: number;
+    fecha: string;
+    hora_inicio?: string;
+    hora_fin?: string;
+    motivo?: string;
+}
+
 export interface BloqueoFormData {
     fecha_inicio: string;
     fecha_fin: string;